@@ -0,0 +1,100 @@
+"""Cached rendering of dashboard session cards.
+
+Every card is cached as rendered HTML under a key made of its session id and the versions of
+the session, its workout, its user and its workout's percentiles (see `workouts.versions`). The
+signal handlers in `workouts.signals` bump those versions whenever the session, its
+performances, its workout or the user's name changes, and `workouts.percentiles` bumps the last
+whenever the sketches that rank its performance do, which orphans the cards that showed them
+however many there are. A page
+of cards is read with one `get_many` for the versions and one for the cards, and no database
+queries.
+"""
+
+from django.conf import settings
+from django.core.cache import cache
+from django.template.loader import render_to_string
+from django.utils.safestring import mark_safe
+
+from workouts.models import Session
+from workouts.models import Workout
+from workouts.percentiles import prefetch_percentiles
+from workouts.versions import get_versions
+
+# Bump this whenever `dashboard/card.html` changes, so stale cards are ignored.
+CARD_VERSION = 3
+
+
+def card_keys(sessions):
+    """Return the cache key of each session's card, in order.
+
+    Only the ids of each session, its workout and its user are read.
+    """
+    objects = set()
+    for session in sessions:
+        objects |= {
+            ("session", session.pk),
+            ("workout", session.workout_id),
+            ("user", session.user_id),
+            ("percentiles", session.workout_id),
+        }
+    versions = get_versions(objects)
+    return [
+        "dashboard:card:{}:{}:{}:{}:{}".format(
+            session.pk,
+            versions["session", session.pk],
+            versions["workout", session.workout_id],
+            versions["user", session.user_id],
+            versions["percentiles", session.workout_id],
+        )
+        for session in sessions
+    ]
+
+
+def render_cards(sessions):
+    """Return the rendered card for each session, in order.
+
+    Cached cards are fetched in one round trip. Missing cards are rendered together, with the
+    data they need loaded in bulk, and then cached.
+    """
+    return list(iter_cards(sessions))
+
+
+def iter_cards(sessions):
+    """Yield the rendered card for each session, in order, as soon as each one is ready.
+
+    Like `render_cards`, but cards are rendered one at a time, so a streamed response can send
+    the first card before the rest are rendered.
+    """
+    sessions = list(sessions)
+    keys = card_keys(sessions)
+    cards = cache.get_many(keys, version=CARD_VERSION)
+
+    missing = [session for session, key in zip(sessions, keys) if key not in cards]
+    loaded = {session.pk: session for session in _load(missing)} if missing else {}
+    rendered = {}
+    try:
+        for session, key in zip(sessions, keys):
+            if key not in cards and session.pk in loaded:
+                cards[key] = rendered[key] = render_to_string(
+                    "dashboard/card.html", {"session": loaded[session.pk]}
+                )
+            if key in cards:
+                yield mark_safe(cards[key])
+    finally:
+        if rendered:
+            cache.set_many(
+                rendered, timeout=settings.DASHBOARD_CARD_TIMEOUT, version=CARD_VERSION
+            )
+
+
+def _load(sessions):
+    """Load everything `card.html` needs for `sessions`, using a fixed number of queries."""
+    sessions = list(
+        Session.objects.filter(pk__in=[session.pk for session in sessions])
+        .select_related("user", "workout")
+        .order_by()
+    )
+    Session.prefetch_performance(sessions)
+    Workout.prefetch_summary([session.workout for session in sessions])
+    prefetch_percentiles(sessions)
+    return sessions
@@ -0,0 +1,55 @@
+"""Pages of the dashboard session feed.
+
+The feed is every session, newest first. Pages are found with a keyset cursor, the timestamp and
+id of the last session on the previous page, so each page is one small query on the session
+timestamp index however far back it is. Sessions with the same timestamp are ordered by
+ascending id, the order the index keeps them in.
+"""
+
+from datetime import datetime
+from datetime import timedelta
+from datetime import timezone
+
+from django.conf import settings
+from django.db.models import Q
+
+from workouts.models import Session
+
+EPOCH = datetime(1970, 1, 1, tzinfo=timezone.utc)
+
+
+def encode_cursor(session):
+    """Return the cursor for the page after `session`."""
+    micros = (session.timestamp - EPOCH) // timedelta(microseconds=1)
+    return f"{micros}.{session.pk}"
+
+
+def decode_cursor(cursor):
+    """Return the timestamp and id in `cursor`, raising ValueError if it's malformed."""
+    micros, pk = (int(part) for part in cursor.split("."))
+    try:
+        return EPOCH + timedelta(microseconds=micros), pk
+    except OverflowError:
+        raise ValueError(f"Invalid cursor: {cursor}")
+
+
+def get_page(cursor=None, size=None):
+    """Return the sessions on the page after `cursor`, and the cursor for the next page.
+
+    The next cursor is None on the last page. Only the fields the cursor and the card keys
+    need are loaded.
+    """
+    size = size or settings.DASHBOARD_FEED_PAGE_SIZE
+    sessions = Session.objects.order_by("-timestamp", "pk").only(
+        "pk", "timestamp", "workout", "user"
+    )
+    if cursor:
+        timestamp, pk = decode_cursor(cursor)
+        sessions = sessions.filter(
+            Q(timestamp__lt=timestamp) | Q(timestamp=timestamp, pk__gt=pk)
+        )
+
+    sessions = list(sessions[: size + 1])
+    if len(sessions) > size:
+        return sessions[:size], encode_cursor(sessions[size - 1])
+    return sessions, None
@@ -5,18 +5,28 @@ const csrf_token = document.head.querySelector(
   'meta[name="csrf-token"]'
 ).content;
 
-// The request object for our `friends` API endpoint.
-// We'll pass to this to `fetch()`.
-const friendsRequest = new Request("/api/friends/", {
-  method: "GET",
-  headers: { "X-CSRFToken": csrf_token },
-});
-
 // Attach a callback function to the `show` event of our model dialog.
-// Every time the dialog is shown, we'll fetch a list of friends from
-// the API.
+// Every time the dialog is shown, we'll fetch the first page of friends from
+// the API. Friends come most recently active first, and the "Show more" button
+// fetches the page after the last one shown.
 const friendsModalEl = document.getElementById("friendsModal");
+const friendsMoreEl = document.getElementById("friendsMore");
 friendsModalEl.addEventListener("show.bs.modal", function (event) {
+  document.getElementById("friendList").innerHTML = "";
+  fetchFriends(null);
+});
+friendsMoreEl.addEventListener("click", function (event) {
+  fetchFriends(friendsMoreEl.dataset.cursor);
+});
+
+function fetchFriends(cursor) {
+  const url = cursor
+    ? `/api/friends/?cursor=${encodeURIComponent(cursor)}`
+    : "/api/friends/";
+  const friendsRequest = new Request(url, {
+    method: "GET",
+    headers: { "X-CSRFToken": csrf_token },
+  });
   fetch(friendsRequest)
     .then((response) => {
       if (response.status === 200) {
@@ -28,17 +38,51 @@ friendsModalEl.addEventListener("show.bs.modal", function (event) {
     .catch((error) => {
       console.error(error);
     });
-});
+}
+
 
+// A helper function that describes when a friend last trained, like "3 days ago".
+const relativeTime = new Intl.RelativeTimeFormat(undefined, { numeric: "auto" });
+const timeUnits = [
+  ["year", 60 * 60 * 24 * 365],
+  ["month", 60 * 60 * 24 * 30],
+  ["week", 60 * 60 * 24 * 7],
+  ["day", 60 * 60 * 24],
+  ["hour", 60 * 60],
+  ["minute", 60],
+];
+function timeAgo(timestamp) {
+  const seconds = (new Date(timestamp) - Date.now()) / 1000;
+  for (const [unit, length] of timeUnits) {
+    if (Math.abs(seconds) >= length) {
+      return relativeTime.format(Math.round(seconds / length), unit);
+    }
+  }
+  return relativeTime.format(0, "minute");
+}
+
+// A helper function that escapes a value for use in HTML, as names are chosen by users.
+const htmlEscapes = { "&": "&amp;", "<": "&lt;", ">": "&gt;", '"': "&quot;", "'": "&#39;" };
+function escapeHtml(value) {
+  return String(value ?? "").replace(/[&<>"']/g, (char) => htmlEscapes[char]);
+}
 
 // A helper function that creates a list group item, as a string, for a single friend
 function makeFriendListItem(friend) {
+  const activity = friend.last_session
+    ? `Last workout ${timeAgo(friend.last_session)}`
+    : "No workouts yet";
+  const summary = friend.last_session
+    ? `<p class="mb-1">${escapeHtml(friend.last_workout)}</p>
+       <small class="text-muted">${escapeHtml(friend.session_count)} session${friend.session_count === 1 ? "" : "s"}</small>`
+    : "";
   const friendListItemT = `
-    <a href="/profile/${friend.user_id}" class="list-group-item list-group-item-action">
+    <a href="/profile/${encodeURIComponent(friend.user_id)}" class="list-group-item list-group-item-action">
         <div class="d-flex w-100 justify-content-between">
-          <h5 class="mb-1">${friend.first_name} ${friend.last_name}</h5>
-          <small>Last workout 3 days ago</small>
+          <h5 class="mb-1">${escapeHtml(friend.first_name)} ${escapeHtml(friend.last_name)}</h5>
+          <small>${activity}</small>
         </div>
+        ${summary}
     </a>
   `;
   return friendListItemT;
@@ -49,9 +93,6 @@ function handleFriendData(data) {
   // retrieved from our `friends` API endpoint.
   const friendsList = document.getElementById("friendList");
 
-  // Remove any existing items from the list.
-  friendsList.innerHTML = "";
-
   // Append a new list item for each friend in our data.
   data.data.forEach((friend) => {
     friendsList.insertAdjacentHTML(
@@ -59,4 +100,78 @@ function handleFriendData(data) {
       makeFriendListItem(friend)
     );
   });
+
+  // Offer the next page, if there is one.
+  if (data.next) {
+    friendsMoreEl.dataset.cursor = data.next;
+    friendsMoreEl.classList.remove("d-none");
+  } else {
+    friendsMoreEl.classList.add("d-none");
+  }
+}
+
+
+// Load the next page of session cards whenever the end of the feed scrolls into view.
+// The server sends the cursor for the page after that in the `X-Next-Cursor` header,
+// and leaves it out once there are no more cards.
+const feedMoreEl = document.getElementById("feedMore");
+if (feedMoreEl) {
+  let loading = false;
+  const feedObserver = new IntersectionObserver((entries) => {
+    if (loading || !entries.some((entry) => entry.isIntersecting)) {
+      return;
+    }
+    loading = true;
+
+    const url = `${feedMoreEl.dataset.url}?cursor=${encodeURIComponent(feedMoreEl.dataset.cursor)}`;
+    fetch(url)
+      .then((response) => {
+        if (response.status !== 200) {
+          throw new Error("Something went wrong");
+        }
+        const cursor = response.headers.get("X-Next-Cursor");
+        return response.text().then((cards) => {
+          feedMoreEl.insertAdjacentHTML("beforebegin", cards);
+          if (cursor) {
+            feedMoreEl.dataset.cursor = cursor;
+          } else {
+            feedObserver.disconnect();
+            feedMoreEl.remove();
+          }
+        });
+      })
+      .catch((error) => {
+        console.error(error);
+      })
+      .finally(() => {
+        loading = false;
+        // Observe again, so a sentinel that's still in view loads another page.
+        if (feedMoreEl.isConnected) {
+          feedObserver.unobserve(feedMoreEl);
+          feedObserver.observe(feedMoreEl);
+        }
+      });
+  });
+  feedObserver.observe(feedMoreEl);
 }
+
+
+// Like or unlike a workout from the thumbs on its session card. Cards are shared by
+// everyone, so they don't show the user's own choice.
+document.addEventListener("click", function (event) {
+  const link = event.target.closest("[data-like-workout]");
+  if (!link) {
+    return;
+  }
+  event.preventDefault();
+
+  const body = new FormData();
+  body.append("action", link.dataset.likeAction);
+  fetch(`/api/like/workout/${link.dataset.likeWorkout}/`, {
+    method: "POST",
+    headers: { "X-CSRFToken": csrf_token },
+    body: body,
+  }).catch((error) => {
+    console.error(error);
+  });
+});
@@ -1,5 +1,7 @@
 """Extra template filters for the dash app."""
+
 from django import template
+from django.templatetags.static import static
 
 register = template.Library()
 
@@ -44,3 +46,9 @@ def _round(val, ndigits=None):
     """Round filter function."""
     val = _num_arg(val)
     return round(val, ndigits)
+
+
+@register.simple_tag
+def icon(name):
+    """Return the URL of icon `name` in the static SVG sprite, for `<use xlink:href>`."""
+    return f"{static('dashboard/icons.svg')}#{name}"
@@ -1,3 +1,169 @@
+import gzip
+import tempfile
+from http import HTTPStatus
+
+from django.contrib.staticfiles.storage import staticfiles_storage
+from django.core.cache import cache
+from django.core.management import call_command
 from django.test import TestCase
+from django.test import override_settings
+from django.urls import reverse
+
+from users.models import User
+from workouts import percentiles
+from workouts.models import Performance
+from workouts.models import Session
+from workouts.models import Workout
+
+from .cards import render_cards
+
+
+class DashboardCardsTestCase(TestCase):
+    fixtures = ["workouts.json"]
+
+    def setUp(self):
+        cache.clear()
+
+    def test_dashboard_loads(self):
+        """Test that the dashboard renders a card for each session."""
+        email, password = "testuser@example.com", "Passw0rd!!"
+        User.objects.create_user(email=email, password=password)
+        self.client.login(username=email, password=password)
+
+        response = self.client.get(reverse("index"))
+        self.assertEqual(response.status_code, HTTPStatus.OK)
+        self.assertContains(response, "40 minutes 33 seconds")
+        self.assertContains(response, "Longest")
+
+    def test_warm_cards_use_no_queries(self):
+        """Test that cached cards are rendered without touching the database."""
+        sessions = list(Session.objects.order_by("-timestamp"))
+        cold = render_cards(sessions)
+
+        with self.assertNumQueries(0):
+            warm = render_cards(sessions)
+
+        self.assertEqual(cold, warm)
+
+    def test_workout_change_invalidates_card(self):
+        """Test that editing a workout re-renders the cards that show it."""
+        session = Session.objects.get(pk=3)
+        render_cards([session])
+
+        workout = Workout.objects.get(pk=session.workout_id)
+        workout.name = "Murph (Vest)"
+        workout.save()
+
+        [card] = render_cards([session])
+        self.assertIn("Murph (Vest)", card)
+
+    def test_user_change_invalidates_card(self):
+        """Test that renaming a user re-renders their cards, but logging in doesn't."""
+        session = Session.objects.get(pk=3)
+        render_cards([session])
+
+        user = session.user
+        user.save(update_fields=["last_login"])
+        with self.assertNumQueries(0):
+            render_cards([session])
+
+        user.first_name = "Renamed"
+        user.save()
+        [card] = render_cards([session])
+        self.assertIn("Renamed", card)
+
+    def test_percentile_change_invalidates_card(self):
+        """Test that recording a performance re-renders the cards it ranks against."""
+        session = Session.objects.get(pk=3)
+        performance = Performance.objects.filter(session=session).order_by("pk").first()
+        percentiles.rebuild([performance.interval_id])
+        [before] = render_cards([session])
+        self.assertIn("Better than 0%", before)
+
+        # Someone else does worse, so this session now beats them.
+        quantity = performance.interval.style.quantity_name
+        if quantity in percentiles.LOWER_IS_BETTER:
+            worse = performance.performance * 2
+        else:
+            worse = performance.performance // 2
+        percentiles.record(performance.interval_id, worse)
+        [after] = render_cards([session])
+        self.assertNotIn("Better than 0%", after)
+        self.assertIn("Better than", after)
+
+    def test_feed(self):
+        """Test that the feed streams pages of cards for a keyset cursor."""
+        email, password = "testuser@example.com", "Passw0rd!!"
+        User.objects.create_user(email=email, password=password)
+        self.client.login(username=email, password=password)
+
+        sessions = list(Session.objects.order_by("-timestamp", "pk"))
+        render_cards(sessions)
+        with self.settings(DASHBOARD_FEED_PAGE_SIZE=2):
+            response = self.client.get(reverse("index"))
+            cursor = response.context["cursor"]
+            self.assertEqual(len(response.context["cards"]), 2)
+
+            seen = []
+            while cursor:
+                # The session and user, then one query for the page of cached cards.
+                with self.assertNumQueries(3):
+                    response = self.client.get(reverse("feed"), {"cursor": cursor})
+                    cards = list(response.streaming_content)
+                self.assertEqual(response["Content-Type"], "text/html")
+                seen.append(len(cards))
+                cursor = response.get("X-Next-Cursor")
+        self.assertEqual(seen, [2, 1])
+        self.assertEqual(2 + sum(seen), len(sessions))
+        self.assertIn(sessions[-1].workout.name, b"".join(cards).decode())
+
+        response = self.client.get(reverse("feed"), {"cursor": "nope"})
+        self.assertEqual(response.status_code, HTTPStatus.BAD_REQUEST)
+
+
+class StaticFilesTestCase(TestCase):
+    def setUp(self):
+        directory = tempfile.TemporaryDirectory()
+        self.addCleanup(directory.cleanup)
+        settings = override_settings(
+            STATIC_ROOT=directory.name,
+            STATICFILES_STORAGE="project.storage.CompressedManifestStaticFilesStorage",
+        )
+        settings.enable()
+        self.addCleanup(settings.disable)
+        call_command("collectstatic", interactive=False, verbosity=0)
+
+    def test_precompressed(self):
+        """Test that hashed static files are served precompressed and cached for good."""
+        url = staticfiles_storage.url("dashboard/icons.svg")
+        self.assertRegex(url, r"^/static/dashboard/icons\.[0-9a-f]{12}\.svg$")
+
+        response = self.client.get(url, HTTP_ACCEPT_ENCODING="gzip, deflate")
+        self.assertEqual(response.status_code, HTTPStatus.OK)
+        self.assertEqual(response["Content-Encoding"], "gzip")
+        self.assertEqual(response["Content-Type"], "image/svg+xml")
+        self.assertIn("immutable", response["Cache-Control"])
+        self.assertIn("Accept-Encoding", response["Vary"])
+        content = gzip.decompress(b"".join(response.streaming_content))
+        self.assertIn(b'<symbol id="logo"', content)
+
+        response = self.client.get(url, HTTP_ACCEPT_ENCODING="gzip;q=0")
+        self.assertFalse(response.has_header("Content-Encoding"))
+
+        response = self.client.get(
+            url, HTTP_IF_MODIFIED_SINCE=response["Last-Modified"]
+        )
+        self.assertEqual(response.status_code, HTTPStatus.NOT_MODIFIED)
+
+    def test_icon_sprite(self):
+        """Test that pages link to the icon sprite rather than inlining it."""
+        email, password = "testuser@example.com", "Passw0rd!!"
+        User.objects.create_user(email=email, password=password)
+        self.client.login(username=email, password=password)
 
-# Create your tests here.
+        response = self.client.get(reverse("index"))
+        self.assertNotContains(response, "<symbol")
+        self.assertContains(
+            response,
+            f'xlink:href="{staticfiles_storage.url("dashboard/icons.svg")}#logo"',
+        )
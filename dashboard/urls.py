@@ -4,5 +4,5 @@ from . import views
 
 urlpatterns = [
     path("", views.index, name="index"),
+    path("feed/", views.feed, name="feed"),
 ]
-
@@ -1,19 +1,44 @@
 from django.shortcuts import render
 from django.contrib.auth.decorators import login_required
+from django.http import HttpResponseBadRequest
+from django.http import StreamingHttpResponse
 
-from workouts.models import Session
+from workouts import streaks
+
+from .cards import iter_cards
+from .cards import render_cards
+from .feed import get_page
 
 
 @login_required
 def index(request):
     # TODO: Filter on user and friends
-    # TODO: Pagination
-    sessions = (
-        Session.objects.all().select_related("workout").order_by("-timestamp")[:10]
-    )
+    # Cards are keyed by the ids of each session, its workout and its user, so only those are
+    # loaded here.
+    sessions, cursor = get_page()
 
     context = {
-        "sessions": sessions,
+        "cards": render_cards(sessions),
+        "cursor": cursor,
+        "streak": streaks.stats(request.user.pk),
     }
 
     return render(request, "dashboard/dashboard.html", context=context)
+
+
+@login_required
+def feed(request):
+    """Stream the cards for the page of the session feed after `cursor`.
+
+    The cursor for the next page is sent in the `X-Next-Cursor` header, which is left out on
+    the last page.
+    """
+    try:
+        sessions, cursor = get_page(request.GET.get("cursor"))
+    except ValueError:
+        return HttpResponseBadRequest()
+
+    response = StreamingHttpResponse(iter_cards(sessions), content_type="text/html")
+    if cursor:
+        response["X-Next-Cursor"] = cursor
+    return response
@@ -0,0 +1,13 @@
+from django.contrib import admin
+
+from .models import Job
+
+
+class JobAdmin(admin.ModelAdmin):
+    list_display = ["__str__", "lane", "status", "attempts", "run_at"]
+    list_filter = ["status", "lane"]
+    ordering = ["status", "lane", "run_at"]
+    readonly_fields = ["task", "args", "key", "attempts", "started_at", "error"]
+
+
+admin.site.register(Job, JobAdmin)
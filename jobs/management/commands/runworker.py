@@ -0,0 +1,66 @@
+import threading
+from concurrent.futures import ThreadPoolExecutor
+
+from django.core.management.base import BaseCommand, CommandError
+from django.db import connections
+
+from jobs import queue
+from jobs.models import Job
+
+LANES = {label.lower(): value for value, label in Job.LaneChoices.choices}
+
+
+class Command(BaseCommand):
+    help = "Run queued background jobs"
+
+    def add_arguments(self, parser):
+        parser.add_argument(
+            "--threads",
+            type=int,
+            default=1,
+            help="The number of jobs to run at once. Defaults to 1.",
+        )
+        parser.add_argument(
+            "--lane",
+            action="append",
+            choices=sorted(LANES),
+            help="Only run jobs in this lane. May be given more than once.",
+        )
+        parser.add_argument(
+            "--burst",
+            action="store_true",
+            help="Exit once there are no due jobs, rather than waiting for more.",
+        )
+
+    def handle(self, *args, **options):
+        threads = options["threads"]
+        if threads < 1:
+            raise CommandError("--threads must be at least 1")
+        lanes = [LANES[lane] for lane in options["lane"] or []]
+        stop = threading.Event()
+
+        def work():
+            try:
+                return queue.work(lanes, burst=options["burst"], stop=stop)
+            finally:
+                if threads > 1:
+                    connections.close_all()
+
+        try:
+            if threads == 1:
+                count = work()
+            else:
+                with ThreadPoolExecutor(threads) as pool:
+                    futures = [pool.submit(work) for _ in range(threads)]
+                    try:
+                        count = sum(future.result() for future in futures)
+                    finally:
+                        # The pool waits for its threads on the way out, so they have to be
+                        # told to stop first if this was interrupted.
+                        stop.set()
+        except KeyboardInterrupt:
+            # Let running jobs finish, then stop.
+            stop.set()
+            return
+
+        self.stdout.write(self.style.SUCCESS(f"ran {count} jobs"))
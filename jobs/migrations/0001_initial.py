@@ -0,0 +1,39 @@
+# Generated by Django 3.2.25 on 2026-10-19 19:33
+
+import django.core.serializers.json
+from django.db import migrations, models
+import django.utils.timezone
+
+
+class Migration(migrations.Migration):
+
+    initial = True
+
+    dependencies = [
+    ]
+
+    operations = [
+        migrations.CreateModel(
+            name='Job',
+            fields=[
+                ('id', models.BigAutoField(auto_created=True, primary_key=True, serialize=False, verbose_name='ID')),
+                ('task', models.CharField(help_text='The dotted path of the task function.', max_length=255)),
+                ('args', models.JSONField(default=list, encoder=django.core.serializers.json.DjangoJSONEncoder, help_text='The positional arguments to call the task with.')),
+                ('key', models.CharField(blank=True, help_text='A hash of the task and its arguments, for tasks that are deduplicated.', max_length=64, null=True)),
+                ('lane', models.PositiveSmallIntegerField(choices=[(0, 'High'), (1, 'Default'), (2, 'Low')], default=1, help_text='Jobs in higher priority lanes are run first.')),
+                ('status', models.CharField(choices=[('P', 'Pending'), ('R', 'Running'), ('F', 'Failed')], default='P', max_length=1)),
+                ('attempts', models.PositiveSmallIntegerField(default=0)),
+                ('run_at', models.DateTimeField(default=django.utils.timezone.now, help_text='When the job is next due to run.')),
+                ('started_at', models.DateTimeField(blank=True, null=True)),
+                ('error', models.TextField(blank=True, help_text='The traceback of the last attempt.')),
+            ],
+        ),
+        migrations.AddIndex(
+            model_name='job',
+            index=models.Index(fields=['status', 'lane', 'run_at'], name='job_due_idx'),
+        ),
+        migrations.AddConstraint(
+            model_name='job',
+            constraint=models.UniqueConstraint(condition=models.Q(('status', 'P')), fields=('key',), name='job_pending_key'),
+        ),
+    ]
@@ -0,0 +1,67 @@
+from django.core.serializers.json import DjangoJSONEncoder
+from django.db import models
+from django.utils import timezone
+
+
+class Job(models.Model):
+    """A call of a task function, waiting to be run by `manage.py runworker`.
+
+    See `jobs.queue`.
+    """
+
+    class LaneChoices(models.IntegerChoices):
+        HIGH = 0, "High"
+        DEFAULT = 1, "Default"
+        LOW = 2, "Low"
+
+    class StatusChoices(models.TextChoices):
+        PENDING = "P", "Pending"
+        RUNNING = "R", "Running"
+        FAILED = "F", "Failed"
+
+    task = models.CharField(
+        max_length=255, help_text="The dotted path of the task function."
+    )
+    args = models.JSONField(
+        default=list,
+        encoder=DjangoJSONEncoder,
+        help_text="The positional arguments to call the task with.",
+    )
+    key = models.CharField(
+        max_length=64,
+        null=True,
+        blank=True,
+        help_text="A hash of the task and its arguments, for tasks that are deduplicated.",
+    )
+    lane = models.PositiveSmallIntegerField(
+        choices=LaneChoices.choices,
+        default=LaneChoices.DEFAULT,
+        help_text="Jobs in higher priority lanes are run first.",
+    )
+    status = models.CharField(
+        max_length=1,
+        choices=StatusChoices.choices,
+        default=StatusChoices.PENDING,
+    )
+    attempts = models.PositiveSmallIntegerField(default=0)
+    run_at = models.DateTimeField(
+        default=timezone.now, help_text="When the job is next due to run."
+    )
+    started_at = models.DateTimeField(null=True, blank=True)
+    error = models.TextField(blank=True, help_text="The traceback of the last attempt.")
+
+    class Meta:
+        indexes = [
+            models.Index(fields=["status", "lane", "run_at"], name="job_due_idx"),
+        ]
+        constraints = [
+            # At most one pending job per deduplicated call.
+            models.UniqueConstraint(
+                fields=["key"],
+                condition=models.Q(status="P"),
+                name="job_pending_key",
+            ),
+        ]
+
+    def __str__(self):
+        return f"{self.task}({', '.join(map(repr, self.args))})"
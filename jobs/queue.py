@@ -0,0 +1,187 @@
+"""A job queue kept in the database.
+
+Work that needn't be finished before a response is sent, like maintaining derived data, is
+done by task functions, and deferred by calling their `delay` rather than the function::
+
+    @task(lane=Job.LaneChoices.LOW, dedupe=True)
+    def rebuild(workout_id):
+        ...
+
+    rebuild.delay(workout.pk)
+
+`delay` inserts a `Job` in the current transaction, so a job only exists if the changes that
+asked for it are committed, and worker threads started by `manage.py runworker` run it soon
+after. Arguments are stored as JSON, so dates and times arrive as ISO 8601 strings.
+
+Workers take the job that's been due longest from the highest priority lane. A job that raises
+is retried after an exponential backoff, up to its task's `max_attempts`, then kept as failed
+for the admin. A job whose worker died is run again after `JOB_TIMEOUT`, so jobs run at least
+once, and tasks should be safe to repeat. Tasks that `dedupe` have at most one pending job for
+the same arguments, so a burst of identical calls runs once.
+
+Jobs are claimed with a conditional update, so any number of worker threads and processes can
+share the queue.
+"""
+
+import functools
+import hashlib
+import json
+import random
+import threading
+import traceback
+from datetime import timedelta
+
+from django.conf import settings
+from django.core.serializers.json import DjangoJSONEncoder
+from django.db import IntegrityError
+from django.db import transaction
+from django.db.models import F
+from django.utils import timezone
+from django.utils.module_loading import import_string
+
+from project.db.routers import use_primary
+
+from .models import Job
+
+
+class Task:
+    """A function that can be run later, in a worker, with `delay`."""
+
+    def __init__(self, func, lane, max_attempts, dedupe):
+        functools.update_wrapper(self, func)
+        self.func = func
+        self.name = f"{func.__module__}.{func.__qualname__}"
+        self.lane = lane
+        self.max_attempts = max_attempts
+        self.dedupe = dedupe
+
+    def __call__(self, *args):
+        return self.func(*args)
+
+    def delay(self, *args):
+        """Queue a call of this task with `args`."""
+        enqueue(self, args)
+
+
+def task(lane=Job.LaneChoices.DEFAULT, max_attempts=5, dedupe=False):
+    """Make a module-level function a `Task`."""
+
+    def decorator(func):
+        return Task(func, lane, max_attempts, dedupe)
+
+    return decorator
+
+
+def job_key(name, args):
+    encoded = json.dumps([name, args], cls=DjangoJSONEncoder, separators=(",", ":"))
+    return hashlib.sha256(encoded.encode()).hexdigest()
+
+
+def enqueue(task, args, run_at=None):
+    args = list(args)
+    job = Job(
+        task=task.name,
+        args=args,
+        key=job_key(task.name, args) if task.dedupe else None,
+        lane=task.lane,
+        run_at=run_at or timezone.now(),
+    )
+    # A duplicate of a pending job is dropped by the database, without an error that would
+    # break the surrounding transaction.
+    Job.objects.bulk_create([job], ignore_conflicts=True)
+
+
+def backoff(attempts):
+    """Return how long to wait before retrying a job that's failed `attempts` times."""
+    seconds = min(2**attempts, settings.JOB_MAX_BACKOFF)
+    # Jitter spreads out retries of jobs that failed together.
+    return timedelta(seconds=seconds * random.uniform(0.5, 1))
+
+
+def claim(lanes=None):
+    """Claim the job that's been due longest in the highest priority lane, or return None."""
+    now = timezone.now()
+    due = Job.objects.filter(status=Job.StatusChoices.PENDING, run_at__lte=now)
+    if lanes:
+        due = due.filter(lane__in=lanes)
+
+    # Another worker may claim a candidate first, so try a few.
+    for job in due.order_by("lane", "run_at", "pk")[:10]:
+        claimed = Job.objects.filter(
+            pk=job.pk, status=Job.StatusChoices.PENDING
+        ).update(
+            status=Job.StatusChoices.RUNNING,
+            started_at=now,
+            attempts=F("attempts") + 1,
+        )
+        if claimed:
+            job.status = Job.StatusChoices.RUNNING
+            job.started_at = now
+            job.attempts += 1
+            return job
+    return None
+
+
+def _reschedule(job, **fields):
+    """Make `job` pending again, unless an identical job is already pending."""
+    try:
+        with transaction.atomic():
+            Job.objects.filter(pk=job.pk).update(
+                status=Job.StatusChoices.PENDING, **fields
+            )
+    except IntegrityError:
+        Job.objects.filter(pk=job.pk).delete()
+
+
+def run(job):
+    """Run a claimed job, returning True if it succeeded."""
+    # A job for a task that can't be imported fails straight away.
+    max_attempts = 1
+    try:
+        task = import_string(job.task)
+        max_attempts = task.max_attempts
+        task.func(*job.args)
+    except Exception:
+        error = traceback.format_exc()
+        if job.attempts >= max_attempts:
+            Job.objects.filter(pk=job.pk).update(
+                status=Job.StatusChoices.FAILED, error=error
+            )
+        else:
+            _reschedule(job, run_at=timezone.now() + backoff(job.attempts), error=error)
+        return False
+
+    Job.objects.filter(pk=job.pk).delete()
+    return True
+
+
+def requeue_lost():
+    """Make jobs that have been running for longer than `JOB_TIMEOUT` pending again."""
+    cutoff = timezone.now() - timedelta(seconds=settings.JOB_TIMEOUT)
+    lost = Job.objects.filter(status=Job.StatusChoices.RUNNING, started_at__lt=cutoff)
+    for job in lost:
+        _reschedule(job)
+
+
+def work(lanes=None, burst=False, stop=None):
+    """Run jobs until `stop` is set, or, in `burst` mode, until none are due.
+
+    Returns the number of jobs run.
+    """
+    stop = stop or threading.Event()
+    count = 0
+    while not stop.is_set():
+        # Jobs act on what was just written, which replicas may not have yet.
+        with use_primary():
+            job = claim(lanes)
+            if job is None:
+                requeue_lost()
+            else:
+                run(job)
+        if job is None:
+            if burst:
+                break
+            stop.wait(settings.JOB_POLL_SECONDS)
+            continue
+        count += 1
+    return count
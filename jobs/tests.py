@@ -0,0 +1,129 @@
+from datetime import timedelta
+from io import StringIO
+from unittest import mock
+
+from django.core.management import call_command
+from django.test import TestCase
+from django.utils import timezone
+
+from .models import Job
+from .queue import claim
+from .queue import requeue_lost
+from .queue import run
+from .queue import task
+from .queue import work
+
+calls = []
+
+
+@task()
+def record(*args):
+    calls.append(args)
+
+
+@task(lane=Job.LaneChoices.HIGH, dedupe=True)
+def rebuild(name):
+    calls.append(("rebuild", name))
+
+
+@task()
+def count_jobs():
+    calls.append(Job.objects.count())
+
+
+@task(lane=Job.LaneChoices.LOW, max_attempts=2)
+def fail():
+    raise ValueError("Oops")
+
+
+class JobsTestCase(TestCase):
+    def setUp(self):
+        calls.clear()
+
+    def test_delay(self):
+        """Test that delayed calls are run by a worker, not when they're made."""
+        record.delay(1, "two")
+        self.assertEqual(calls, [])
+        self.assertEqual(work(burst=True), 1)
+        self.assertEqual(calls, [(1, "two")])
+        self.assertFalse(Job.objects.exists())
+
+    def test_dedupe(self):
+        """Test that identical pending jobs of deduplicated tasks are run once."""
+        for name in ["a", "a", "b", "a"]:
+            rebuild.delay(name)
+        record.delay(1)
+        record.delay(1)
+        self.assertEqual(Job.objects.count(), 4)
+
+        # Once a job's running, another call needs another job.
+        job = claim()
+        self.assertEqual(job.args, ["a"])
+        rebuild.delay("a")
+        self.assertEqual(
+            Job.objects.filter(status=Job.StatusChoices.PENDING).count(), 4
+        )
+
+    def test_lanes(self):
+        """Test that jobs in higher priority lanes run first, and workers can pick lanes."""
+        fail.delay()
+        record.delay(1)
+        rebuild.delay("a")
+        self.assertEqual(
+            [claim().task for _ in range(3)], [rebuild.name, record.name, fail.name]
+        )
+
+        record.delay(2)
+        self.assertIsNone(claim([Job.LaneChoices.HIGH]))
+        self.assertEqual(claim([Job.LaneChoices.DEFAULT]).args, [2])
+
+    def test_retry(self):
+        """Test that failing jobs are retried after a backoff, then kept as failed."""
+        fail.delay()
+        self.assertFalse(run(claim()))
+        job = Job.objects.get()
+        self.assertEqual(job.status, Job.StatusChoices.PENDING)
+        self.assertEqual(job.attempts, 1)
+        self.assertGreater(job.run_at, timezone.now())
+        self.assertIn("ValueError: Oops", job.error)
+        self.assertIsNone(claim())
+
+        job.run_at = timezone.now()
+        job.save()
+        self.assertFalse(run(claim()))
+        self.assertEqual(Job.objects.get().status, Job.StatusChoices.FAILED)
+
+    def test_unknown_task(self):
+        """Test that jobs for tasks that don't exist fail without retrying."""
+        Job.objects.create(task="jobs.tests.missing")
+        self.assertFalse(run(claim()))
+        self.assertEqual(Job.objects.get().status, Job.StatusChoices.FAILED)
+
+    def test_requeue_lost(self):
+        """Test that jobs left running by a worker that died are run again."""
+        record.delay(1)
+        job = claim()
+        Job.objects.filter(pk=job.pk).update(
+            started_at=timezone.now() - timedelta(days=1)
+        )
+        requeue_lost()
+        self.assertEqual(claim().attempts, 2)
+
+    def test_runworker(self):
+        """Test that the worker command runs every due job."""
+        record.delay(1)
+        rebuild.delay("a")
+        out = StringIO()
+        call_command("runworker", "--burst", stdout=out)
+        self.assertIn("ran 2 jobs", out.getvalue())
+        self.assertEqual(calls, [("rebuild", "a"), (1,)])
+
+    @mock.patch("project.db.routers.get_replicas", return_value=["replica"])
+    def test_runworker_with_replicas(self, get_replicas):
+        """Test that the worker claims and runs jobs against the primary database."""
+        count_jobs.delay()
+        out = StringIO()
+        call_command("runworker", "--burst", stdout=out)
+        self.assertIn("ran 1 jobs", out.getvalue())
+        self.assertEqual(calls, [1])
+        self.assertFalse(Job.objects.using("default").exists())
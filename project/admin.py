@@ -0,0 +1,98 @@
+"""Helpers shared by the ModelAdmin classes of each app."""
+
+from django.conf import settings
+from django.core.paginator import Paginator
+from django.db import connections
+from django.db.models.functions import Lower
+from django.utils.functional import cached_property
+
+from project.autocomplete import get_index
+
+# The largest code point, used as the exclusive upper bound of a prefix range.
+MAX_CHAR = chr(0x10FFFF)
+
+
+def estimate_count(model, using):
+    """Return a cheap estimate of the number of rows in `model`'s table, or None.
+
+    On SQLite this is the largest primary key, read from the end of the primary key index. It
+    over-counts by the number of deleted rows. On PostgreSQL it's the planner's row estimate.
+    """
+    connection = connections[using]
+    table = connection.ops.quote_name(model._meta.db_table)
+
+    with connection.cursor() as cursor:
+        if connection.vendor == "sqlite":
+            pk = connection.ops.quote_name(model._meta.pk.column)
+            cursor.execute(f"SELECT MAX({pk}) FROM {table}")
+        elif connection.vendor == "postgresql":
+            cursor.execute(
+                "SELECT reltuples::bigint FROM pg_class WHERE oid = %s::regclass",
+                [model._meta.db_table],
+            )
+        else:
+            return None
+        row = cursor.fetchone()
+
+    if row is None or row[0] is None:
+        return None
+    return int(row[0])
+
+
+class EstimatedCountPaginator(Paginator):
+    """A paginator that estimates, rather than counts, the rows of large unfiltered tables.
+
+    Small tables, and any filtered or searched changelist, still get an exact count, as does a
+    table whose estimate would leave its last page empty.
+    """
+
+    @cached_property
+    def count(self):
+        queryset = self.object_list
+        if not queryset.query.where:
+            estimate = estimate_count(queryset.model, queryset.db)
+            if (
+                estimate is not None
+                and estimate >= settings.ADMIN_ESTIMATED_COUNT_THRESHOLD
+                and self._has_row((estimate - 1) // self.per_page * self.per_page)
+            ):
+                return estimate
+        return super().count
+
+    def _has_row(self, offset):
+        # An estimate that counts deleted rows can run past the end of the table, which would
+        # leave trailing pages with nothing on them.
+        return self.object_list[offset : offset + 1].exists()
+
+
+class PrefixSearchMixin:
+    """Answer autocomplete lookups with a case-insensitive prefix search on one field.
+
+    The lookup is a range over `Lower(prefix_search_field)`, which an index on that expression
+    can answer directly, unlike the `icontains` lookups of `search_fields`. Other admin searches
+    are unchanged.
+
+    If `prefix_index` names a registered `project.autocomplete` index, matches are looked up in
+    memory instead, and only fetched by primary key.
+    """
+
+    prefix_search_field = None
+    prefix_index = None
+    prefix_index_limit = 500
+
+    def get_search_results(self, request, queryset, search_term):
+        match = getattr(request, "resolver_match", None)
+        is_autocomplete = match is not None and match.url_name == "autocomplete"
+
+        if not (is_autocomplete and self.prefix_search_field and search_term):
+            return super().get_search_results(request, queryset, search_term)
+
+        if self.prefix_index:
+            matches = get_index(self.prefix_index).search(
+                search_term, limit=self.prefix_index_limit
+            )
+            return queryset.filter(pk__in=[pk for pk, label in matches]), False
+
+        term = search_term.strip().lower()
+        queryset = queryset.alias(_prefix=Lower(self.prefix_search_field))
+        return queryset.filter(_prefix__gte=term, _prefix__lt=term + MAX_CHAR), False
@@ -0,0 +1,175 @@
+"""In-memory prefix indexes for typeahead and admin autocomplete.
+
+Each index holds the names of one model in a sorted list, so a prefix lookup is a binary search
+followed by a short scan, with no database query. Indexes are built from the database the first
+time they're used and kept up to date by the signal handlers of the app that registers them.
+
+An index only sees changes made through its own process. Indexes are rebuilt once they're
+`AUTOCOMPLETE_MAX_AGE` seconds old, which bounds how stale they can be when there's more than
+one worker.
+"""
+
+import bisect
+import re
+import threading
+import time
+
+from django.conf import settings
+from django.db import transaction
+
+# Fuzzy lookups are only tried for terms at least this long.
+FUZZY_MIN_LENGTH = 3
+
+_indexes = {}
+
+
+def _normalize(text):
+    return " ".join(text.casefold().split())
+
+
+class PrefixIndex:
+    """A sorted index of one field of a model, matching prefixes of the field or its words."""
+
+    def __init__(self, model, field, words=True):
+        self.model = model
+        self.field = field
+        self.words = words
+        self._lock = threading.RLock()
+        self._loaded_at = None
+        self._keys = []
+        self._labels = {}
+        self._alphabet = set()
+
+    def _keys_for(self, label):
+        key = _normalize(label)
+        if not self.words:
+            return [key]
+        return [key[match.start() :] for match in re.finditer(r"\w+", key)] or [key]
+
+    def _insert(self, pk, label):
+        self._labels[pk] = label
+        for key in self._keys_for(label):
+            bisect.insort(self._keys, (key, pk))
+            self._alphabet.update(key)
+
+    def _remove(self, pk):
+        label = self._labels.pop(pk, None)
+        if label is None:
+            return
+        for key in self._keys_for(label):
+            i = bisect.bisect_left(self._keys, (key, pk))
+            if i < len(self._keys) and self._keys[i] == (key, pk):
+                del self._keys[i]
+
+    def load(self):
+        """(Re)build the index from the database."""
+        rows = self.model._default_manager.values_list("pk", self.field)
+        keys, labels, alphabet = [], {}, set()
+        for pk, label in rows.iterator():
+            labels[pk] = label
+            for key in self._keys_for(label):
+                keys.append((key, pk))
+                alphabet.update(key)
+        keys.sort()
+
+        with self._lock:
+            self._keys, self._labels, self._alphabet = keys, labels, alphabet
+            self._loaded_at = time.monotonic()
+
+    def clear(self):
+        """Empty the index, so it's rebuilt the next time it's used."""
+        with self._lock:
+            self._keys, self._labels, self._alphabet = [], {}, set()
+            self._loaded_at = None
+
+    def _ensure_loaded(self):
+        loaded_at = self._loaded_at
+        if (
+            loaded_at is None
+            or time.monotonic() - loaded_at > settings.AUTOCOMPLETE_MAX_AGE
+        ):
+            self.load()
+
+    def update(self, pk, label):
+        """Add or replace an object once the current transaction commits."""
+
+        def apply():
+            with self._lock:
+                if self._loaded_at is not None:
+                    self._remove(pk)
+                    self._insert(pk, label)
+
+        transaction.on_commit(apply)
+
+    def delete(self, pk):
+        """Remove an object once the current transaction commits."""
+
+        def apply():
+            with self._lock:
+                self._remove(pk)
+
+        transaction.on_commit(apply)
+
+    def _prefix(self, term, found, limit):
+        keys = self._keys
+        i = bisect.bisect_left(keys, (term,))
+        while i < len(keys) and keys[i][0].startswith(term):
+            if limit is not None and len(found) >= limit:
+                return
+            found.setdefault(keys[i][1], None)
+            i += 1
+
+    def _variants(self, term):
+        """Yield every string within one edit of `term`, using the index's alphabet."""
+        alphabet = sorted(self._alphabet)
+        for i in range(len(term)):
+            yield term[:i] + term[i + 1 :]
+            if i + 1 < len(term):
+                yield term[:i] + term[i + 1] + term[i] + term[i + 2 :]
+            for char in alphabet:
+                if char != term[i]:
+                    yield term[:i] + char + term[i + 1 :]
+        for i in range(len(term) + 1):
+            for char in alphabet:
+                yield term[:i] + char + term[i:]
+
+    def search(self, term, limit=10, fuzzy=True):
+        """Return up to `limit` `(pk, label)` pairs whose field, or a word of it, starts with
+        `term`.
+
+        If there aren't enough prefix matches, and `fuzzy` is true, matches for terms one edit
+        away from `term` are added after them. A `limit` of None returns every prefix match.
+        """
+        term = _normalize(term)
+        if not term:
+            return []
+
+        self._ensure_loaded()
+        with self._lock:
+            found = {}
+            self._prefix(term, found, limit)
+            if (
+                fuzzy
+                and limit is not None
+                and len(found) < limit
+                and len(term) >= FUZZY_MIN_LENGTH
+            ):
+                for variant in self._variants(term):
+                    self._prefix(variant, found, limit)
+                    if len(found) >= limit:
+                        break
+            return [(pk, self._labels[pk]) for pk in found]
+
+
+def register(name, model, field, words=True):
+    """Create and register the index called `name`."""
+    index = _indexes[name] = PrefixIndex(model, field, words=words)
+    return index
+
+
+def get_index(name):
+    return _indexes[name]
+
+
+def get_indexes():
+    return dict(_indexes)
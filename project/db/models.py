@@ -1,12 +1,243 @@
+from contextlib import contextmanager
+from contextvars import ContextVar
+
 from django.core.serializers import serialize
 from django.db.models import Model
+from django.db.models import Prefetch
+from django.db.models.fields.related_descriptors import ForwardManyToOneDescriptor
+from django.db.models.fields.related_descriptors import ReverseManyToOneDescriptor
+
+# Serialized objects, keyed by model, primary key, format and selection, while a memo is active.
+_memo = ContextVar("serialization_memo", default=None)
+
+
+@contextmanager
+def serialization_memo():
+    """Serialize each object at most once per selection while the context is active.
+
+    Used when one request serializes the same objects many times, like a batch of API requests
+    that each embed the same workout. Serialized objects are shared, so they must not be
+    modified.
+    """
+    token = _memo.set({})
+    try:
+        yield
+    finally:
+        _memo.reset(token)
+
+
+def _split(value):
+    return [part.strip() for part in (value or "").split(",") if part.strip()]
+
+
+def _relation(model, name):
+    """Return the descriptor of relation `name` of `model`, or None if it isn't one.
+
+    `name` is either a foreign key or a name in `serialize_related` for a related manager.
+    """
+    attribute = model.serialize_related.get(name, name)
+    descriptor = getattr(model, attribute, None)
+    if isinstance(descriptor, ReverseManyToOneDescriptor):
+        return descriptor
+    if isinstance(descriptor, ForwardManyToOneDescriptor) and name == attribute:
+        return descriptor
+    return None
+
+
+def _related_model(descriptor):
+    if isinstance(descriptor, ReverseManyToOneDescriptor):
+        return descriptor.field.model
+    return descriptor.field.related_model
+
+
+class Selection:
+    """Which fields of a model to serialize, and which of its relations to expand.
+
+    `fields` is a set of field names, or None for every field. `expand` maps the name of each
+    expanded relation to the selection for the related model. A relation that isn't expanded is
+    serialized as a primary key if it's a foreign key, and left out otherwise, unless it's a
+    related list named in `fields`, which is expanded with its default selection. Expanding a
+    name that isn't a relation has no effect.
+    """
+
+    def __init__(self, fields=None, expand=None):
+        self.fields = fields
+        self.expand = expand or {}
+
+    @classmethod
+    def parse(cls, fields=None, expand=None):
+        """Build a selection from comma-separated, dotted paths.
+
+        `expand="workout.intervals"` expands a session's workout and its intervals.
+        `fields="timestamp,workout.name"` selects the session's timestamp and its workout's name,
+        expanding the workout.
+        """
+        root = cls()
+        for path in _split(expand):
+            node = root
+            for name in path.split("."):
+                node = node.expand.setdefault(name, cls())
+
+        for path in _split(fields):
+            *names, field = path.split(".")
+            node = root
+            for name in names:
+                node = node.expand.setdefault(name, cls())
+            if node.fields is None:
+                node.fields = set()
+            node.fields.add(field)
+
+        return root
+
+    @classmethod
+    def default(cls, model):
+        """Return the selection for the full payload of `model`."""
+        return cls(
+            expand={
+                name: cls.default(_related_model(_relation(model, name)))
+                for name in model.default_expand
+            }
+        )
+
+    def expanded(self, model):
+        """Return the relations of `model` to expand, mapped to the selection for each."""
+        expand = dict(self.expand)
+        for name in self.fields or ():
+            descriptor = _relation(model, name)
+            if name not in expand and isinstance(
+                descriptor, ReverseManyToOneDescriptor
+            ):
+                expand[name] = Selection.default(_related_model(descriptor))
+        return expand
+
+    def key(self):
+        """Return a hashable key that's equal for equal selections."""
+        return (
+            None if self.fields is None else tuple(sorted(self.fields)),
+            tuple(sorted((name, child.key()) for name, child in self.expand.items())),
+        )
+
+    def wants(self, name):
+        return self.fields is None or name in self.fields or name in self.expand
+
+    def concrete_fields(self, model):
+        """Return the names of the selected model fields of `model`, in model order."""
+        return [
+            field.name
+            for field in model._meta.concrete_fields + model._meta.many_to_many
+            if not field.primary_key
+            and field.name not in model.excluded_fields
+            and self.wants(field.name)
+        ]
+
+    def _plan(self, model, prefix, only, select_related, prefetch):
+        only.append(prefix + model._meta.pk.name)
+        many_to_many = {field.name for field in model._meta.many_to_many}
+        for name in self.concrete_fields(model):
+            if name not in many_to_many:
+                only.append(prefix + name)
+
+        for name, selection in self.expanded(model).items():
+            descriptor = _relation(model, name)
+            if descriptor is None or name in model.excluded_fields:
+                continue
+
+            related = _related_model(descriptor)
+            if isinstance(descriptor, ReverseManyToOneDescriptor):
+                # The related objects need their foreign key back to this model to be matched
+                # up with it.
+                field = descriptor.field.name
+                child = Selection(
+                    None if selection.fields is None else selection.fields | {field},
+                    selection.expand,
+                )
+                prefetch.append(
+                    Prefetch(
+                        prefix + model.serialize_related[name],
+                        queryset=child.apply(related._default_manager.all()),
+                    )
+                )
+            else:
+                select_related.append(prefix + name)
+                selection._plan(
+                    related, f"{prefix}{name}__", only, select_related, prefetch
+                )
+
+    def apply(self, queryset):
+        """Return `queryset`, loading only what this selection serializes.
+
+        Only selected fields are loaded, expanded foreign keys are followed with
+        `select_related` and expanded reverse relations are prefetched. Relations that aren't
+        expanded aren't loaded at all.
+        """
+        only, select_related, prefetch = [], [], []
+        self._plan(queryset.model, "", only, select_related, prefetch)
+        return (
+            queryset.select_related(None)
+            .prefetch_related(None)
+            .select_related(*select_related)
+            .prefetch_related(*prefetch)
+            .only(*only)
+        )
 
 
 class SerializableModel(Model):
+    """A model that can be serialized to a dictionary for the JSON API.
+
+    Subclasses describe their payload with class attributes:
+
+    - `excluded_fields`, model fields that are never serialized.
+    - `serialize_related`, names of values that aren't model fields, mapped to the attribute
+      holding them. A related manager is serialized as a list of related objects, and only when
+      it's expanded. Anything else is serialized as is.
+    - `default_expand`, the relations expanded when no selection is given.
+    """
+
+    excluded_fields = []
+    serialize_related = {}
+    default_expand = []
+
     class Meta:
         abstract = True
 
-    def serialize(self, format="python"):
-        obj = serialize(format, [self])[0]["fields"]
+    def serialize(self, format="python", selection=None):
+        if selection is None:
+            selection = Selection.default(type(self))
+
+        memo = _memo.get()
+        if memo is not None:
+            key = (self._meta.label, self.pk, format, selection.key())
+            if key not in memo:
+                memo[key] = self._serialize(format, selection)
+            return memo[key]
+        return self._serialize(format, selection)
+
+    def _serialize(self, format, selection):
+        fields = selection.concrete_fields(type(self))
+        obj = serialize(format, [self], fields=fields)[0]["fields"]
         obj["id"] = self.pk
+
+        expand = selection.expanded(type(self))
+        for name, child in expand.items():
+            # Names that aren't relations can't be expanded, so they're serialized as is.
+            if (
+                name in obj
+                and name not in self.serialize_related
+                and _relation(type(self), name) is not None
+            ):
+                related = getattr(self, name)
+                obj[name] = (
+                    None if related is None else related.serialize(format, child)
+                )
+
+        for name, attribute in self.serialize_related.items():
+            if _relation(type(self), name) is not None:
+                if name in expand:
+                    obj[name] = [
+                        related.serialize(format, expand[name])
+                        for related in getattr(self, attribute).all()
+                    ]
+            elif selection.wants(name):
+                obj[name] = getattr(self, attribute)
+
         return obj
@@ -0,0 +1,127 @@
+"""Database routing for read replicas.
+
+Reads are spread over the aliases listed in ``settings.DATABASE_REPLICAS`` and writes always go
+to the primary (``default``) database. As soon as a write is executed on the primary, reads for
+the rest of the request are pinned to the primary, and `ReplicaPinningMiddleware` keeps them
+pinned for a short while afterwards so users always see their own writes. Code that runs outside
+a request and needs to read its own writes should use `use_primary`.
+"""
+
+import random
+from contextlib import contextmanager
+from contextvars import ContextVar
+
+from django.conf import settings
+from django.db import DEFAULT_DB_ALIAS
+from django.db import connections
+from django.db import router
+
+
+class _RoutingState:
+    def __init__(self, pinned=False):
+        self.pinned = pinned
+        self.written = False
+
+
+_state = ContextVar("replica_routing_state", default=None)
+
+# The first word of the statements that change the database.
+WRITE_STATEMENTS = {"INSERT", "UPDATE", "DELETE", "REPLACE"}
+
+
+def _is_write(sql):
+    words = sql.split(None, 1)
+    return bool(words) and words[0].upper() in WRITE_STATEMENTS
+
+
+def _record_write(execute, sql, params, many, context):
+    result = execute(sql, params, many, context)
+    state = _state.get()
+    if state is not None and _is_write(sql):
+        state.written = True
+        state.pinned = True
+    return result
+
+
+def begin(pinned=False):
+    """Start a new routing scope, returning a token for `end`.
+
+    Until the scope ends, writes executed on the primary database in this thread pin it.
+    """
+    connections[DEFAULT_DB_ALIAS].execute_wrappers.append(_record_write)
+    return _state.set(_RoutingState(pinned))
+
+
+def end(token):
+    """End the routing scope started by `begin`. Returns True if the scope wrote anything."""
+    written = _state.get().written
+    _state.reset(token)
+    connections[DEFAULT_DB_ALIAS].execute_wrappers.remove(_record_write)
+    return written
+
+
+def is_pinned():
+    """Return True if reads in the current scope must go to the primary database."""
+    state = _state.get()
+    return state is not None and state.pinned
+
+
+@contextmanager
+def use_primary():
+    """Send all reads inside the block to the primary database."""
+    token = begin(pinned=True)
+    try:
+        yield
+    finally:
+        written = end(token)
+        state = _state.get()
+        if written and state is not None:
+            state.written = True
+            state.pinned = True
+
+
+def get_replicas():
+    return [alias for alias in settings.DATABASE_REPLICAS if alias in connections]
+
+
+class PrimaryReplicaRouter:
+    """Route reads to a randomly chosen replica and writes to the primary database."""
+
+    def db_for_read(self, model, **hints):
+        if is_pinned():
+            return DEFAULT_DB_ALIAS
+
+        # Keep related lookups on the database the instance was loaded from.
+        instance = hints.get("instance")
+        if instance is not None and instance._state.db:
+            return instance._state.db
+
+        replicas = get_replicas()
+        if not replicas:
+            return DEFAULT_DB_ALIAS
+        return random.choice(replicas)
+
+    def db_for_write(self, model, **hints):
+        # Django also asks for the write database before reads, e.g. to open a transaction for an
+        # admin change form, so pinning waits for a write to actually execute.
+        return DEFAULT_DB_ALIAS
+
+    def allow_relation(self, obj1, obj2, **hints):
+        # Replicas are copies of the primary, so any two objects can be related.
+        return True
+
+    def allow_migrate(self, db, app_label, model_name=None, **hints):
+        # Replicas are populated by copying the primary, never by migrating them directly.
+        return db not in settings.DATABASE_REPLICAS
+
+
+def connection_for_read(model, instance=None, using=None):
+    """Return the database connection raw SQL reading from `model` should use.
+
+    An explicit `using` alias always wins. Otherwise the connection is chosen by the database
+    routers, just like an ORM query on `model` would be.
+    """
+    if using is None:
+        hints = {} if instance is None else {"instance": instance}
+        using = router.db_for_read(model, **hints)
+    return connections[using]
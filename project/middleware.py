@@ -0,0 +1,65 @@
+from http import HTTPStatus
+
+from django.conf import settings
+from django.http import HttpResponse
+
+from project.db import routers
+from users import tokens
+
+
+class ReplicaPinningMiddleware:
+    """Pin a client's reads to the primary database for a while after it writes.
+
+    Replicas lag behind the primary, so without this a user could save something and then not
+    see it on the next page. The pin is kept in a cookie rather than the session, because the
+    session itself is read through the router.
+    """
+
+    def __init__(self, get_response):
+        self.get_response = get_response
+
+    def __call__(self, request):
+        cookie_name = settings.REPLICA_PIN_COOKIE_NAME
+        token = routers.begin(pinned=cookie_name in request.COOKIES)
+        try:
+            response = self.get_response(request)
+        finally:
+            written = routers.end(token)
+
+        if written:
+            response.set_cookie(
+                cookie_name,
+                "1",
+                max_age=settings.REPLICA_PIN_SECONDS,
+                httponly=True,
+                samesite="Lax",
+            )
+        return response
+
+
+class TokenAuthenticationMiddleware:
+    """Authenticate API requests with a signed `Authorization: Bearer` token.
+
+    A valid token replaces the session user, so neither the session nor the user is loaded from
+    the database. Requests with a bad token are refused rather than treated as anonymous. Tokens
+    aren't sent by browsers on their own, so requests using them don't need CSRF protection.
+
+    Must come after `AuthenticationMiddleware`.
+    """
+
+    def __init__(self, get_response):
+        self.get_response = get_response
+
+    def __call__(self, request):
+        scheme, _, token = request.META.get("HTTP_AUTHORIZATION", "").partition(" ")
+        if request.path_info.startswith("/api/") and scheme.lower() == "bearer":
+            payload = tokens.verify(token.strip())
+            if payload is None:
+                response = HttpResponse(status=HTTPStatus.UNAUTHORIZED)
+                response["WWW-Authenticate"] = 'Bearer error="invalid_token"'
+                return response
+
+            request.user = tokens.get_user(payload)
+            request.token = payload
+            request._dont_enforce_csrf_checks = True
+        return self.get_response(request)
@@ -0,0 +1,14 @@
+"""MessagePack encoding for API responses.
+
+Anything the `msgpack` package can't encode itself is passed to `default`, which should return a
+value it can. See https://github.com/msgpack/msgpack/blob/master/spec.md for the format.
+"""
+
+import msgpack
+
+CONTENT_TYPE = "application/msgpack"
+
+
+def packb(obj, default=None):
+    """Return `obj` encoded as MessagePack."""
+    return msgpack.packb(obj, default=default, use_bin_type=True)
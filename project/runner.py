@@ -0,0 +1,223 @@
+"""A test runner that sets up test databases from a prebuilt snapshot.
+
+Migrating a fresh test database and loading fixtures into it dominates the time taken by a
+short test run. `SnapshotTestRunner` does both once, saves the result as a SQLite template in
+`TEST_SNAPSHOT_DIR`, and on later runs copies the template into each in-memory test database
+with the SQLite backup API.
+
+A template is keyed by a hash of every migration, the `TEST_SNAPSHOT_FIXTURES` and the Django
+version, so changing any of them builds a new one. Databases are only cloned for parallel test
+processes once the fixtures are loaded, so each process starts with its own copy of them.
+
+Test cases still declare the fixtures they use, so they pass under any runner, but `TestCase`
+classes skip loading those in `TEST_SNAPSHOT_FIXTURES`, which are already in every test
+database. Test cases that flush the database, like `TransactionTestCase`, remove them and load
+their fixtures as usual. `serialized_rollback` isn't supported when a snapshot is used.
+"""
+
+import hashlib
+import os
+import sqlite3
+import sys
+import tempfile
+import unittest
+from contextlib import closing
+from pathlib import Path
+
+import django
+from django.apps import apps
+from django.conf import settings
+from django.core.management import call_command
+from django.db import DEFAULT_DB_ALIAS
+from django.db import connections
+from django.test import TestCase
+from django.test.runner import DiscoverRunner
+from django.test.utils import get_unique_databases_and_mirrors
+from django.test.utils import setup_databases
+
+
+def _test_cases(suite):
+    """Yield every test in `suite`, including those split up for parallel processes."""
+    for test in getattr(suite, "subsuites", suite):
+        if isinstance(test, unittest.TestSuite):
+            yield from _test_cases(test)
+        else:
+            yield test
+
+
+def _fixture_label(name):
+    # "workouts" and "workouts.json" name the same fixture.
+    return name.split(".")[0]
+
+
+def _test_databases(test_databases):
+    """Yield each test database's name and its aliases, with the one to create first."""
+    for db_name, aliases in test_databases.values():
+        yield db_name, sorted(aliases, key=lambda alias: alias != DEFAULT_DB_ALIAS)
+
+
+class SnapshotTestRunner(DiscoverRunner):
+    def build_suite(self, *args, **kwargs):
+        suite = super().build_suite(*args, **kwargs)
+        self.skip_snapshot_fixtures(suite)
+        return suite
+
+    def skip_snapshot_fixtures(self, suite):
+        """Stop `TestCase` classes in `suite` loading fixtures the test databases already have."""
+        loaded = {_fixture_label(name) for name in settings.TEST_SNAPSHOT_FIXTURES}
+        for test_class in {type(test) for test in _test_cases(suite)}:
+            if issubclass(test_class, TestCase) and test_class.fixtures:
+                test_class.fixtures = [
+                    name
+                    for name in test_class.fixtures
+                    if _fixture_label(name) not in loaded
+                ]
+
+    def snapshot_key(self):
+        """Return a key that changes whenever the migrated, fixture-loaded database would."""
+        digest = hashlib.sha256(django.get_version().encode())
+        for app_config in apps.get_app_configs():
+            for path in sorted((Path(app_config.path) / "migrations").glob("*.py")):
+                digest.update(f"{app_config.label}/{path.name}".encode())
+                digest.update(path.read_bytes())
+        for name in settings.TEST_SNAPSHOT_FIXTURES:
+            digest.update(name.encode())
+            digest.update(self.find_fixture(name).read_bytes())
+        return digest.hexdigest()[:16]
+
+    def find_fixture(self, name):
+        directories = [
+            Path(app_config.path) / "fixtures" for app_config in apps.get_app_configs()
+        ]
+        directories += [Path(directory) for directory in settings.FIXTURE_DIRS]
+        for directory in directories:
+            if (directory / name).is_file():
+                return directory / name
+        raise FileNotFoundError(f"No fixture named '{name}' found.")
+
+    def can_snapshot(self, test_databases):
+        if self.keepdb:
+            return False
+        for db_name, aliases in _test_databases(test_databases):
+            creation = connections[aliases[0]].creation
+            if connections[aliases[0]].vendor != "sqlite":
+                return False
+            if not creation.is_in_memory_db(creation._get_test_db_name()):
+                return False
+        return True
+
+    def template_path(self, key, alias):
+        return Path(settings.TEST_SNAPSHOT_DIR) / f"{alias}-{key}.sqlite3"
+
+    def setup_databases(self, **kwargs):
+        test_databases, mirrored_aliases = get_unique_databases_and_mirrors(
+            kwargs.get("aliases")
+        )
+        if not self.can_snapshot(test_databases):
+            return self.create_databases(test_databases, **kwargs)
+
+        key = self.snapshot_key()
+        templates = {
+            aliases[0]: self.template_path(key, aliases[0])
+            for db_name, aliases in _test_databases(test_databases)
+        }
+        if not all(path.exists() for path in templates.values()):
+            return self.create_databases(test_databases, templates=templates, **kwargs)
+
+        old_config = []
+        for db_name, aliases in _test_databases(test_databases):
+            first_alias = aliases[0]
+            self.restore_template(first_alias, templates[first_alias])
+            old_config.append((connections[first_alias], db_name, True))
+            self.clone_database(first_alias)
+
+            for alias in aliases[1:]:
+                old_config.append((connections[alias], db_name, False))
+                connections[alias].creation.set_as_test_mirror(
+                    connections[first_alias].settings_dict
+                )
+
+        for alias, mirror_alias in mirrored_aliases.items():
+            connections[alias].creation.set_as_test_mirror(
+                connections[mirror_alias].settings_dict
+            )
+
+        if self.debug_sql:
+            for alias in connections:
+                connections[alias].force_debug_cursor = True
+
+        return old_config
+
+    def create_databases(self, test_databases, templates=None, **kwargs):
+        """Create and migrate the test databases, load the fixtures, then clone them.
+
+        The databases are only cloned for parallel test processes after the fixtures are
+        loaded, and saved as `templates`, if given, before.
+        """
+        old_config = setup_databases(
+            self.verbosity,
+            self.interactive,
+            time_keeper=self.time_keeper,
+            keepdb=self.keepdb,
+            debug_sql=self.debug_sql,
+            parallel=0,
+            **kwargs,
+        )
+        self.load_fixtures(test_databases)
+        for alias, path in (templates or {}).items():
+            self.save_template(alias, path)
+        for db_name, aliases in _test_databases(test_databases):
+            self.clone_database(aliases[0])
+        return old_config
+
+    def clone_database(self, alias):
+        """Clone the test database for `alias` for each parallel test process."""
+        if self.parallel > 1:
+            for index in range(self.parallel):
+                connections[alias].creation.clone_test_db(
+                    suffix=str(index + 1),
+                    verbosity=self.verbosity,
+                    keepdb=self.keepdb,
+                )
+
+    def load_fixtures(self, test_databases):
+        if not settings.TEST_SNAPSHOT_FIXTURES:
+            return
+        for db_name, aliases in _test_databases(test_databases):
+            call_command(
+                "loaddata",
+                *settings.TEST_SNAPSHOT_FIXTURES,
+                database=aliases[0],
+                verbosity=0,
+            )
+
+    def save_template(self, alias, path):
+        """Copy the test database for `alias` to `path`, replacing older templates."""
+        path.parent.mkdir(parents=True, exist_ok=True)
+        for stale in path.parent.glob(f"{alias}-*.sqlite3"):
+            stale.unlink()
+
+        connection = connections[alias]
+        connection.ensure_connection()
+        # Write to a temporary file first, so concurrent runs never see half a template.
+        fd, temporary = tempfile.mkstemp(dir=path.parent, suffix=".tmp")
+        os.close(fd)
+        with closing(sqlite3.connect(temporary)) as target:
+            connection.connection.backup(target)
+        os.replace(temporary, path)
+
+    def restore_template(self, alias, path):
+        """Point `alias` at its in-memory test database and fill it from `path`."""
+        connection = connections[alias]
+        test_database_name = connection.creation._get_test_db_name()
+        if self.verbosity >= 1:
+            sys.stderr.write(
+                f"Using test database snapshot {path.name} for alias '{alias}'...\n"
+            )
+
+        connection.close()
+        settings.DATABASES[alias]["NAME"] = test_database_name
+        connection.settings_dict["NAME"] = test_database_name
+        connection.ensure_connection()
+        with closing(sqlite3.connect(path)) as source:
+            source.backup(connection.connection)
@@ -36,6 +36,7 @@ INSTALLED_APPS = [
     "dashboard.apps.DashboardConfig",
     "landing.apps.LandingConfig",
     "workouts.apps.WorkoutsConfig",
+    "jobs.apps.JobsConfig",
     "django.contrib.admin",
     "django.contrib.auth",
     "django.contrib.contenttypes",
@@ -46,10 +47,12 @@ INSTALLED_APPS = [
 
 MIDDLEWARE = [
     "django.middleware.security.SecurityMiddleware",
+    "project.middleware.ReplicaPinningMiddleware",
     "django.contrib.sessions.middleware.SessionMiddleware",
     "django.middleware.common.CommonMiddleware",
     "django.middleware.csrf.CsrfViewMiddleware",
     "django.contrib.auth.middleware.AuthenticationMiddleware",
+    "project.middleware.TokenAuthenticationMiddleware",
     "django.contrib.messages.middleware.MessageMiddleware",
     "django.middleware.clickjacking.XFrameOptionsMiddleware",
 ]
@@ -85,6 +88,116 @@ DATABASES = {
     }
 }
 
+# Read replicas. Reads are spread over these aliases and writes go to "default". Local SQLite
+# copies of the primary stand in for real replicas; refresh them with `manage.py syncreplicas`.
+# E.g. DATABASE_REPLICAS = ["replica1", "replica2"]
+DATABASE_REPLICAS = []
+
+for alias in DATABASE_REPLICAS:
+    DATABASES[alias] = {
+        "ENGINE": "django.db.backends.sqlite3",
+        "NAME": BASE_DIR / f"db.{alias}.sqlite3",
+        "TEST": {"MIRROR": "default"},
+    }
+
+DATABASE_ROUTERS = ["project.db.routers.PrimaryReplicaRouter"]
+
+# How long reads stay on the primary database after a client writes something.
+REPLICA_PIN_SECONDS = 10
+REPLICA_PIN_COOKIE_NAME = "pin_primary"
+
+
+# Cache
+# https://docs.djangoproject.com/en/3.2/topics/cache/
+# The local memory cache is per process. Use a shared cache, like Memcached, when running more
+# than one worker so that invalidation reaches every process.
+
+CACHES = {
+    "default": {
+        "BACKEND": "django.core.cache.backends.locmem.LocMemCache",
+    }
+}
+
+# How long, in seconds, a rendered dashboard card is cached for.
+DASHBOARD_CARD_TIMEOUT = 60 * 60 * 24
+
+# How many session cards the dashboard loads at a time.
+DASHBOARD_FEED_PAGE_SIZE = 10
+
+# How many friends /api/friends/ returns at a time.
+FRIENDS_PAGE_SIZE = 20
+
+# The most seconds an in-memory autocomplete index is used for before it's rebuilt from the
+# database, which bounds how long changes made by other processes go unseen.
+AUTOCOMPLETE_MAX_AGE = 60 * 5
+
+
+# Batch API requests
+# The most sub-requests in one batch, and the most that run at once.
+
+BATCH_MAX_REQUESTS = 20
+BATCH_MAX_WORKERS = 4
+
+
+# API tokens
+# Tokens are valid for `API_TOKEN_MAX_AGE` seconds. Revoked tokens are listed in the
+# `API_TOKEN_CACHE` cache, which must be shared when running more than one worker.
+
+API_TOKEN_MAX_AGE = 60 * 60
+API_TOKEN_CACHE = "default"
+
+
+# Likes
+# Like actions are buffered in memory and written out every `LIKE_FLUSH_SECONDS`, or as soon as
+# `LIKE_FLUSH_SIZE` are waiting. None turns off the timed flush.
+
+LIKE_FLUSH_SECONDS = 2
+LIKE_FLUSH_SIZE = 500
+
+
+# Trending workouts
+# Seconds for the weight of a completion or like in a workout's trending score to halve. Run
+# `manage.py rebuildtrends` after changing it.
+
+TRENDING_HALF_LIFE = 60 * 60 * 24 * 3
+
+
+# Background jobs
+# How long an idle worker waits before looking for due jobs again, the longest wait between
+# attempts at a failing job, and how long a job can run before it's presumed lost and run again,
+# all in seconds.
+
+JOB_POLL_SECONDS = 1
+JOB_MAX_BACKOFF = 60 * 60
+JOB_TIMEOUT = 60 * 10
+
+
+# Catalog snapshot
+# A file of every workout, exercise, style and licence, pre-encoded, that worker processes
+# memory-map and share. Rebuilt whenever the catalog changes, or by `manage.py buildcatalog`.
+# None serves the catalog from the database.
+
+CATALOG_SNAPSHOT = None if DEBUG else BASE_DIR / "catalog.snapshot"
+
+
+# Delta sync
+# The most changes in one page of /api/sync/.
+
+SYNC_PAGE_SIZE = 500
+
+
+# Live sessions
+# The live event stream is served straight from the ASGI application, outside of Django's URL
+# routing. Its hub is per process, so run a single ASGI worker or pin friends to one worker.
+
+LIVE_STREAM_PATH = "/api/live/stream/"
+
+# Seconds between keepalive comments on an idle stream.
+LIVE_KEEPALIVE_SECONDS = 15
+
+# The most sessions with undelivered updates a stream can have before the oldest are dropped.
+LIVE_MAX_PENDING = 100
+
 
 # Password validation
 # https://docs.djangoproject.com/en/3.2/ref/settings/#auth-password-validators
@@ -127,6 +240,13 @@ STATICFILES_DIRS = [
     BASE_DIR / "project/static",
 ]
 
+# `collectstatic` builds the production assets here: content-hashed copies of every file, with
+# gzip and brotli copies alongside, served by `project.views.static`.
+STATIC_ROOT = BASE_DIR / "staticfiles"
+
+if not DEBUG:
+    STATICFILES_STORAGE = "project.storage.CompressedManifestStaticFilesStorage"
+
 # Default primary key field type
 # https://docs.djangoproject.com/en/3.2/ref/settings/#default-auto-field
 
@@ -136,6 +256,18 @@ AUTH_USER_MODEL = "users.User"
 LOGIN_URL = "/login/"
 LOGIN_REDIRECT_URL = "/dashboard/"
 
+# Admin changelists for tables with at least this many rows show an estimated count.
+ADMIN_ESTIMATED_COUNT_THRESHOLD = 10000
+
 # Dummy email backend that prints email to stdout.
 # https://docs.djangoproject.com/en/3.2/topics/email/
 EMAIL_BACKEND = "django.core.mail.backends.console.EmailBackend"
+
+# Testing
+# https://docs.djangoproject.com/en/3.2/topics/testing/advanced/#defining-a-test-runner
+# Test databases are copied from a migrated, fixture-loaded snapshot, rebuilt whenever the
+# migrations or fixtures change. Every test can use the snapshot fixtures.
+
+TEST_RUNNER = "project.runner.SnapshotTestRunner"
+TEST_SNAPSHOT_DIR = BASE_DIR / ".test-snapshots"
+TEST_SNAPSHOT_FIXTURES = ["workouts.json"]
@@ -0,0 +1,201 @@
+"""Compact, mergeable summaries of large streams of values.
+
+`KLLSketch` is the KLL quantile sketch from Karnin, Lang and Liberty, "Optimal Quantile
+Approximation in Streams" (2016). It keeps a few hundred of the values it has seen, each
+standing in for a power of two of them, and answers rank and quantile queries from those.
+
+`HyperLogLog` is the distinct counter from Flajolet et al., "HyperLogLog: the analysis of a
+near-optimal cardinality estimation algorithm" (2007), with the small range correction. It
+keeps one byte per register, the longest run of leading zeros seen in the hashes that land in
+it.
+"""
+
+import hashlib
+import math
+import random
+import struct
+import sys
+import zlib
+from array import array
+from bisect import bisect_left
+from bisect import bisect_right
+from itertools import accumulate
+
+# Version, k, n and the number of levels, followed by the number of values on each level and
+# then the values, in little-endian order.
+_HEADER = struct.Struct("<BHQB")
+_VERSION = 1
+
+
+class KLLSketch:
+    """A KLL quantile sketch of numbers.
+
+    With the default `k` of 200, an estimated rank is within about 2% of the number of values
+    seen, 99% of the time. The sketch keeps O(k) values however many it has seen, so updates,
+    queries and its size on disk don't grow with the stream.
+
+    Values are stored as doubles, so integers are exact up to 2**53.
+    """
+
+    def __init__(self, k=200, c=2 / 3):
+        self.k = k
+        self.c = c
+        self.n = 0
+        self.levels = [[]]
+        self._cdf = None
+
+    def __len__(self):
+        return self.n
+
+    def _capacity(self, level):
+        depth = len(self.levels) - level - 1
+        return int(math.ceil(self.k * self.c**depth)) + 1
+
+    def _max_size(self):
+        return sum(self._capacity(level) for level in range(len(self.levels)))
+
+    def _size(self):
+        return sum(len(items) for items in self.levels)
+
+    def update(self, value):
+        """Add `value` to the sketch."""
+        self.levels[0].append(value)
+        self.n += 1
+        self._cdf = None
+        if self._size() >= self._max_size():
+            self._compress()
+
+    def merge(self, other):
+        """Add every value summarised by `other` to this sketch."""
+        while len(self.levels) < len(other.levels):
+            self.levels.append([])
+        for level, items in enumerate(other.levels):
+            self.levels[level].extend(items)
+        self.n += other.n
+        self._cdf = None
+        while self._size() >= self._max_size():
+            self._compress()
+
+    def _compress(self):
+        # Compact the lowest level that's over capacity: sort it and promote every other
+        # value, from a random start, to the level above, where each value counts double.
+        for level, items in enumerate(self.levels):
+            if len(items) >= self._capacity(level):
+                if level + 1 == len(self.levels):
+                    self.levels.append([])
+                items.sort()
+                keep = [items.pop()] if len(items) % 2 else []
+                self.levels[level + 1].extend(items[random.getrandbits(1) :: 2])
+                self.levels[level] = keep
+                return
+
+    def _weighted(self):
+        if self._cdf is None:
+            pairs = sorted(
+                (value, 1 << level)
+                for level, items in enumerate(self.levels)
+                for value in items
+            )
+            values = [value for value, weight in pairs]
+            self._cdf = values, list(accumulate(weight for value, weight in pairs))
+        return self._cdf
+
+    def rank(self, value, inclusive=True):
+        """Estimate how many values seen are at most `value`, or below it if not `inclusive`."""
+        values, cumulative = self._weighted()
+        index = (bisect_right if inclusive else bisect_left)(values, value)
+        return cumulative[index - 1] if index else 0
+
+    def quantile(self, q):
+        """Estimate the value with a fraction `q` of the values seen at or below it."""
+        values, cumulative = self._weighted()
+        if not values:
+            return None
+        index = bisect_left(cumulative, q * cumulative[-1])
+        return values[min(index, len(values) - 1)]
+
+    def to_bytes(self):
+        counts = array("I", (len(items) for items in self.levels))
+        values = array("d", (value for items in self.levels for value in items))
+        if sys.byteorder == "big":
+            counts.byteswap()
+            values.byteswap()
+        header = _HEADER.pack(_VERSION, self.k, self.n, len(self.levels))
+        return header + counts.tobytes() + values.tobytes()
+
+    @classmethod
+    def from_bytes(cls, data):
+        version, k, n, height = _HEADER.unpack_from(data)
+        if version != _VERSION:
+            raise ValueError(f"Unknown sketch version {version}.")
+
+        offset = _HEADER.size
+        counts = array("I")
+        end = offset + counts.itemsize * height
+        counts.frombytes(data[offset:end])
+        values = array("d")
+        values.frombytes(data[end:])
+        if sys.byteorder == "big":
+            counts.byteswap()
+            values.byteswap()
+
+        sketch = cls(k)
+        sketch.n = n
+        sketch.levels = []
+        start = 0
+        for count in counts:
+            sketch.levels.append(list(values[start : start + count]))
+            start += count
+        return sketch
+
+
+class HyperLogLog:
+    """A HyperLogLog estimate of the number of distinct values added.
+
+    With the default precision `p` of 12 there are 4096 registers and the standard error of a
+    count is about 1.6%. Sketches with the same precision merge without losing anything, so
+    counts over any union of them are as accurate as a count over one.
+    """
+
+    def __init__(self, p=12, registers=None):
+        self.p = p
+        self.m = 1 << p
+        self.registers = bytearray(registers or self.m)
+
+    def add(self, value):
+        """Add `value`, which is hashed by its `str()`."""
+        digest = hashlib.blake2b(str(value).encode(), digest_size=8).digest()
+        hashed = int.from_bytes(digest, "little")
+        index = hashed & (self.m - 1)
+        rest = hashed >> self.p
+        # The position of the lowest set bit in the remaining 64 - p bits.
+        rho = (rest & -rest).bit_length() if rest else 64 - self.p + 1
+        if rho > self.registers[index]:
+            self.registers[index] = rho
+
+    def merge(self, other):
+        """Add every value counted by `other` to this sketch."""
+        if other.p != self.p:
+            raise ValueError("Can't merge sketches with different precisions.")
+        self.registers = bytearray(map(max, self.registers, other.registers))
+
+    def count(self):
+        """Estimate the number of distinct values added."""
+        alpha = 0.7213 / (1 + 1.079 / self.m)
+        estimate = alpha * self.m**2 / sum(2.0**-r for r in self.registers)
+        zeros = self.registers.count(0)
+        if estimate <= 2.5 * self.m and zeros:
+            estimate = self.m * math.log(self.m / zeros)
+        return round(estimate)
+
+    def to_bytes(self):
+        # Registers are mostly zero until thousands of values have been added, so they're
+        # compressed.
+        return bytes([_VERSION, self.p]) + zlib.compress(self.registers)
+
+    @classmethod
+    def from_bytes(cls, data):
+        version, p = data[0], data[1]
+        if version != _VERSION:
+            raise ValueError(f"Unknown sketch version {version}.")
+        return cls(p, zlib.decompress(data[2:]))
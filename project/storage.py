@@ -0,0 +1,64 @@
+"""Static file storage for production.
+
+`collectstatic` copies each file under a name with a hash of its content, so it can be cached
+for good, and writes gzip and brotli copies of text files next to it for `project.views.static`
+to serve. Brotli copies are only written when the `brotli` package is installed.
+"""
+
+import gzip
+import os
+
+from django.contrib.staticfiles.storage import ManifestStaticFilesStorage
+from django.core.files.base import ContentFile
+
+try:
+    import brotli
+except ImportError:
+    brotli = None
+
+# Extensions of files worth compressing. Images and fonts are compressed already.
+COMPRESSIBLE = {".css", ".js", ".svg", ".map", ".txt", ".json", ".html", ".xml"}
+
+# Files smaller than this many bytes gain little from compression.
+MIN_SIZE = 256
+
+
+def _encodings():
+    encodings = [("gz", lambda data: gzip.compress(data, compresslevel=9, mtime=0))]
+    if brotli is not None:
+        encodings.append(("br", lambda data: brotli.compress(data, quality=11)))
+    return encodings
+
+
+class CompressedManifestStaticFilesStorage(ManifestStaticFilesStorage):
+    """Hashed static files, with precompressed copies of the text files."""
+
+    def post_process(self, paths, dry_run=False, **options):
+        yield from super().post_process(paths, dry_run, **options)
+        if dry_run:
+            return
+
+        for name in sorted(set(self.hashed_files.values())):
+            for compressed in self.compress(name):
+                yield name, compressed, True
+
+    def compress(self, name):
+        """Write the compressed copies of `name`, returning their names."""
+        if os.path.splitext(name)[1].lower() not in COMPRESSIBLE:
+            return []
+
+        with self.open(name) as file:
+            data = file.read()
+        if len(data) < MIN_SIZE:
+            return []
+
+        written = []
+        for extension, compress in _encodings():
+            compressed = compress(data)
+            # Keep only copies that save something worth sending.
+            if len(compressed) < len(data) * 0.95:
+                target = f"{name}.{extension}"
+                if self.exists(target):
+                    self.delete(target)
+                written.append(self._save(target, ContentFile(compressed)))
+        return written
@@ -13,16 +13,27 @@ Including another URLconf
     1. Import the include() function: from django.urls import include, path
     2. Add a URL to urlpatterns:  path('blog/', include('blog.urls'))
 """
+
 from django.contrib import admin
+from django.conf import settings
 from django.urls import path
 from django.urls import include
+from django.urls import re_path
 
+from project.views import static
+from project.views.batch import BatchView
 
 urlpatterns = [
     path("", include("django.contrib.auth.urls")),
     path("", include("users.urls")),
     path("", include("landing.urls")),
     path("dashboard/", include("dashboard.urls")),
+    path("api/batch/", BatchView.as_view(), name="batch"),
     path("api/", include("workouts.urls")),
     path("admin/", admin.site.urls),
+    re_path(
+        rf"^{settings.STATIC_URL.lstrip('/')}(?P<path>.*)$",
+        static.serve,
+        name="static",
+    ),
 ]
@@ -0,0 +1,124 @@
+"""Many API requests in one round trip."""
+
+import copy
+import json
+import logging
+from concurrent.futures import ThreadPoolExecutor
+from contextvars import copy_context
+from http import HTTPStatus
+from urllib.parse import urlsplit
+
+from django.conf import settings
+from django.contrib.auth.mixins import LoginRequiredMixin
+from django.core.exceptions import PermissionDenied
+from django.db import connection
+from django.db import connections
+from django.http import Http404
+from django.http import HttpResponse
+from django.http import HttpResponseBadRequest
+from django.http import QueryDict
+from django.urls import Resolver404
+from django.urls import resolve
+from django.urls import reverse
+from django.views.generic import View
+
+from project.db.models import serialization_memo
+
+logger = logging.getLogger(__name__)
+
+
+class BatchView(LoginRequiredMixin, View):
+    """Answer several `GET` API requests at once.
+
+    The body is a JSON object with a list of `requests`, each with a `path` (including any query
+    string) and an optional `id`. The response has a matching list of `responses`, each with the
+    request's `id`, its `status` and its JSON `body`. A sub-request that fails gets its own
+    error status and a null body, without failing the others.
+
+    Sub-requests share the batch request's session and user, so authentication happens once,
+    and share a serialization memo, so objects that appear in several responses are serialized
+    once. They run concurrently on a thread pool, unless the batch is running inside a
+    transaction, which other threads' connections can't see.
+    """
+
+    raise_exception = True
+
+    def post(self, request, *args, **kwargs):
+        try:
+            items = json.loads(request.body)["requests"]
+            paths = [item["path"] for item in items]
+        except (ValueError, KeyError, TypeError):
+            return HttpResponseBadRequest()
+        if not all(isinstance(path, str) for path in paths):
+            return HttpResponseBadRequest()
+        if len(paths) > settings.BATCH_MAX_REQUESTS:
+            return HttpResponseBadRequest()
+
+        with serialization_memo():
+            if connection.in_atomic_block or len(paths) == 1:
+                results = [self.dispatch_one(path) for path in paths]
+            else:
+                workers = min(settings.BATCH_MAX_WORKERS, len(paths))
+                with ThreadPoolExecutor(max_workers=workers) as executor:
+                    futures = [
+                        executor.submit(
+                            copy_context().run, self.dispatch_threaded, path
+                        )
+                        for path in paths
+                    ]
+                    results = [future.result() for future in futures]
+
+        # Splice each JSON body in as it is, rather than decoding and encoding it again.
+        parts = []
+        for index, (item, (status, body)) in enumerate(zip(items, results)):
+            request_id = json.dumps(item.get("id", index)).encode()
+            parts.append(
+                b'{"id":%s,"status":%d,"body":%s}' % (request_id, status, body)
+            )
+        content = b'{"responses":[%s]}' % b",".join(parts)
+        return HttpResponse(content, content_type="application/json")
+
+    def dispatch_threaded(self, path):
+        try:
+            return self.dispatch_one(path)
+        finally:
+            # Each worker thread has its own connections, which Django won't close for it.
+            connections.close_all()
+
+    def dispatch_one(self, path):
+        """Run one sub-request, returning its status code and JSON body."""
+        url = urlsplit(path)
+        if not url.path.startswith("/api/") or url.path == reverse("batch"):
+            return HTTPStatus.BAD_REQUEST, b"null"
+
+        try:
+            match = resolve(url.path)
+        except Resolver404:
+            return HTTPStatus.NOT_FOUND, b"null"
+
+        request = copy.copy(self.request)
+        request.method = "GET"
+        request.path = request.path_info = url.path
+        request.GET = QueryDict(url.query)
+        request.META = {
+            **self.request.META,
+            "REQUEST_METHOD": "GET",
+            "PATH_INFO": url.path,
+            "QUERY_STRING": url.query,
+            "HTTP_ACCEPT": "application/json",
+        }
+        request.resolver_match = match
+
+        try:
+            response = match.func(request, *match.args, **match.kwargs)
+        except Http404:
+            return HTTPStatus.NOT_FOUND, b"null"
+        except PermissionDenied:
+            return HTTPStatus.FORBIDDEN, b"null"
+        except Exception:
+            logger.exception("Batch sub-request for %s failed", path)
+            return HTTPStatus.INTERNAL_SERVER_ERROR, b"null"
+
+        if response.streaming or response.get("Content-Type") != "application/json":
+            return response.status_code, b"null"
+        return response.status_code, response.content
@@ -1,28 +1,153 @@
+from django.core.serializers.json import DjangoJSONEncoder
+from django.http import HttpResponse
 from django.http import JsonResponse
+from django.utils.cache import patch_vary_headers
 
+from project import msgpack
 from project.db.models import SerializableModel
+from project.db.models import Selection
+
+JSON_CONTENT_TYPE = "application/json"
+
+# Media types a client can ask for, and the format each one gets. The first is the default.
+MEDIA_TYPES = {
+    JSON_CONTENT_TYPE: JSON_CONTENT_TYPE,
+    msgpack.CONTENT_TYPE: msgpack.CONTENT_TYPE,
+    "application/x-msgpack": msgpack.CONTENT_TYPE,
+    "application/vnd.msgpack": msgpack.CONTENT_TYPE,
+}
+
+
+def negotiate(accept):
+    """Return the response content type that best matches an `Accept` header.
+
+    Each media type gets the quality of the most specific range that matches it. Ties go to the
+    range the client listed first, then to JSON.
+    """
+    ranges = []
+    for index, item in enumerate((accept or "").split(",")):
+        media_range, *params = [part.strip() for part in item.split(";")]
+        q = 1.0
+        for param in params:
+            name, _, value = param.partition("=")
+            if name.strip() == "q":
+                try:
+                    q = float(value)
+                except ValueError:
+                    q = 0.0
+        if media_range:
+            ranges.append((media_range.lower(), q, index))
+
+    best, best_rank = JSON_CONTENT_TYPE, None
+    for media_type, content_type in MEDIA_TYPES.items():
+        main_type = media_type.split("/")[0]
+        matches = [
+            (specificity, q, index)
+            for media_range, q, index in ranges
+            for specificity, pattern in [
+                (2, media_type),
+                (1, f"{main_type}/*"),
+                (0, "*/*"),
+            ]
+            if media_range == pattern
+        ]
+        if not matches:
+            continue
+        specificity, q, index = max(matches, key=lambda match: match[0])
+        rank = (q, specificity, -index)
+        if q > 0 and (best_rank is None or rank > best_rank):
+            best, best_rank = content_type, rank
+    return best
+
+
+def dedupe(data, keys):
+    """Move every nested object stored under one of `keys` into a top-level `included` map.
+
+    Each object is replaced by its id and included once, under `included[keys[key]][id]`, so
+    shared objects like a workout's exercises are sent once however often they're used.
+    """
+    included = {name: {} for name in keys.values()}
+
+    def walk(value):
+        if isinstance(value, list):
+            return [walk(item) for item in value]
+        if not isinstance(value, dict):
+            return value
+
+        obj = {}
+        for key, item in value.items():
+            if key in keys and isinstance(item, dict) and "id" in item:
+                included[keys[key]].setdefault(str(item["id"]), walk(item))
+                obj[key] = item["id"]
+            else:
+                obj[key] = walk(item)
+        return obj
+
+    data = walk(data)
+    data["included"] = included
+    return data
 
 
 class JSONResponseMixin:
-    """A mixin that can be used to render a JSON response."""
+    """A mixin that can be used to render a JSON response.
+
+    Responses are compact JSON, or MessagePack for clients that ask for it in their `Accept`
+    header. With `?dedupe=1`, nested objects named in `dedupe_keys` are sent once each, in an
+    `included` map, and referred to by id.
+
+    Models are serialized in full unless the request asks for a sparse payload with `?fields=`
+    and `?expand=`, as parsed by `Selection.parse`.
+    """
+
+    dedupe_keys = {"exercise": "exercises", "style": "styles"}
 
     def render_to_json_response(self, context, **response_kwargs):
         """Returns a JSON response, transforming 'context' to make the payload."""
-        return JsonResponse(
-            self.get_data(context),
-            json_dumps_params={"indent": 2},
-            **response_kwargs,
-        )
+        data = self.get_data(context)
+        if self.request.GET.get("dedupe"):
+            data = dedupe(data, self.dedupe_keys)
+
+        content_type = negotiate(self.request.META.get("HTTP_ACCEPT"))
+        if content_type == msgpack.CONTENT_TYPE:
+            encoder = DjangoJSONEncoder()
+            response = HttpResponse(
+                msgpack.packb(data, default=encoder.default),
+                content_type=content_type,
+                **response_kwargs,
+            )
+        else:
+            response = JsonResponse(
+                data,
+                json_dumps_params={"separators": (",", ":")},
+                **response_kwargs,
+            )
+
+        patch_vary_headers(response, ["Accept"])
+        return response
+
+    def get_selection(self):
+        """Returns the requested `Selection`, or None if the full payload was requested."""
+        fields = self.request.GET.get("fields")
+        expand = self.request.GET.get("expand")
+        if fields is None and expand is None:
+            return None
+        return Selection.parse(fields, expand)
+
+    def select(self, queryset):
+        """Returns 'queryset', loading only what the requested payload needs."""
+        selection = self.get_selection() or Selection.default(queryset.model)
+        return selection.apply(queryset)
 
     def get_data(self, context):
         """Returns an object that will be serialized as JSON by json.dumps()."""
         context_object_name = getattr(self, "context_object_name")
         context_object = context.get(context_object_name)
+        selection = self.get_selection()
 
         if isinstance(context_object, SerializableModel):
-            data = context_object.serialize()
+            data = context_object.serialize(selection=selection)
         else:
-            data = [obj.serialize() for obj in context_object]
+            data = [obj.serialize(selection=selection) for obj in context_object]
 
         # TODO: Add status code
         return {"data": {context_object_name: data}}
@@ -0,0 +1,79 @@
+"""Serve collected static files, precompressed where the client accepts it."""
+
+import mimetypes
+import posixpath
+from pathlib import Path
+
+from django.conf import settings
+from django.contrib.staticfiles.storage import staticfiles_storage
+from django.http import FileResponse
+from django.http import Http404
+from django.http import HttpResponseNotModified
+from django.utils._os import safe_join
+from django.utils.cache import patch_vary_headers
+from django.utils.http import http_date
+from django.views.static import was_modified_since
+
+# Encodings written by `project.storage`, best first, with the extension of their files.
+ENCODINGS = [("br", "br"), ("gzip", "gz")]
+
+# Hashed names never change content, so clients can keep them for a year without asking again.
+IMMUTABLE = "public, max-age=31536000, immutable"
+
+
+def accepted_encodings(header):
+    """Return the content codings an `Accept-Encoding` header accepts."""
+    accepted = set()
+    for item in (header or "").split(","):
+        coding, *params = [part.strip() for part in item.split(";")]
+        q = 1.0
+        for param in params:
+            name, _, value = param.partition("=")
+            if name.strip() == "q":
+                try:
+                    q = float(value)
+                except ValueError:
+                    q = 0.0
+        if coding and q > 0:
+            accepted.add(coding.lower())
+    return accepted
+
+
+def serve(request, path):
+    """Serve `path` from `STATIC_ROOT`.
+
+    The brotli or gzip copy is sent instead of the file when there is one and the client
+    accepts it. Files with hashed names are marked immutable; others must be revalidated.
+    """
+    path = posixpath.normpath(path).lstrip("/")
+    try:
+        fullpath = Path(safe_join(settings.STATIC_ROOT, path))
+    except ValueError:
+        raise Http404("Not a static file.")
+    if not fullpath.is_file():
+        raise Http404("Not a static file.")
+
+    content_type = mimetypes.guess_type(path)[0] or "application/octet-stream"
+    accepted = accepted_encodings(request.META.get("HTTP_ACCEPT_ENCODING"))
+    encoding = None
+    for coding, extension in ENCODINGS:
+        compressed = fullpath.with_name(f"{fullpath.name}.{extension}")
+        if coding in accepted and compressed.is_file():
+            fullpath, encoding = compressed, coding
+            break
+
+    stat = fullpath.stat()
+    if not was_modified_since(
+        request.META.get("HTTP_IF_MODIFIED_SINCE"), stat.st_mtime, stat.st_size
+    ):
+        response = HttpResponseNotModified()
+    else:
+        response = FileResponse(fullpath.open("rb"), content_type=content_type)
+        response["Last-Modified"] = http_date(stat.st_mtime)
+        if encoding:
+            response["Content-Encoding"] = encoding
+
+    hashed = set(getattr(staticfiles_storage, "hashed_files", {}).values())
+    response["Cache-Control"] = IMMUTABLE if path in hashed else "no-cache"
+    patch_vary_headers(response, ["Accept-Encoding"])
+    return response
@@ -1,6 +1,8 @@
 from django.contrib import admin
 from django.contrib.auth.admin import UserAdmin
 
+from project.admin import PrefixSearchMixin
+
 from .models import User
 from .models import Friend
 
@@ -8,10 +10,12 @@ from .forms import CustomUserChangeFrom
 from .forms import CustomUserCreationForm
 
 
-class CustomUserAdmin(UserAdmin):
+class CustomUserAdmin(PrefixSearchMixin, UserAdmin):
     form = CustomUserChangeFrom
     add_form = CustomUserCreationForm
     search_fields = ("email",)
+    prefix_search_field = "email"
+    prefix_index = "user"
     ordering = ("email",)
 
 
@@ -0,0 +1,7 @@
+"""A prefix index of user email addresses, for admin autocomplete."""
+
+from project.autocomplete import register
+
+from .models import User
+
+users = register("user", User, "email", words=False)
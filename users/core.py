@@ -1,33 +1,140 @@
-from django.db import connection
+from datetime import datetime
+from datetime import timedelta
 
+from django.conf import settings
+from django.utils import timezone
+from django.utils.dateparse import parse_datetime
 
-def get_friends(user_id):
-    # Query the database using a connection managed by Django.
-    with connection.cursor() as cursor:
-        cursor.execute(
-            "SELECT friend.id, friend.first_name, friend.last_name "
-            "FROM users_user AS user "
-            "JOIN users_friend "
-            "ON users_friend.user_id = user.id "
+from project.db.routers import connection_for_read
+
+from .models import Friend
+
+EPOCH = datetime(1970, 1, 1, tzinfo=timezone.utc)
+
+
+def encode_cursor(friend):
+    """Return the cursor for the page of friends after `friend`."""
+    if friend["last_session"] is None:
+        return f".{friend['user_id']}"
+    micros = (friend["last_session"] - EPOCH) // timedelta(microseconds=1)
+    return f"{micros}.{friend['user_id']}"
+
+
+def decode_cursor(cursor):
+    """Return the last session and id in `cursor`, raising ValueError if it's malformed.
+
+    The last session is None for a friend who has never trained.
+    """
+    micros, friend_id = cursor.split(".")
+    friend_id = int(friend_id)
+    if not micros:
+        return None, friend_id
+    try:
+        return EPOCH + timedelta(microseconds=int(micros)), friend_id
+    except OverflowError:
+        raise ValueError(f"Invalid cursor: {cursor}")
+
+
+def _timestamp(value):
+    # SQLite returns the latest timestamp as text, in UTC.
+    if isinstance(value, str):
+        value = parse_datetime(value)
+    if value is not None and settings.USE_TZ and timezone.is_naive(value):
+        value = timezone.make_aware(value, timezone.utc)
+    return value
+
+
+def get_friends(user_id, cursor=None, limit=None, using=None):
+    """Return a user's friends with a summary of each one's training, most recently active first.
+
+    Each friend has the time of their last session, the name of its workout and how many
+    sessions they've completed, all found in one query: the user's friends are joined to their
+    sessions grouped by user, and the workout of each friend's last session is looked up on the
+    user and timestamp index. Friends who have never trained come last. Give `cursor` to start
+    after the friend it was made from, and `limit` for at most that many friends.
+    """
+    # Query the database using a connection managed by Django. Unless `using` names a database
+    # alias, the routers choose one, so this read can be served by a replica.
+    connection = connection_for_read(Friend, using=using)
+
+    where = "users_friend.user_id = %s"
+    params = [user_id, user_id]
+    if cursor:
+        last_session, friend_id = decode_cursor(cursor)
+        if last_session is None:
+            where += " AND activity.last_session IS NULL AND friend.id > %s"
+            params.append(friend_id)
+        else:
+            where += (
+                " AND (activity.last_session < %s "
+                "OR (activity.last_session = %s AND friend.id > %s) "
+                "OR activity.last_session IS NULL)"
+            )
+            # Compare with the timestamps as the database stores them.
+            last_session = connection.ops.adapt_datetimefield_value(last_session)
+            params += [last_session, last_session, friend_id]
+
+    limit_clause = ""
+    if limit is not None:
+        limit_clause = " LIMIT %s"
+        params.append(limit)
+
+    with connection.cursor() as db_cursor:
+        db_cursor.execute(
+            "SELECT friend.id, friend.first_name, friend.last_name, "
+            "activity.last_session, activity.session_count, "
+            "(SELECT workouts_workout.name "
+            "FROM workouts_session "
+            "JOIN workouts_workout "
+            "ON workouts_session.workout_id = workouts_workout.id "
+            "WHERE workouts_session.user_id = friend.id "
+            "ORDER BY workouts_session.timestamp DESC, workouts_session.id "
+            "LIMIT 1) AS last_workout "
+            "FROM users_friend "
             "JOIN users_user AS friend "
             "ON users_friend.friend_id = friend.id "
-            "WHERE user.id = %s;",
-            [user_id],
+            "LEFT JOIN ("
+            "SELECT user_id, MAX(timestamp) AS last_session, COUNT(*) AS session_count "
+            "FROM workouts_session "
+            "WHERE user_id IN "
+            "(SELECT friend_id FROM users_friend WHERE user_id = %s) "
+            "GROUP BY user_id"
+            ") AS activity "
+            "ON activity.user_id = friend.id "
+            f"WHERE {where} "
+            "ORDER BY activity.last_session IS NULL, activity.last_session DESC, friend.id"
+            f"{limit_clause};",
+            params,
         )
 
         # rows is a tuple of tuples
-        rows = cursor.fetchall()
+        rows = db_cursor.fetchall()
 
     # Create a list of dictionaries that can easily be serialized to JSON.
     # Each item in the list is a dictionary representation of a friend.
     friends = []
-    for friend_id, first_name, last_name in rows:
+    for pk, first_name, last_name, last_session, sessions, workout in rows:
         friends.append(
             {
-                "user_id": friend_id,
+                "user_id": pk,
                 "first_name": first_name,
                 "last_name": last_name,
+                "last_session": _timestamp(last_session),
+                "last_workout": workout,
+                "session_count": sessions or 0,
             }
         )
 
     return friends
+
+
+def get_friends_page(user_id, cursor=None, size=None, using=None):
+    """Return the page of a user's friends after `cursor`, and the cursor for the next page.
+
+    The next cursor is None on the last page.
+    """
+    size = size or settings.FRIENDS_PAGE_SIZE
+    friends = get_friends(user_id, cursor=cursor, limit=size + 1, using=using)
+    if len(friends) > size:
+        return friends[:size], encode_cursor(friends[size - 1])
+    return friends, None
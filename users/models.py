@@ -1,5 +1,5 @@
-from django.core.serializers import serialize
 from django.db import models
+from django.db.models.functions import Lower
 from django.contrib.auth.models import AbstractUser
 from django.contrib.auth.models import UserManager
 from django.contrib.auth.validators import UnicodeUsernameValidator
@@ -45,7 +45,7 @@ class CustomUserManager(UserManager):
         return self._create_user(email, username, password, **extra_fields)
 
 
-class User(AbstractUser):
+class User(SerializableModel, AbstractUser):
     username_validator = UnicodeUsernameValidator()
 
     username = models.CharField(
@@ -72,14 +72,13 @@ class User(AbstractUser):
     USERNAME_FIELD = "email"
     REQUIRED_FIELDS = []  # For createsuperuser only.
 
-    def serialize(self, format="python"):
-        obj = serialize(format, [self])[0]["fields"]
-        obj["id"] = self.pk
-        del obj["password"]
-        del obj["groups"]
-        del obj["user_permissions"]
-        del obj["is_superuser"]
-        return obj
+    excluded_fields = ["password", "groups", "user_permissions", "is_superuser"]
+
+    class Meta(AbstractUser.Meta):
+        indexes = [
+            # Backs the case-insensitive prefix search used by admin autocomplete.
+            models.Index(Lower("email"), name="user_email_lower_idx"),
+        ]
 
     def save(self, *args, **kwargs):
         if not self.email:
@@ -107,6 +106,8 @@ class Friend(SerializableModel):
 
     timestamp = models.DateTimeField(auto_now_add=True)
 
+    default_expand = ["friend"]
+
     class Meta:
         constraints = [
             models.UniqueConstraint(
@@ -117,8 +118,3 @@ class Friend(SerializableModel):
 
     def __str__(self):
         return f"{self.user.username} -> {self.friend.username}"
-
-    def serialize(self, format="python"):
-        obj = super().serialize(format)
-        obj["friend"] = self.friend.serialize(format)
-        return obj
@@ -0,0 +1,30 @@
+"""Signal handlers that keep derived user data in step with the users table."""
+
+from django.db.models.signals import post_delete
+from django.db.models.signals import post_save
+from django.dispatch import receiver
+
+from . import tokens
+from .autocomplete import users
+from .models import User
+
+# Changes to these fields revoke the user's API tokens, whose profiles would be out of date.
+TOKEN_FIELDS = {"password", "is_active", *tokens.PROFILE_FIELDS}
+
+
+@receiver(post_save, sender=User)
+def user_saved(sender, instance, update_fields=None, **kwargs):
+    if update_fields is None or "email" in update_fields:
+        users.update(instance.pk, instance.email)
+
+
+@receiver(post_save, sender=User)
+def user_changed(sender, instance, created, update_fields=None, **kwargs):
+    if not created and (update_fields is None or TOKEN_FIELDS & set(update_fields)):
+        tokens.revoke_user(instance.pk)
+
+
+@receiver(post_delete, sender=User)
+def user_deleted(sender, instance, **kwargs):
+    users.delete(instance.pk)
+    tokens.revoke_user(instance.pk)
@@ -1,10 +1,19 @@
+from datetime import timedelta
 from http import HTTPStatus
 from urllib.parse import urlencode
 
 from django.conf import settings
+from django.core.cache import cache
+from django.test import Client
 from django.test import TestCase
 from django.urls import reverse
+from django.utils import timezone
 
+from workouts.models import Session
+from workouts.models import Workout
+
+from .core import get_friends
+from .models import Friend
 from .models import User
 
 
@@ -88,3 +97,173 @@ class RegistrationTestCase(TestCase):
 
             self.assertEqual(response.status_code, HTTPStatus.FOUND)
             self.assertTrue(self.client.login(username=email, password=password))
+
+
+class ReplicaPinningTestCase(TestCase):
+    def test_pin_cookie_set_after_write(self):
+        """Test that a client that writes is pinned to the primary database."""
+        email, password = "testuser@example.com", "Passw0rd!!"
+        User.objects.create_user(email=email, password=password)
+        friend = User.objects.create_user(email="friend@example.com", password=password)
+        self.client.login(username=email, password=password)
+
+        response = self.client.get(reverse("users:friends"))
+        self.assertNotIn(settings.REPLICA_PIN_COOKIE_NAME, response.cookies)
+
+        response = self.client.post(reverse("users:makefriend", args=[friend.pk]))
+        self.assertIn(settings.REPLICA_PIN_COOKIE_NAME, response.cookies)
+
+    def test_pin_cookie_not_set_by_change_form(self):
+        """Test that viewing an admin change form, which opens a transaction, doesn't pin."""
+        email, password = "admin@example.com", "Passw0rd!!"
+        user = User.objects.create_superuser(email=email, password=password)
+        self.client.login(username=email, password=password)
+
+        response = self.client.get(reverse("admin:users_user_change", args=[user.pk]))
+        self.assertEqual(response.status_code, HTTPStatus.OK)
+        self.assertNotIn(settings.REPLICA_PIN_COOKIE_NAME, response.cookies)
+
+
+class FriendListTestCase(TestCase):
+    fixtures = ["workouts.json"]
+
+    def test_friends_activity(self):
+        """Test that friends come with their last activity, most recent first, a page at a time."""
+        password = "Passw0rd!!"
+        user = User.objects.create_user(email="testuser@example.com", password=password)
+        idle, lapsed, active, other = (
+            User.objects.create_user(
+                email=f"{name}@example.com", password=password, first_name=name
+            )
+            for name in ["idle", "lapsed", "active", "other"]
+        )
+        for friend in [idle, lapsed, active]:
+            Friend.objects.create(user=user, friend=friend)
+
+        first, second = Workout.objects.order_by("pk")[:2]
+        now = timezone.now()
+        Session.objects.create(user=lapsed, workout=first, timestamp=now - timedelta(7))
+        Session.objects.create(user=active, workout=first, timestamp=now - timedelta(3))
+        Session.objects.create(user=active, workout=second, timestamp=now)
+        Session.objects.create(user=other, workout=first, timestamp=now)
+
+        with self.assertNumQueries(1):
+            friends = get_friends(user.id)
+        self.assertEqual(
+            [
+                (
+                    f["first_name"],
+                    f["last_session"],
+                    f["last_workout"],
+                    f["session_count"],
+                )
+                for f in friends
+            ],
+            [
+                ("active", now, second.name, 2),
+                ("lapsed", now - timedelta(7), first.name, 1),
+                ("idle", None, None, 0),
+            ],
+        )
+
+        self.client.login(username="testuser@example.com", password=password)
+        url = reverse("users:friends")
+        names, cursor = [], None
+        with self.settings(FRIENDS_PAGE_SIZE=1):
+            for _ in range(3):
+                response = self.client.get(url, {"cursor": cursor} if cursor else {})
+                self.assertEqual(response.status_code, HTTPStatus.OK)
+                names += [f["first_name"] for f in response.json()["data"]]
+                cursor = response.json()["next"]
+        self.assertEqual(names, ["active", "lapsed", "idle"])
+        self.assertIsNone(cursor)
+
+        response = self.client.get(url, {"cursor": "nonsense"})
+        self.assertEqual(response.status_code, HTTPStatus.BAD_REQUEST)
+
+
+class TokenTestCase(TestCase):
+    fixtures = ["workouts.json"]
+
+    def setUp(self):
+        cache.clear()
+        self.email, self.password = "testuser@example.com", "Passw0rd!!"
+        self.user = User.objects.create_user(email=self.email, password=self.password)
+
+    def get_token(self):
+        response = self.client.post(
+            reverse("users:token"), {"email": self.email, "password": self.password}
+        )
+        self.assertEqual(response.status_code, HTTPStatus.OK)
+        return response.json()["data"]["token"]
+
+    def test_token(self):
+        """Test that API requests can be authenticated without touching the database."""
+        token = self.get_token()
+        url = reverse("workouts:plan", args=[3])
+        response = self.client.get(url, HTTP_AUTHORIZATION=f"Bearer {token}")
+        self.assertEqual(response.status_code, HTTPStatus.OK)
+
+        with self.assertNumQueries(0):
+            response = self.client.get(url, HTTP_AUTHORIZATION=f"Bearer {token}")
+        self.assertEqual(response.status_code, HTTPStatus.OK)
+
+        response = self.client.get(url, HTTP_AUTHORIZATION=f"Bearer {token}x")
+        self.assertEqual(response.status_code, HTTPStatus.UNAUTHORIZED)
+
+    def test_session_token_csrf(self):
+        """Test that tokens are only issued to logged in users with a CSRF token."""
+        client = Client(enforce_csrf_checks=True)
+        client.login(username=self.email, password=self.password)
+        response = client.post(reverse("users:token"))
+        self.assertEqual(response.status_code, HTTPStatus.FORBIDDEN)
+
+        client.get(reverse("index"))
+        response = client.post(
+            reverse("users:token"),
+            HTTP_X_CSRFTOKEN=client.cookies[settings.CSRF_COOKIE_NAME].value,
+        )
+        self.assertEqual(response.status_code, HTTPStatus.OK)
+
+        response = Client(enforce_csrf_checks=True).post(
+            reverse("users:token"), {"email": self.email, "password": self.password}
+        )
+        self.assertEqual(response.status_code, HTTPStatus.OK)
+
+    def test_bad_credentials(self):
+        """Test that tokens are only issued to authenticated users."""
+        response = self.client.post(
+            reverse("users:token"), {"email": self.email, "password": "wrong"}
+        )
+        self.assertEqual(response.status_code, HTTPStatus.UNAUTHORIZED)
+
+    def test_revoke(self):
+        """Test that revoked tokens are refused."""
+        token = self.get_token()
+        response = self.client.delete(
+            reverse("users:token"), HTTP_AUTHORIZATION=f"Bearer {token}"
+        )
+        self.assertEqual(response.status_code, HTTPStatus.NO_CONTENT)
+        response = self.client.get(
+            reverse("users:friends"), HTTP_AUTHORIZATION=f"Bearer {token}"
+        )
+        self.assertEqual(response.status_code, HTTPStatus.UNAUTHORIZED)
+
+    def test_revoke_on_change(self):
+        """Test that changing a user's password revokes their tokens."""
+        token = self.get_token()
+        self.user.set_password("N3wPassw0rd!!")
+        self.user.save()
+        response = self.client.get(
+            reverse("users:friends"), HTTP_AUTHORIZATION=f"Bearer {token}"
+        )
+        self.assertEqual(response.status_code, HTTPStatus.UNAUTHORIZED)
+
+    def test_expired(self):
+        """Test that expired tokens are refused."""
+        token = self.get_token()
+        with self.settings(API_TOKEN_MAX_AGE=-1):
+            response = self.client.get(
+                reverse("users:friends"), HTTP_AUTHORIZATION=f"Bearer {token}"
+            )
+        self.assertEqual(response.status_code, HTTPStatus.UNAUTHORIZED)
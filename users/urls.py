@@ -5,6 +5,7 @@ from . import views
 app_name = "users"
 urlpatterns = [
     path("register/", views.RegisterView.as_view(), name="register"),
+    path("api/token/", views.TokenView.as_view(), name="token"),
     path("api/friends/", views.FriendListView.as_view(), name="friends"),
     path(
         "api/friend/<int:friend>/", views.FriendCreateView.as_view(), name="makefriend"
@@ -1,5 +1,8 @@
+from http import HTTPStatus
+
 from django.conf import settings
 from django.utils.decorators import method_decorator
+from django.http import HttpResponseBadRequest
 from django.http import HttpResponseRedirect
 from django.http import HttpResponse
 
@@ -7,7 +10,10 @@ from django.contrib.auth import authenticate
 from django.contrib.auth import login
 from django.contrib.auth.mixins import LoginRequiredMixin
 
+from django.middleware.csrf import CsrfViewMiddleware
+
 from django.views.decorators.cache import never_cache
+from django.views.decorators.csrf import csrf_exempt
 from django.views.decorators.csrf import csrf_protect
 from django.views.decorators.debug import sensitive_post_parameters
 
@@ -22,7 +28,8 @@ from .forms import CustomUserCreationForm
 from .models import Friend
 from .models import User
 
-from .core import get_friends
+from . import tokens
+from .core import get_friends_page
 
 
 class RegisterView(FormView):
@@ -49,13 +56,25 @@ class RegisterView(FormView):
 
 
 class FriendListView(JSONResponseMixin, LoginRequiredMixin, View):
+    """A page of the current user's friends, most recently active first.
+
+    `next` is the cursor for the page after this one, to pass as `cursor`, or null on the last
+    page.
+    """
+
     raise_exception = True
 
     def get(self, request, *args, **kwargs):
-        return self.render_to_json_response({})
+        try:
+            friends, cursor = get_friends_page(
+                request.user.id, request.GET.get("cursor")
+            )
+        except ValueError:
+            return HttpResponseBadRequest()
+        return self.render_to_json_response({"friends": friends, "next": cursor})
 
     def get_data(self, context):
-        return {"data": get_friends(self.request.user.id)}
+        return {"data": context["friends"], "next": context["next"]}
 
 
 class FriendCreateView(JSONResponseMixin, LoginRequiredMixin, View):
@@ -77,3 +96,53 @@ class FriendCreateView(JSONResponseMixin, LoginRequiredMixin, View):
 
     def render_to_response(self, context, **response_kwargs):
         return self.render_to_json_response(context, **response_kwargs)
+
+
+@method_decorator(csrf_exempt, name="dispatch")
+class TokenView(JSONResponseMixin, View):
+    """Issue and revoke signed API tokens.
+
+    `POST` returns a new token for the logged in user, or for the user with the posted `email`
+    and `password`. Only requests with credentials skip the CSRF check. `DELETE` with a token
+    revokes it.
+    """
+
+    context_object_name = "token"
+
+    @method_decorator(sensitive_post_parameters())
+    def post(self, request, *args, **kwargs):
+        user = request.user
+        if user.is_authenticated:
+            # Browsers send the session cookie on their own, so only posted credentials are
+            # exempt from CSRF protection.
+            response = CsrfViewMiddleware(HttpResponse).process_view(
+                request, None, (), {}
+            )
+            if response is not None:
+                return response
+        else:
+            user = authenticate(
+                request,
+                username=request.POST.get("email"),
+                password=request.POST.get("password"),
+            )
+        if user is None:
+            return HttpResponse(status=HTTPStatus.UNAUTHORIZED)
+
+        return self.render_to_json_response(
+            {
+                self.context_object_name: tokens.issue(user),
+                "expires_in": settings.API_TOKEN_MAX_AGE,
+            }
+        )
+
+    def delete(self, request, *args, **kwargs):
+        payload = getattr(request, "token", None)
+        if payload is None:
+            return HttpResponse(status=HTTPStatus.UNAUTHORIZED)
+
+        tokens.revoke(payload)
+        return HttpResponse(status=HTTPStatus.NO_CONTENT)
+
+    def get_data(self, context):
+        return {"data": context}
@@ -1,7 +1,10 @@
 from django.contrib import admin
+from django.db.models import Prefetch
 
 import nested_admin
 
+from project.admin import EstimatedCountPaginator
+from project.admin import PrefixSearchMixin
 
 from .models import Session
 from .models import Workout
@@ -12,6 +15,7 @@ from .models import Scheme
 from .models import Licence
 from .models import MuscleGroupFeatures
 from .models import Performance
+from .search import SearchAdminMixin
 
 
 class PerformanceInline(admin.TabularInline):
@@ -32,8 +36,12 @@ class PerformanceInline(admin.TabularInline):
 
 class SessionAdmin(admin.ModelAdmin):
     list_display = ["get_session_description", "user", "workout", "timestamp"]
+    list_select_related = ["user", "workout"]
+    ordering = ["-timestamp"]
     inlines = [PerformanceInline]
     autocomplete_fields = ["workout", "user"]
+    paginator = EstimatedCountPaginator
+    show_full_result_count = False
 
     def get_form(self, request, obj=None, **kwargs):
         # Save the current session object on the request for the benefit of PerformanceInline.
@@ -59,9 +67,14 @@ class MuscleGroupFeaturesInline(admin.StackedInline):
     model = MuscleGroupFeatures
 
 
-class ExerciseAdmin(admin.ModelAdmin):
+class ExerciseAdmin(SearchAdminMixin, admin.ModelAdmin):
     list_display = ["name", "source", "get_licence"]
+    search_fields = ["name", "description"]
+    search_kind = "exercise"
+    list_select_related = ["licence"]
     inlines = [MuscleGroupFeaturesInline]
+    paginator = EstimatedCountPaginator
+    show_full_result_count = False
 
     @admin.display(description="Licence")
     def get_licence(self, obj):
@@ -95,11 +108,25 @@ class IntervalInline(nested_admin.NestedStackedInline):
     )
 
 
-class WorkoutAdmin(nested_admin.NestedModelAdmin):
+class WorkoutAdmin(PrefixSearchMixin, SearchAdminMixin, nested_admin.NestedModelAdmin):
     model = Workout
     list_display = ["name", "get_style", "rounds", "time_limit"]
     search_fields = ["name", "description"]
+    search_kind = "workout"
+    ordering = ["name"]
+    prefix_search_field = "name"
+    prefix_index = "workout"
     inlines = [IntervalInline]
+    paginator = EstimatedCountPaginator
+    show_full_result_count = False
+
+    def get_queryset(self, request):
+        intervals = Interval.objects.select_related("style")
+        return (
+            super()
+            .get_queryset(request)
+            .prefetch_related(Prefetch("interval_set", queryset=intervals))
+        )
 
     @admin.display(description="Style")
     def get_style(self, obj):
@@ -0,0 +1,88 @@
+"""Counts of the distinct athletes who completed a workout.
+
+Counting them exactly is a `COUNT(DISTINCT user_id)` over every session of the workout. Instead
+each workout has a `HyperLogLog` of the users who completed it on each day, and one for all time,
+updated by a background job for each new session. The count over any range of days is the count
+of the merged daily sketches, within a few percent, read from at most one row per day.
+
+Days are in the `TIME_ZONE` setting. Deleting a session doesn't take its athlete off the
+count.
+"""
+
+from datetime import timedelta
+
+from django.db import transaction
+from django.db.models import Q
+from django.utils import timezone
+
+from project.sketches import HyperLogLog
+
+from .models import AthleteSketch
+
+# The number of days, up to and including today, in each period `periods` counts.
+PERIODS = {"week": 7, "month": 30}
+
+
+def record(workout_id, user_id, timestamp):
+    """Count a user in the sketches of the day of `timestamp` and of all time."""
+    for day in [timezone.localdate(timestamp), None]:
+        with transaction.atomic():
+            row = (
+                AthleteSketch.objects.select_for_update()
+                .filter(workout_id=workout_id, day=day)
+                .first()
+            )
+            sketch = row.load() if row else HyperLogLog()
+            registers = bytes(sketch.registers)
+            sketch.add(user_id)
+            # Repeat athletes usually leave the sketch as it was.
+            if row is None or sketch.registers != registers:
+                AthleteSketch.objects.update_or_create(
+                    workout_id=workout_id,
+                    day=day,
+                    defaults={"data": sketch.to_bytes()},
+                )
+
+
+def count(workout_id, start=None, end=None):
+    """Estimate how many athletes completed a workout between two days, inclusive.
+
+    With neither day, count all time.
+    """
+    rows = AthleteSketch.objects.filter(workout_id=workout_id)
+    if start is None and end is None:
+        rows = rows.filter(day=None)
+    else:
+        rows = rows.filter(day__isnull=False)
+        if start is not None:
+            rows = rows.filter(day__gte=start)
+        if end is not None:
+            rows = rows.filter(day__lte=end)
+
+    sketch = HyperLogLog()
+    for row in rows:
+        sketch.merge(row.load())
+    return sketch.count()
+
+
+def periods(workout_id, today=None):
+    """Estimate how many athletes completed a workout in each of `PERIODS`, and all time.
+
+    Uses one query.
+    """
+    today = today or timezone.localdate()
+    start = today - timedelta(days=max(PERIODS.values()) - 1)
+    rows = AthleteSketch.objects.filter(workout_id=workout_id).filter(
+        Q(day=None) | Q(day__gte=start, day__lte=today)
+    )
+
+    sketches = {name: HyperLogLog() for name in [*PERIODS, "all_time"]}
+    for row in rows:
+        if row.day is None:
+            sketches["all_time"].merge(row.load())
+            continue
+        sketch = row.load()
+        for name, days in PERIODS.items():
+            if row.day > today - timedelta(days=days):
+                sketches[name].merge(sketch)
+    return {name: sketch.count() for name, sketch in sketches.items()}
@@ -0,0 +1,9 @@
+"""Prefix indexes of workout and exercise names, for typeahead and admin autocomplete."""
+
+from project.autocomplete import register
+
+from .models import Exercise
+from .models import Workout
+
+workouts = register("workout", Workout, "name")
+exercises = register("exercise", Exercise, "name")
@@ -0,0 +1,243 @@
+"""A memory-mapped snapshot of the encoded workout catalog.
+
+Serializing a workout touches its intervals, schemes, exercises and style, so the detail views
+are cheap to serve from encoded payloads. Rather than every worker process keeping its own copy
+of them, `build` writes every workout, exercise, style and licence, encoded as JSON and
+MessagePack, to one immutable file at `CATALOG_SNAPSHOT`. Workers map it into memory with
+`mmap`, so its pages are shared by every process on the host through the page cache.
+
+The file is a header, then an index for each kind of object, sorted by id, then the payloads:
+
+    header   magic, format version, build time in ns, number of kinds
+    kinds    for each kind: its name, the offset of its index and the number of entries
+    index    for each object: its id, then the offset and length of each encoding
+    payloads
+
+A new snapshot is written to a temporary file and renamed over the old one, so readers see
+either the old or the new file, never a partial one. The signal handlers in `workouts.signals`
+queue a rebuild whenever the catalog changes, and `get_snapshot` notices the new file on the
+next lookup.
+"""
+
+import json
+import mmap
+import os
+import struct
+import tempfile
+import threading
+import time
+from functools import lru_cache
+from pathlib import Path
+
+from django.conf import settings
+from django.core.serializers.json import DjangoJSONEncoder
+
+from jobs.models import Job
+from jobs.queue import task
+from project import msgpack
+from project.db.models import Selection
+from project.db.models import serialization_memo
+from project.views.generic import JSON_CONTENT_TYPE
+
+from .models import Exercise
+from .models import Licence
+from .models import Workout
+from .models import WorkoutStyle
+
+try:
+    import fcntl
+except ImportError:
+    fcntl = None
+
+MAGIC = b"GYMCATLG"
+FORMAT_VERSION = 1
+
+# The kinds of object in a snapshot, by the name each is served under.
+KINDS = {
+    "workout": Workout,
+    "exercise": Exercise,
+    "style": WorkoutStyle,
+    "licence": Licence,
+}
+
+# The encodings of each payload, in the order they're indexed.
+CONTENT_TYPES = [JSON_CONTENT_TYPE, msgpack.CONTENT_TYPE]
+
+_HEADER = struct.Struct("<8sBQB")
+_KIND = struct.Struct("<16sQI")
+# An id, then an offset and a length for each of `CONTENT_TYPES`.
+_ENTRY = struct.Struct("<Q" + "QI" * len(CONTENT_TYPES))
+
+
+def encode(data, content_type):
+    """Encode `data` exactly as `JSONResponseMixin` would for `content_type`."""
+    encoder = DjangoJSONEncoder()
+    if content_type == msgpack.CONTENT_TYPE:
+        return msgpack.packb(data, default=encoder.default)
+    return json.dumps(data, cls=DjangoJSONEncoder, separators=(",", ":")).encode()
+
+
+@lru_cache(maxsize=None)
+def envelope(name, content_type):
+    """Return the bytes before and after a payload in a `{"data": {name: payload}}` response."""
+    # Encode the envelope around a placeholder that encodes to a single known byte string.
+    placeholder = encode(None, content_type)
+    wrapped = encode({"data": {name: None}}, content_type)
+    index = wrapped.rindex(placeholder)
+    return wrapped[:index], wrapped[index + len(placeholder) :]
+
+
+def _objects(model):
+    objects = list(Selection.default(model).apply(model.objects.order_by("pk")))
+    if model is Workout:
+        Workout.prefetch_summary(objects)
+    return objects
+
+
+def write(path):
+    """Write a snapshot of the catalog to `path`, replacing any file there atomically."""
+    path = Path(path)
+    kinds, payloads, size = [], [], 0
+    with serialization_memo():
+        for name, model in KINDS.items():
+            entries = []
+            for obj in _objects(model):
+                data = obj.serialize()
+                entry = [obj.pk]
+                for content_type in CONTENT_TYPES:
+                    payload = encode(data, content_type)
+                    entry += [size, len(payload)]
+                    payloads.append(payload)
+                    size += len(payload)
+                entries.append(entry)
+            kinds.append((name, entries))
+
+    index_size = sum(_ENTRY.size * len(entries) for _, entries in kinds)
+    start = _HEADER.size + _KIND.size * len(kinds)
+    base = start + index_size
+
+    fd, temp = tempfile.mkstemp(dir=path.parent, prefix=f".{path.name}.")
+    try:
+        with os.fdopen(fd, "wb") as file:
+            file.write(_HEADER.pack(MAGIC, FORMAT_VERSION, time.time_ns(), len(kinds)))
+            offset = start
+            for name, entries in kinds:
+                file.write(_KIND.pack(name.encode(), offset, len(entries)))
+                offset += _ENTRY.size * len(entries)
+            for _, entries in kinds:
+                for pk, *locations in entries:
+                    # Payload offsets are from the start of the file.
+                    for i in range(0, len(locations), 2):
+                        locations[i] += base
+                    file.write(_ENTRY.pack(pk, *locations))
+            file.writelines(payloads)
+            file.flush()
+            os.fsync(file.fileno())
+        os.chmod(temp, 0o644)
+        os.replace(temp, path)
+    except BaseException:
+        os.unlink(temp)
+        raise
+
+
+@task(lane=Job.LaneChoices.HIGH, dedupe=True)
+def build():
+    """Rebuild the snapshot at `CATALOG_SNAPSHOT`, if there is one."""
+    path = settings.CATALOG_SNAPSHOT
+    if path is None:
+        return
+    if fcntl is None:
+        write(path)
+        return
+
+    # Workers building at once take turns, so the last to finish has read every change that
+    # asked for a build.
+    with open(f"{path}.lock", "w") as lock:
+        fcntl.flock(lock, fcntl.LOCK_EX)
+        write(path)
+
+
+def schedule_build():
+    """Queue a rebuild of the snapshot, if there is one."""
+    # Saving a workout in the admin saves each of its intervals and schemes too, but the
+    # build job is deduplicated, so they're covered by one build.
+    if settings.CATALOG_SNAPSHOT is not None:
+        build.delay()
+
+
+class Snapshot:
+    """An open, memory-mapped catalog snapshot."""
+
+    def __init__(self, path):
+        with open(path, "rb") as file:
+            self.stat = os.fstat(file.fileno())
+            self.buffer = mmap.mmap(file.fileno(), 0, access=mmap.ACCESS_READ)
+
+        magic, version, self.built, count = _HEADER.unpack_from(self.buffer)
+        if magic != MAGIC or version != FORMAT_VERSION:
+            raise ValueError(
+                f"{path} isn't a version {FORMAT_VERSION} catalog snapshot."
+            )
+
+        self.kinds = {}
+        for i in range(count):
+            name, offset, entries = _KIND.unpack_from(
+                self.buffer, _HEADER.size + i * _KIND.size
+            )
+            self.kinds[name.rstrip(b"\0").decode()] = (offset, entries)
+        self.view = memoryview(self.buffer)
+
+    def is_current(self, stat):
+        return (stat.st_dev, stat.st_ino, stat.st_mtime_ns) == (
+            self.stat.st_dev,
+            self.stat.st_ino,
+            self.stat.st_mtime_ns,
+        )
+
+    def lookup(self, kind, pk, content_type):
+        """Return a view of the encoded payload of one object, or None if there isn't one."""
+        if kind not in self.kinds or content_type not in CONTENT_TYPES:
+            return None
+
+        # A binary search of the index, reading entries straight from the mapping.
+        offset, count = self.kinds[kind]
+        low, high = 0, count
+        while low < high:
+            middle = (low + high) // 2
+            entry = _ENTRY.unpack_from(self.buffer, offset + middle * _ENTRY.size)
+            if entry[0] < pk:
+                low = middle + 1
+            elif entry[0] > pk:
+                high = middle
+            else:
+                i = 1 + 2 * CONTENT_TYPES.index(content_type)
+                start, length = entry[i], entry[i + 1]
+                return self.view[start : start + length]
+        return None
+
+
+_lock = threading.Lock()
+_snapshot = None
+
+
+def get_snapshot():
+    """Return the current snapshot, reopening it if it's been rebuilt, or None if there's none.
+
+    The mapping of a replaced snapshot stays valid until every view of it is released.
+    """
+    global _snapshot
+    path = settings.CATALOG_SNAPSHOT
+    if path is None:
+        return None
+    try:
+        stat = os.stat(path)
+    except FileNotFoundError:
+        return None
+
+    snapshot = _snapshot
+    if snapshot is None or not snapshot.is_current(stat):
+        with _lock:
+            if _snapshot is None or not _snapshot.is_current(stat):
+                _snapshot = Snapshot(path)
+            snapshot = _snapshot
+    return snapshot
@@ -0,0 +1,161 @@
+"""A write-behind buffer for like and unlike actions.
+
+People tap like and unlike in quick bursts. Rather than writing a `Like` row for every tap, each
+action goes into an in-memory buffer that keeps only the latest action per user and workout.
+The buffer is flushed every `LIKE_FLUSH_SECONDS`, as soon as it holds `LIKE_FLUSH_SIZE` actions,
+and when the process exits. Each flush is one transaction that drops actions that don't change
+anything and inserts the rest with `bulk_create`, then does what the signal handlers would have
+for each new row.
+
+Reads through `state` see buffered actions first, but the buffer is per process, so other
+processes only see an action once it's flushed.
+"""
+
+import atexit
+import threading
+
+from django.conf import settings
+from django.db import connections
+from django.db import router
+from django.db import transaction
+from django.db.models import Q
+from django.utils import timezone
+
+from . import sync
+from . import trending
+from .models import Like
+
+
+class LikeBuffer:
+    """Buffered like actions, keyed by user and workout."""
+
+    def __init__(self):
+        self._lock = threading.Lock()
+        self._flush_lock = threading.Lock()
+        self._pending = {}
+        self._timer = None
+
+    def __len__(self):
+        return len(self._pending)
+
+    def add(self, user_id, workout_id, action, timestamp=None):
+        """Buffer a like (`action` is True) or unlike of a workout by a user."""
+        with self._lock:
+            self._pending[(user_id, workout_id)] = (action, timestamp or timezone.now())
+            full = len(self._pending) >= settings.LIKE_FLUSH_SIZE
+            if not full:
+                self._schedule()
+        if full:
+            self.flush()
+
+    def clear(self):
+        """Drop every buffered action without writing it."""
+        with self._lock:
+            self._pending.clear()
+
+    def state(self, user_id, workout_id):
+        """Return whether a user likes a workout, or None if they've never said."""
+        with self._lock:
+            pending = self._pending.get((user_id, workout_id))
+        if pending is not None:
+            return pending[0]
+        return (
+            Like.objects.filter(user_id=user_id, workout_id=workout_id)
+            .order_by("-timestamp", "-pk")
+            .values_list("action", flat=True)
+            .first()
+        )
+
+    def flush(self):
+        """Write out every buffered action, returning how many rows were inserted."""
+        with self._flush_lock:
+            with self._lock:
+                pending, self._pending = self._pending, {}
+                if self._timer is not None:
+                    self._timer.cancel()
+                    self._timer = None
+            if not pending:
+                return 0
+
+            try:
+                return self._write(pending)
+            except Exception:
+                # Put the actions back, unless newer ones have arrived in the meantime.
+                with self._lock:
+                    for key, value in pending.items():
+                        self._pending.setdefault(key, value)
+                    self._schedule()
+                raise
+
+    def _write(self, pending):
+        connection = connections[router.db_for_write(Like)]
+        with transaction.atomic(using=connection.alias):
+            current = {}
+            # Each pair is two query parameters, so look them up a batch at a time to stay under
+            # the database's limit.
+            pairs = list(pending)
+            size = connection.ops.bulk_batch_size(["user_id", "workout_id"], pairs)
+            for start in range(0, len(pairs), size):
+                keys = Q()
+                for user_id, workout_id in pairs[start : start + size]:
+                    keys |= Q(user_id=user_id, workout_id=workout_id)
+                rows = (
+                    Like.objects.using(connection.alias)
+                    .filter(keys)
+                    .order_by("user_id", "workout_id", "-timestamp", "-pk")
+                    .values_list("user_id", "workout_id", "action")
+                )
+                for user_id, workout_id, action in rows:
+                    current.setdefault((user_id, workout_id), action)
+
+            likes = [
+                Like(
+                    user_id=user_id, workout_id=workout_id, action=action, timestamp=at
+                )
+                for (user_id, workout_id), (action, at) in pending.items()
+                if current.get((user_id, workout_id)) != action
+            ]
+            if not likes:
+                return 0
+
+            Like.objects.bulk_create(likes)
+            if likes[0].pk is None:
+                # SQLite doesn't return the ids of bulk inserted rows. Its writers take turns,
+                # and this transaction has written, so no other rows can have been inserted
+                # since these were. They're the newest, in order.
+                pks = (
+                    Like.objects.using(connection.alias)
+                    .order_by("-pk")
+                    .values_list("pk", flat=True)
+                )
+                for like, pk in zip(likes, sorted(pks[: len(likes)])):
+                    like.pk = pk
+
+            # `bulk_create` doesn't send signals, so do what the handlers for a saved like would.
+            sync.record_many(likes)
+            for like in likes:
+                if like.action:
+                    trending.record(
+                        like.workout_id, trending.LIKE_WEIGHT, like.timestamp
+                    )
+        return len(likes)
+
+    def _schedule(self):
+        # Called with the lock held.
+        if self._timer is None and settings.LIKE_FLUSH_SECONDS:
+            self._timer = threading.Timer(
+                settings.LIKE_FLUSH_SECONDS, self._flush_later
+            )
+            self._timer.daemon = True
+            self._timer.start()
+
+    def _flush_later(self):
+        try:
+            self.flush()
+        finally:
+            connections.close_all()
+
+
+likes = LikeBuffer()
+
+atexit.register(likes.flush)
@@ -0,0 +1,208 @@
+"""Live session progress, pushed to friends over Server-Sent Events.
+
+Clients post interval results as they complete them (see `LiveSessionView`). Each update is
+published to an in-process `Hub` under the topic of the user doing the workout, and every
+connection to the event stream subscribes to the topics of the user's friends.
+
+The hub lives in the ASGI worker's event loop. It stands in for a cross-process broker, so
+publishers and subscribers have to be served by the same process. An idle subscriber is just a
+small object and an `asyncio.Event`, so one worker can hold thousands of open streams.
+"""
+
+import asyncio
+import json
+from collections import OrderedDict
+from http import HTTPStatus
+from http.cookies import SimpleCookie
+from types import SimpleNamespace
+
+from asgiref.sync import sync_to_async
+from django.conf import settings
+from django.contrib.auth import get_user
+from django.core.serializers.json import DjangoJSONEncoder
+from django.db import transaction
+from django.utils.module_loading import import_string
+
+
+def user_topic(user_id):
+    return f"user:{user_id}"
+
+
+class Subscriber:
+    """A single stream's view of the hub.
+
+    Pending events are coalesced by key, so a slow client only ever gets the latest update for
+    each session. If more than `max_pending` keys are waiting, the oldest are dropped and the
+    client is told it has lagged behind.
+    """
+
+    def __init__(self, topics, max_pending):
+        self.topics = frozenset(topics)
+        self.max_pending = max_pending
+        self.pending = OrderedDict()
+        self.lagged = False
+        self._ready = asyncio.Event()
+
+    def offer(self, key, event):
+        self.pending.pop(key, None)
+        self.pending[key] = event
+        while len(self.pending) > self.max_pending:
+            self.pending.popitem(last=False)
+            self.lagged = True
+        self._ready.set()
+
+    async def get(self, timeout=None):
+        """Wait for events, returning `(events, lagged)`. Returns no events on timeout."""
+        if not self.pending:
+            try:
+                await asyncio.wait_for(self._ready.wait(), timeout)
+            except asyncio.TimeoutError:
+                return [], False
+
+        events, lagged = list(self.pending.values()), self.lagged
+        self.pending.clear()
+        self.lagged = False
+        self._ready.clear()
+        return events, lagged
+
+
+class Hub:
+    """An in-process publish/subscribe hub, bound to the event loop of its first subscriber."""
+
+    def __init__(self, max_pending=100):
+        self.max_pending = max_pending
+        self.topics = {}
+        self.loop = None
+
+    def subscribe(self, topics):
+        """Register a new subscriber. Must be called from the event loop."""
+        self.loop = asyncio.get_running_loop()
+        subscriber = Subscriber(topics, self.max_pending)
+        for topic in subscriber.topics:
+            self.topics.setdefault(topic, set()).add(subscriber)
+        return subscriber
+
+    def unsubscribe(self, subscriber):
+        for topic in subscriber.topics:
+            subscribers = self.topics.get(topic)
+            if subscribers is not None:
+                subscribers.discard(subscriber)
+                if not subscribers:
+                    del self.topics[topic]
+
+    def publish(self, topic, key, event):
+        """Offer `event` to every subscriber of `topic`. Must be called from the event loop."""
+        for subscriber in self.topics.get(topic, ()):
+            subscriber.offer(key, event)
+
+    def publish_threadsafe(self, topic, key, event):
+        """Publish from any thread, such as a synchronous view.
+
+        Does nothing if no stream has ever been opened in this process.
+        """
+        loop = self.loop
+        if loop is None or loop.is_closed():
+            return
+        loop.call_soon_threadsafe(self.publish, topic, key, event)
+
+
+hub = Hub(max_pending=settings.LIVE_MAX_PENDING)
+
+
+def publish(user_id, session_id, event):
+    """Publish an update to a user's session once the current transaction commits."""
+    transaction.on_commit(
+        lambda: hub.publish_threadsafe(user_topic(user_id), session_id, event)
+    )
+
+
+async def _disconnected(receive):
+    """Wait for the client to disconnect, discarding the request body until it does."""
+    while (await receive())["type"] != "http.disconnect":
+        pass
+
+
+def _encode(event_name, data):
+    payload = json.dumps(data, cls=DjangoJSONEncoder, separators=(",", ":"))
+    return f"event: {event_name}\ndata: {payload}\n\n".encode()
+
+
+class LiveStreamApplication:
+    """ASGI middleware that serves the live event stream and passes anything else on."""
+
+    def __init__(self, application, path=None):
+        self.application = application
+        self.path = path or settings.LIVE_STREAM_PATH
+
+    async def __call__(self, scope, receive, send):
+        if scope["type"] != "http" or scope["path"] != self.path:
+            return await self.application(scope, receive, send)
+
+        user = await self._get_user(scope)
+        if not user.is_authenticated:
+            await send({"type": "http.response.start", "status": HTTPStatus.FORBIDDEN})
+            await send({"type": "http.response.body", "body": b""})
+            return
+
+        friends = await sync_to_async(import_string("users.core.get_friends"))(user.id)
+        subscriber = hub.subscribe(user_topic(f["user_id"]) for f in friends)
+        try:
+            await self._stream(subscriber, receive, send)
+        finally:
+            hub.unsubscribe(subscriber)
+
+    async def _get_user(self, scope):
+        cookies = SimpleCookie()
+        for name, value in scope.get("headers", []):
+            if name == b"cookie":
+                cookies.load(value.decode("latin-1"))
+
+        morsel = cookies.get(settings.SESSION_COOKIE_NAME)
+        if morsel is None:
+            return SimpleNamespace(is_authenticated=False)
+
+        engine = import_string(f"{settings.SESSION_ENGINE}.SessionStore")
+
+        def load():
+            return get_user(SimpleNamespace(session=engine(morsel.value)))
+
+        return await sync_to_async(load)()
+
+    async def _stream(self, subscriber, receive, send):
+        await send(
+            {
+                "type": "http.response.start",
+                "status": HTTPStatus.OK,
+                "headers": [
+                    (b"content-type", b"text/event-stream"),
+                    (b"cache-control", b"no-cache"),
+                    (b"x-accel-buffering", b"no"),
+                ],
+            }
+        )
+        await send({"type": "http.response.body", "body": b"", "more_body": True})
+
+        disconnected = asyncio.ensure_future(_disconnected(receive))
+        try:
+            while True:
+                getter = asyncio.ensure_future(
+                    subscriber.get(timeout=settings.LIVE_KEEPALIVE_SECONDS)
+                )
+                await asyncio.wait(
+                    [getter, disconnected], return_when=asyncio.FIRST_COMPLETED
+                )
+                if disconnected.done():
+                    getter.cancel()
+                    return
+
+                events, lagged = getter.result()
+                body = b"".join(_encode(e["type"], e) for e in events)
+                if lagged:
+                    body += _encode("lagged", {})
+                if not body:
+                    body = b": keepalive\n\n"
+                await send(
+                    {"type": "http.response.body", "body": body, "more_body": True}
+                )
+        finally:
+            disconnected.cancel()
@@ -0,0 +1,187 @@
+import re
+from collections import defaultdict
+
+from django.contrib.auth import get_user_model
+from django.core.management.base import BaseCommand, CommandError
+from django.db import DEFAULT_DB_ALIAS
+from django.db import connections
+from django.db import transaction
+from django.test import Client
+from django.test.utils import CaptureQueriesContext
+from django.urls import reverse
+
+from project.db.routers import use_primary
+from workouts.models import Exercise
+from workouts.models import Session
+from workouts.models import Workout
+
+# Matches `"table"."column" = <value>` and `"table"."column" IN (` comparisons. Join conditions,
+# where the right-hand side is another column, are skipped.
+EQUALITY_RE = re.compile(r'"(\w+)"\."(\w+)"\s*(?:=\s*(?!\s*")|IN\s*\()')
+
+# Matches the terms of an ORDER BY clause.
+ORDER_BY_RE = re.compile(r"ORDER BY (.+?)(?: LIMIT| OFFSET|$)")
+ORDER_TERM_RE = re.compile(r'"(\w+)"\."(\w+)"\s*(ASC|DESC)?')
+
+# The table being scanned or sorted in an EXPLAIN QUERY PLAN detail line.
+SCAN_RE = re.compile(r"^SCAN (\w+)")
+FROM_RE = re.compile(r'FROM "(\w+)"')
+
+# Literals are stripped so that the same query with different parameters is explained once.
+LITERAL_RE = re.compile(r"'(?:[^']|'')*'|\b\d+\b")
+
+
+def default_urls():
+    """Return the URLs of the read-heavy views, with a sample object for each detail view."""
+    urls = [
+        reverse("index"),
+        reverse("workouts:sessions"),
+        reverse("workouts:workouts"),
+        reverse("workouts:exercises"),
+        reverse("users:friends"),
+    ]
+    for name, model in [
+        ("workouts:session", Session),
+        ("workouts:workout", Workout),
+        ("workouts:exercise", Exercise),
+    ]:
+        obj = model.objects.order_by("pk").first()
+        if obj is not None:
+            urls.append(reverse(name, args=[obj.pk]))
+    return urls
+
+
+def explain(connection, sql):
+    """Return the detail column of each EXPLAIN QUERY PLAN row for `sql`."""
+    with connection.cursor() as cursor:
+        cursor.execute(f"EXPLAIN QUERY PLAN {sql}")
+        return [row[-1] for row in cursor.fetchall()]
+
+
+def propose_index(sql, table):
+    """Propose index columns for `table` from the equality and ORDER BY terms in `sql`."""
+    columns = []
+    for term_table, column in EQUALITY_RE.findall(sql):
+        if term_table == table and column not in columns:
+            columns.append(column)
+
+    # An index can only satisfy the ORDER BY if every term is a column of `table`.
+    match = ORDER_BY_RE.search(sql)
+    if match:
+        terms = ORDER_TERM_RE.findall(match.group(1))
+        if all(term_table == table for term_table, _, _ in terms):
+            for _, column, direction in terms:
+                if column not in columns:
+                    columns.append(f"-{column}" if direction == "DESC" else column)
+
+    return tuple(columns)
+
+
+class Command(BaseCommand):
+    help = "Run the read-heavy views, EXPLAIN their queries and propose indexes"
+
+    def add_arguments(self, parser):
+        parser.add_argument(
+            "--user",
+            help="Email address of the user to run the views as. Defaults to the first user.",
+        )
+        parser.add_argument(
+            "--url",
+            action="append",
+            default=[],
+            dest="urls",
+            help="An extra URL to run. May be given more than once.",
+        )
+
+    def handle(self, *args, **options):
+        if connections[DEFAULT_DB_ALIAS].vendor != "sqlite":
+            raise CommandError("adviseindexes only supports SQLite databases")
+
+        User = get_user_model()
+        if options["user"]:
+            user = User.objects.filter(email=options["user"]).first()
+        else:
+            user = User.objects.order_by("pk").first()
+        if user is None:
+            raise CommandError("no user to run the views as")
+
+        queries = self._capture(user, default_urls() + options["urls"])
+        proposals = defaultdict(set)
+
+        for (alias, sql), urls in queries.values():
+            plan = explain(connections[alias], sql)
+            problems = []
+
+            for detail in plan:
+                # A scan that walks an index still reads rows in index order, so only a scan
+                # of the table itself is flagged.
+                scan = SCAN_RE.match(detail)
+                if scan and "USING" not in detail:
+                    problems.append(("full scan", scan.group(1), detail))
+                elif detail.startswith("USE TEMP B-TREE"):
+                    table = FROM_RE.search(sql)
+                    if table:
+                        problems.append(("temp b-tree", table.group(1), detail))
+
+            if not problems:
+                continue
+
+            self.stdout.write(self.style.WARNING(f"{', '.join(sorted(urls))}"))
+            self.stdout.write(f"  {sql}")
+            for kind, table, detail in problems:
+                self.stdout.write(self.style.NOTICE(f"  {kind}: {detail}"))
+                columns = propose_index(sql, table)
+                if columns:
+                    proposals[table].add(columns)
+
+        if not proposals:
+            self.stdout.write(self.style.SUCCESS("no indexes to propose"))
+            return
+
+        self.stdout.write(self.style.SUCCESS("proposed indexes:"))
+        for table, indexes in sorted(proposals.items()):
+            for columns in sorted(indexes):
+                self.stdout.write(f"  {table}({', '.join(columns)})")
+
+    def _capture(self, user, urls):
+        """Request each URL as `user`, returning the distinct SELECTs issued and their URLs.
+
+        The result maps the shape of each query to a sample `(alias, sql)` and the set of URLs
+        that issued it.
+        """
+        queries = {}
+
+        # Run against the primary and roll back, so the views' session writes aren't kept.
+        with use_primary(), transaction.atomic():
+            client = Client()
+            client.force_login(user)
+
+            for url in urls:
+                contexts = [
+                    CaptureQueriesContext(connections[alias]) for alias in connections
+                ]
+                for context in contexts:
+                    context.__enter__()
+                try:
+                    response = client.get(url)
+                finally:
+                    for context in reversed(contexts):
+                        context.__exit__(None, None, None)
+
+                if response.status_code != 200:
+                    self.stderr.write(f"{url} responded with {response.status_code}")
+
+                for context in contexts:
+                    for query in context.captured_queries:
+                        sql = query["sql"]
+                        if not sql.startswith("SELECT"):
+                            continue
+                        shape = LITERAL_RE.sub("?", sql)
+                        sample, shape_urls = queries.setdefault(
+                            shape, ((context.connection.alias, sql), set())
+                        )
+                        shape_urls.add(url)
+
+            transaction.set_rollback(True)
+
+        return queries
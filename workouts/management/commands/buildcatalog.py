@@ -0,0 +1,22 @@
+from django.conf import settings
+from django.core.management.base import BaseCommand, CommandError
+
+from workouts import catalog
+
+
+class Command(BaseCommand):
+    help = "Write the memory-mapped catalog snapshot served by the workout and exercise views"
+
+    def add_arguments(self, parser):
+        parser.add_argument(
+            "--path",
+            help="Where to write the snapshot. Defaults to CATALOG_SNAPSHOT.",
+        )
+
+    def handle(self, *args, **options):
+        path = options["path"] or settings.CATALOG_SNAPSHOT
+        if path is None:
+            raise CommandError("CATALOG_SNAPSHOT isn't set")
+
+        catalog.write(path)
+        self.stdout.write(self.style.SUCCESS(f"wrote {path}"))
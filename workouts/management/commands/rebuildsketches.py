@@ -0,0 +1,19 @@
+from django.core.management.base import BaseCommand
+
+from workouts import percentiles
+
+
+class Command(BaseCommand):
+    help = "Rebuild the performance percentile sketches from the recorded performances"
+
+    def add_arguments(self, parser):
+        parser.add_argument(
+            "intervals",
+            nargs="*",
+            type=int,
+            help="Ids of the intervals to rebuild. Defaults to every interval.",
+        )
+
+    def handle(self, *args, **options):
+        rebuilt = percentiles.rebuild(options["intervals"] or None)
+        self.stdout.write(self.style.SUCCESS(f"rebuilt {rebuilt} sketches"))
@@ -0,0 +1,11 @@
+from django.core.management.base import BaseCommand
+
+from workouts import trending
+
+
+class Command(BaseCommand):
+    help = "Recompute the trending scores of workouts from their sessions and likes"
+
+    def handle(self, *args, **options):
+        rebuilt = trending.rebuild()
+        self.stdout.write(self.style.SUCCESS(f"rebuilt {rebuilt} trends"))
@@ -0,0 +1,46 @@
+import sqlite3
+
+from django.conf import settings
+from django.core.management.base import BaseCommand, CommandError
+from django.db import DEFAULT_DB_ALIAS
+from django.db import connections
+
+
+class Command(BaseCommand):
+    help = "Copy the primary SQLite database to each local read replica"
+
+    def add_arguments(self, parser):
+        parser.add_argument(
+            "replicas",
+            nargs="*",
+            help="Replica aliases to refresh. Defaults to all DATABASE_REPLICAS.",
+        )
+
+    def handle(self, *args, **options):
+        primary = connections[DEFAULT_DB_ALIAS]
+        if primary.vendor != "sqlite":
+            raise CommandError("syncreplicas only supports SQLite databases")
+
+        replicas = options["replicas"] or settings.DATABASE_REPLICAS
+        if not replicas:
+            self.stdout.write(self.style.NOTICE("no replicas configured"))
+            return
+
+        source = sqlite3.connect(primary.settings_dict["NAME"])
+        try:
+            for alias in replicas:
+                if alias not in settings.DATABASE_REPLICAS:
+                    raise CommandError(f"{alias} is not a configured replica")
+
+                # Drop any open connection so it sees the new copy.
+                connections[alias].close()
+                target = sqlite3.connect(connections[alias].settings_dict["NAME"])
+                try:
+                    # The backup API copies a consistent snapshot, even while the primary
+                    # is being written to.
+                    source.backup(target)
+                finally:
+                    target.close()
+                self.stdout.write(self.style.SUCCESS(f"refreshed {alias}"))
+        finally:
+            source.close()
@@ -0,0 +1,29 @@
+# Generated by Django 3.2.25 on 2026-10-19 18:45
+
+from django.db import migrations, models
+
+
+class Migration(migrations.Migration):
+
+    dependencies = [
+        ('workouts', '0001_initial'),
+    ]
+
+    operations = [
+        migrations.AddIndex(
+            model_name='like',
+            index=models.Index(fields=['user', 'workout', '-timestamp'], name='like_user_workout_time_idx'),
+        ),
+        migrations.AddIndex(
+            model_name='session',
+            index=models.Index(fields=['-timestamp'], name='session_timestamp_idx'),
+        ),
+        migrations.AddIndex(
+            model_name='session',
+            index=models.Index(fields=['user', '-timestamp'], name='session_user_timestamp_idx'),
+        ),
+        migrations.AddIndex(
+            model_name='session',
+            index=models.Index(fields=['workout', '-timestamp'], name='session_workout_timestamp_idx'),
+        ),
+    ]
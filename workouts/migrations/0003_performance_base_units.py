@@ -0,0 +1,43 @@
+# Generated by Django 3.2.25 on 2026-10-19 18:47
+
+from decimal import Decimal
+
+from django.db import migrations, models
+
+# Base units per display unit for each quantity name. A copy of `workouts.units.SCALE` as it was
+# when this migration was written.
+SCALE = {"T": 1000, "D": 1000, "W": 1000, "R": 1, "A": 1}
+
+
+def to_base_units(apps, schema_editor):
+    Performance = apps.get_model("workouts", "Performance")
+    rows = Performance.objects.select_related("interval__style")
+    for performance in list(rows):
+        scale = SCALE[performance.interval.style.quantity_name]
+        performance.performance = (performance.performance * scale).quantize(Decimal(1))
+        performance.save(update_fields=["performance"])
+
+
+def from_base_units(apps, schema_editor):
+    Performance = apps.get_model("workouts", "Performance")
+    rows = Performance.objects.select_related("interval__style")
+    for performance in list(rows):
+        scale = SCALE[performance.interval.style.quantity_name]
+        performance.performance = Decimal(performance.performance) / scale
+        performance.save(update_fields=["performance"])
+
+
+class Migration(migrations.Migration):
+
+    dependencies = [
+        ('workouts', '0002_session_like_indexes'),
+    ]
+
+    operations = [
+        migrations.RunPython(to_base_units, from_base_units),
+        migrations.AlterField(
+            model_name='performance',
+            name='performance',
+            field=models.BigIntegerField(help_text='A measure of performance in the base unit of the workout style: milliseconds for time, millimetres for distance, grams for weight, watts for rate of work, or reps.'),
+        ),
+    ]
@@ -0,0 +1,18 @@
+# Generated by Django 3.2.25 on 2026-10-19 18:50
+
+from django.db import migrations, models
+import django.db.models.functions.text
+
+
+class Migration(migrations.Migration):
+
+    dependencies = [
+        ('workouts', '0003_performance_base_units'),
+    ]
+
+    operations = [
+        migrations.AddIndex(
+            model_name='workout',
+            index=models.Index(django.db.models.functions.text.Lower('name'), name='workout_name_lower_idx'),
+        ),
+    ]
@@ -0,0 +1,60 @@
+# Generated by Django 3.2.25 on 2026-10-19 19:40
+
+from django.db import migrations
+
+# The full-text index covers workouts and exercises. Each row's rowid is the object's id times
+# two, plus 0 for a workout or 1 for an exercise. A copy of `workouts.search.KINDS` as it was
+# when this migration was written.
+KINDS = {"workouts_workout": 0, "workouts_exercise": 1}
+
+
+def create_search_index(apps, schema_editor):
+    if schema_editor.connection.vendor != "sqlite":
+        return
+
+    schema_editor.execute(
+        "CREATE VIRTUAL TABLE workouts_search USING fts5("
+        "name, description, tokenize='unicode61 remove_diacritics 2', prefix='2 3')"
+    )
+    for table, kind in KINDS.items():
+        schema_editor.execute(
+            f"INSERT INTO workouts_search (rowid, name, description) "
+            f"SELECT id * 2 + {kind}, name, description FROM {table}"
+        )
+        schema_editor.execute(
+            f"CREATE TRIGGER {table}_search_insert AFTER INSERT ON {table} BEGIN "
+            f"INSERT INTO workouts_search (rowid, name, description) "
+            f"VALUES (new.id * 2 + {kind}, new.name, new.description); END"
+        )
+        schema_editor.execute(
+            f"CREATE TRIGGER {table}_search_update "
+            f"AFTER UPDATE OF id, name, description ON {table} BEGIN "
+            f"DELETE FROM workouts_search WHERE rowid = old.id * 2 + {kind}; "
+            f"INSERT INTO workouts_search (rowid, name, description) "
+            f"VALUES (new.id * 2 + {kind}, new.name, new.description); END"
+        )
+        schema_editor.execute(
+            f"CREATE TRIGGER {table}_search_delete AFTER DELETE ON {table} BEGIN "
+            f"DELETE FROM workouts_search WHERE rowid = old.id * 2 + {kind}; END"
+        )
+
+
+def drop_search_index(apps, schema_editor):
+    if schema_editor.connection.vendor != "sqlite":
+        return
+
+    for table in KINDS:
+        for event in ["insert", "update", "delete"]:
+            schema_editor.execute(f"DROP TRIGGER IF EXISTS {table}_search_{event}")
+    schema_editor.execute("DROP TABLE IF EXISTS workouts_search")
+
+
+class Migration(migrations.Migration):
+
+    dependencies = [
+        ('workouts', '0004_name_lower_index'),
+    ]
+
+    operations = [
+        migrations.RunPython(create_search_index, drop_search_index),
+    ]
@@ -0,0 +1,68 @@
+# Generated by Django 3.2.25 on 2026-10-19 19:09
+
+from django.conf import settings
+from django.db import migrations, models
+import django.db.models.deletion
+
+# Tracked models and the path of the user each object belongs to. A copy of
+# `workouts.sync.TRACKED` as it was when this migration was written.
+TRACKED = [
+    ("workouts", "Workout", None),
+    ("workouts", "Interval", None),
+    ("workouts", "Scheme", None),
+    ("workouts", "Exercise", None),
+    ("workouts", "Session", "user_id"),
+    ("workouts", "Performance", "session__user_id"),
+    ("workouts", "Like", "user_id"),
+    ("users", "Friend", "user_id"),
+]
+
+
+def backfill(apps, schema_editor):
+    """Log every existing object as changed, so a first sync from zero sees everything."""
+    Change = apps.get_model("workouts", "Change")
+    for app_label, model_name, path in TRACKED:
+        model = apps.get_model(app_label, model_name)
+        fields = ["pk"] + ([path] if path else [])
+        Change.objects.bulk_create(
+            (
+                Change(
+                    model=model._meta.model_name,
+                    object_id=row[0],
+                    user_id=row[1] if path else None,
+                )
+                for row in model.objects.order_by("pk").values_list(*fields)
+            ),
+            batch_size=500,
+        )
+
+
+class Migration(migrations.Migration):
+
+    dependencies = [
+        migrations.swappable_dependency(settings.AUTH_USER_MODEL),
+        ('users', '0005_email_lower_index'),
+        ('workouts', '0005_search_index'),
+    ]
+
+    operations = [
+        migrations.CreateModel(
+            name='Change',
+            fields=[
+                ('seq', models.BigAutoField(primary_key=True, serialize=False)),
+                ('model', models.CharField(help_text='The model name of the object.', max_length=100)),
+                ('object_id', models.PositiveIntegerField()),
+                ('deleted', models.BooleanField(default=False)),
+                ('user', models.ForeignKey(db_constraint=False, null=True, on_delete=django.db.models.deletion.DO_NOTHING, related_name='+', to=settings.AUTH_USER_MODEL)),
+            ],
+        ),
+        migrations.AddIndex(
+            model_name='change',
+            index=models.Index(fields=['user', 'seq'], name='change_user_seq_idx'),
+        ),
+        migrations.AddConstraint(
+            model_name='change',
+            constraint=models.UniqueConstraint(fields=('model', 'object_id'), name='unique_change_object'),
+        ),
+        migrations.RunPython(backfill, migrations.RunPython.noop),
+    ]
@@ -0,0 +1,66 @@
+# Generated by Django 3.2.25 on 2026-10-19 19:19
+
+import math
+
+from django.db import migrations, models
+import django.db.models.deletion
+
+# Event weights. A copy of those in `workouts.trending` as they were when this migration was
+# written.
+SESSION_WEIGHT = 1.0
+LIKE_WEIGHT = 0.5
+
+# The default `TRENDING_HALF_LIFE` when this migration was written. Scores recorded at another
+# rate are recomputed by `manage.py rebuildtrends`.
+HALF_LIFE = 60 * 60 * 24 * 3
+
+
+def backfill(apps, schema_editor):
+    """Score every workout from its existing sessions and likes."""
+    Session = apps.get_model("workouts", "Session")
+    Like = apps.get_model("workouts", "Like")
+    WorkoutTrend = apps.get_model("workouts", "WorkoutTrend")
+    rate = math.log(2) / HALF_LIFE
+
+    log_weights = {}
+    events = [
+        (Session.objects.values_list("workout_id", "timestamp"), SESSION_WEIGHT),
+        (
+            Like.objects.filter(action=True).values_list("workout_id", "timestamp"),
+            LIKE_WEIGHT,
+        ),
+    ]
+    for rows, weight in events:
+        for workout_id, timestamp in rows.iterator():
+            log_weights.setdefault(workout_id, []).append(
+                math.log(weight) + rate * timestamp.timestamp()
+            )
+
+    trends = []
+    for workout_id, values in log_weights.items():
+        peak = max(values)
+        log_score = peak + math.log(sum(math.exp(value - peak) for value in values))
+        trends.append(WorkoutTrend(workout_id=workout_id, log_score=log_score))
+    WorkoutTrend.objects.bulk_create(trends, batch_size=500)
+
+
+class Migration(migrations.Migration):
+
+    dependencies = [
+        ('workouts', '0006_change_log'),
+    ]
+
+    operations = [
+        migrations.CreateModel(
+            name='WorkoutTrend',
+            fields=[
+                ('workout', models.OneToOneField(on_delete=django.db.models.deletion.CASCADE, primary_key=True, related_name='trend', serialize=False, to='workouts.workout')),
+                ('log_score', models.FloatField()),
+            ],
+        ),
+        migrations.AddIndex(
+            model_name='workouttrend',
+            index=models.Index(fields=['-log_score'], name='trend_log_score_idx'),
+        ),
+        migrations.RunPython(backfill, migrations.RunPython.noop),
+    ]
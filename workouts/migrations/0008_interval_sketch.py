@@ -0,0 +1,93 @@
+# Generated by Django 3.2.25 on 2026-10-19 19:22
+
+import math
+import random
+import struct
+import sys
+from array import array
+
+from django.db import migrations, models
+import django.db.models.deletion
+
+
+class KLLSketch:
+    """`project.sketches.KLLSketch` and its version 1 encoding, as they were when written.
+
+    Only what the backfill uses is copied, so later changes to the sketch don't change what
+    this migration writes.
+    """
+
+    HEADER = struct.Struct("<BHQB")
+
+    def __init__(self, k=200, c=2 / 3):
+        self.k = k
+        self.c = c
+        self.n = 0
+        self.levels = [[]]
+
+    def _capacity(self, level):
+        depth = len(self.levels) - level - 1
+        return int(math.ceil(self.k * self.c**depth)) + 1
+
+    def update(self, value):
+        self.levels[0].append(value)
+        self.n += 1
+        size = sum(len(items) for items in self.levels)
+        if size >= sum(self._capacity(level) for level in range(len(self.levels))):
+            self._compress()
+
+    def _compress(self):
+        for level, items in enumerate(self.levels):
+            if len(items) >= self._capacity(level):
+                if level + 1 == len(self.levels):
+                    self.levels.append([])
+                items.sort()
+                keep = [items.pop()] if len(items) % 2 else []
+                self.levels[level + 1].extend(items[random.getrandbits(1) :: 2])
+                self.levels[level] = keep
+                return
+
+    def to_bytes(self):
+        counts = array("I", (len(items) for items in self.levels))
+        values = array("d", (value for items in self.levels for value in items))
+        if sys.byteorder == "big":
+            counts.byteswap()
+            values.byteswap()
+        header = self.HEADER.pack(1, self.k, self.n, len(self.levels))
+        return header + counts.tobytes() + values.tobytes()
+
+
+def backfill(apps, schema_editor):
+    """Sketch the existing performances of every interval."""
+    Performance = apps.get_model("workouts", "Performance")
+    IntervalSketch = apps.get_model("workouts", "IntervalSketch")
+
+    sketches = {}
+    rows = Performance.objects.values_list("interval_id", "performance")
+    for interval_id, value in rows.iterator():
+        sketches.setdefault(interval_id, KLLSketch()).update(value)
+    IntervalSketch.objects.bulk_create(
+        [
+            IntervalSketch(interval_id=interval_id, data=sketch.to_bytes())
+            for interval_id, sketch in sketches.items()
+        ],
+        batch_size=500,
+    )
+
+
+class Migration(migrations.Migration):
+
+    dependencies = [
+        ('workouts', '0007_workout_trend'),
+    ]
+
+    operations = [
+        migrations.CreateModel(
+            name='IntervalSketch',
+            fields=[
+                ('interval', models.OneToOneField(on_delete=django.db.models.deletion.CASCADE, primary_key=True, related_name='sketch', serialize=False, to='workouts.interval')),
+                ('data', models.BinaryField(help_text='The serialized `KLLSketch`.')),
+            ],
+        ),
+        migrations.RunPython(backfill, migrations.RunPython.noop),
+    ]
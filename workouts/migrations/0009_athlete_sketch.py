@@ -0,0 +1,80 @@
+# Generated by Django 3.2.25 on 2026-10-19 19:24
+
+import hashlib
+import zlib
+
+from django.db import migrations, models
+import django.db.models.deletion
+from django.utils import timezone
+
+
+class HyperLogLog:
+    """`project.sketches.HyperLogLog` and its version 1 encoding, as they were when written.
+
+    Only what the backfill uses is copied, so later changes to the sketch don't change what
+    this migration writes.
+    """
+
+    def __init__(self, p=12):
+        self.p = p
+        self.m = 1 << p
+        self.registers = bytearray(self.m)
+
+    def add(self, value):
+        digest = hashlib.blake2b(str(value).encode(), digest_size=8).digest()
+        hashed = int.from_bytes(digest, "little")
+        index = hashed & (self.m - 1)
+        rest = hashed >> self.p
+        rho = (rest & -rest).bit_length() if rest else 64 - self.p + 1
+        if rho > self.registers[index]:
+            self.registers[index] = rho
+
+    def to_bytes(self):
+        return bytes([1, self.p]) + zlib.compress(self.registers)
+
+
+def backfill(apps, schema_editor):
+    """Count the athletes of every workout from its existing sessions."""
+    Session = apps.get_model("workouts", "Session")
+    AthleteSketch = apps.get_model("workouts", "AthleteSketch")
+
+    sketches = {}
+    rows = Session.objects.values_list("workout_id", "user_id", "timestamp")
+    for workout_id, user_id, timestamp in rows.iterator():
+        for day in [timezone.localdate(timestamp), None]:
+            sketches.setdefault((workout_id, day), HyperLogLog()).add(user_id)
+    AthleteSketch.objects.bulk_create(
+        [
+            AthleteSketch(workout_id=workout_id, day=day, data=sketch.to_bytes())
+            for (workout_id, day), sketch in sketches.items()
+        ],
+        batch_size=500,
+    )
+
+
+class Migration(migrations.Migration):
+
+    dependencies = [
+        ('workouts', '0008_interval_sketch'),
+    ]
+
+    operations = [
+        migrations.CreateModel(
+            name='AthleteSketch',
+            fields=[
+                ('id', models.BigAutoField(auto_created=True, primary_key=True, serialize=False, verbose_name='ID')),
+                ('day', models.DateField(blank=True, help_text='The day counted, or empty for all time.', null=True)),
+                ('data', models.BinaryField(help_text='The serialized `HyperLogLog`.')),
+                ('workout', models.ForeignKey(on_delete=django.db.models.deletion.CASCADE, to='workouts.workout')),
+            ],
+        ),
+        migrations.AddConstraint(
+            model_name='athletesketch',
+            constraint=models.UniqueConstraint(fields=('workout', 'day'), name='athletesketch_workout_day'),
+        ),
+        migrations.AddConstraint(
+            model_name='athletesketch',
+            constraint=models.UniqueConstraint(condition=models.Q(('day', None)), fields=('workout',), name='athletesketch_workout_all_time'),
+        ),
+        migrations.RunPython(backfill, migrations.RunPython.noop),
+    ]
@@ -0,0 +1,53 @@
+# Generated by Django 3.2.25 on 2026-10-19 19:37
+
+from datetime import timedelta
+
+from django.db import migrations, models
+import django.db.models.deletion
+from django.utils import timezone
+
+
+def backfill(apps, schema_editor):
+    """Find every user's latest and longest runs of training days."""
+    Session = apps.get_model("workouts", "Session")
+    Streak = apps.get_model("workouts", "Streak")
+
+    days = {}
+    rows = Session.objects.values_list("user_id", "timestamp")
+    for user_id, timestamp in rows.iterator():
+        days.setdefault(user_id, set()).add(timezone.localdate(timestamp))
+
+    streaks = []
+    for user_id, user_days in days.items():
+        start = previous = None
+        longest = 0
+        for day in sorted(user_days):
+            if previous is None or day - previous > timedelta(days=1):
+                start = day
+            previous = day
+            longest = max(longest, (day - start).days + 1)
+        streaks.append(
+            Streak(user_id=user_id, start_day=start, last_day=previous, longest=longest)
+        )
+    Streak.objects.bulk_create(streaks, batch_size=500)
+
+
+class Migration(migrations.Migration):
+
+    dependencies = [
+        ('users', '0005_email_lower_index'),
+        ('workouts', '0009_athlete_sketch'),
+    ]
+
+    operations = [
+        migrations.CreateModel(
+            name='Streak',
+            fields=[
+                ('user', models.OneToOneField(on_delete=django.db.models.deletion.CASCADE, primary_key=True, related_name='streak', serialize=False, to='users.user')),
+                ('start_day', models.DateField(help_text='The first day of the latest run.')),
+                ('last_day', models.DateField(help_text='The last day the user trained.')),
+                ('longest', models.PositiveIntegerField(default=0, help_text="The length in days of the user's longest run.")),
+            ],
+        ),
+        migrations.RunPython(backfill, migrations.RunPython.noop),
+    ]
@@ -1,15 +1,18 @@
 from datetime import timedelta
 
-from django.core.serializers import serialize
 from django.conf import settings
 from django.core import validators
 from django.db import models
-from django.db import connection
+from django.db.models.functions import Lower
 from django.utils.functional import cached_property
 
-import humanize
-
 from project.db.models import SerializableModel
+from project.db.routers import connection_for_read
+from project.sketches import HyperLogLog
+from project.sketches import KLLSketch
+
+from .units import format_performance
+from .units import format_performances
 
 
 class Workout(SerializableModel):
@@ -43,9 +46,22 @@ class Workout(SerializableModel):
         help_text="An optional time limit for the workout.",
     )
 
+    serialize_related = {
+        "exercise_count": "exercise_count",
+        "intervals": "interval_set",
+    }
+    default_expand = ["intervals"]
+
+    class Meta:
+        indexes = [
+            # Backs the case-insensitive prefix search used by admin autocomplete.
+            models.Index(Lower("name"), name="workout_name_lower_idx"),
+        ]
+
     @cached_property
     def exercise_count(self):
         """Return the number of distinct exercises in this workout."""
+        connection = connection_for_read(Scheme, instance=self)
         with connection.cursor() as cursor:
             cursor.execute(
                 "SELECT COUNT(DISTINCT exercise_id) "
@@ -64,17 +80,42 @@ class Workout(SerializableModel):
     def style(self):
         return self.interval_set.first().style
 
+    @classmethod
+    def prefetch_summary(cls, workouts):
+        """Fill in `style` and `exercise_count` for many workouts with two queries.
+
+        `workouts` may hold several instances of the same workout, as from `select_related`.
+        """
+        by_pk = {}
+        for workout in workouts:
+            by_pk.setdefault(workout.pk, []).append(workout)
+        if not by_pk:
+            return
+
+        styles = {}
+        intervals = (
+            Interval.objects.filter(workout_id__in=by_pk)
+            .select_related("style")
+            .order_by("workout_id", "pk")
+        )
+        for interval in intervals:
+            styles.setdefault(interval.workout_id, interval.style)
+
+        counts = dict(
+            Scheme.objects.filter(interval__workout_id__in=by_pk)
+            .values_list("interval__workout_id")
+            .annotate(count=models.Count("exercise_id", distinct=True))
+        )
+
+        for pk, instances in by_pk.items():
+            for workout in instances:
+                if pk in styles:
+                    workout.style = styles[pk]
+                workout.exercise_count = counts.get(pk, 0)
+
     def __str__(self):
         return str(self.name)
 
-    def serialize(self, format="python"):
-        obj = super().serialize(format)
-        obj["exercise_count"] = self.exercise_count
-        obj["intervals"] = [
-            interval.serialize(format) for interval in self.interval_set.all()
-        ]
-        return obj
-
 
 class Session(SerializableModel):
     """The session model.
@@ -99,9 +140,24 @@ class Session(SerializableModel):
         help_text="Date and time the workout was completed."
     )
 
+    serialize_related = {"performance": "performance"}
+    default_expand = ["user", "workout"]
+
+    class Meta:
+        indexes = [
+            models.Index(fields=["-timestamp"], name="session_timestamp_idx"),
+            models.Index(
+                fields=["user", "-timestamp"], name="session_user_timestamp_idx"
+            ),
+            models.Index(
+                fields=["workout", "-timestamp"], name="session_workout_timestamp_idx"
+            ),
+        ]
+
     @cached_property
     def performance(self):
-        """Return the performance measure for each interval in this session."""
+        """Return the performance measure for the first interval in this session."""
+        connection = connection_for_read(Performance, instance=self)
         with connection.cursor() as cursor:
             cursor.execute(
                 "SELECT performance, quantity_name "
@@ -110,29 +166,65 @@ class Session(SerializableModel):
                 "ON workouts_performance.interval_id = workouts_interval.id "
                 "JOIN workouts_workoutstyle "
                 "ON workouts_interval.style_id = workouts_workoutstyle.id "
-                "WHERE workouts_performance.session_id = %s",
+                "WHERE workouts_performance.session_id = %s "
+                "ORDER BY workouts_performance.id "
+                "LIMIT 1",
                 [self.pk],
             )
             row = cursor.fetchone()
 
-        performance = row[0]
-        quantity_name = WorkoutStyle.QuantityNameChoices(row[1]).label
+        if row is None:
+            return None
 
-        # TODO: Humanize performance
-        if quantity_name == "Time":
-            performance = humanize.naturaldelta(
-                performance, minimum_unit="milliseconds"
-            )
+        value, quantity_name = row
+        return {
+            "performance": format_performance(value, quantity_name),
+            "quantity_name": QUANTITY_LABELS[quantity_name],
+            "value": value,
+        }
 
-        return {"performance": performance, "quantity_name": quantity_name}
+    @classmethod
+    def prefetch_performance(cls, sessions, using=None):
+        """Fill in `performance` for many sessions with one query.
 
-    def serialize(self, format="python"):
-        obj = serialize(format, [self])[0]["fields"]
-        obj["id"] = self.pk
-        obj["user"] = self.user.serialize()
-        obj["workout"] = self.workout.serialize()
-        obj["performance"] = self.performance
-        return obj
+        Afterwards `session.performance` is available without touching the database.
+        """
+        sessions = [
+            session for session in sessions if "performance" not in session.__dict__
+        ]
+        if not sessions:
+            return
+
+        connection = connection_for_read(Performance, instance=sessions[0], using=using)
+        placeholders = ", ".join(["%s"] * len(sessions))
+        with connection.cursor() as cursor:
+            cursor.execute(
+                "SELECT session_id, performance, quantity_name "
+                "FROM workouts_performance "
+                "JOIN workouts_interval "
+                "ON workouts_performance.interval_id = workouts_interval.id "
+                "JOIN workouts_workoutstyle "
+                "ON workouts_interval.style_id = workouts_workoutstyle.id "
+                f"WHERE workouts_performance.session_id IN ({placeholders}) "
+                "ORDER BY workouts_performance.session_id, workouts_performance.id",
+                [session.pk for session in sessions],
+            )
+            rows = {}
+            for session_id, value, quantity_name in cursor.fetchall():
+                rows.setdefault(session_id, (value, quantity_name))
+
+        formatted = dict(zip(rows, format_performances(rows.values())))
+        for session in sessions:
+            row = rows.get(session.pk)
+            if row is None:
+                session.performance = None
+                continue
+            value, quantity_name = row
+            session.performance = {
+                "performance": formatted[session.pk],
+                "quantity_name": QUANTITY_LABELS[quantity_name],
+                "value": value,
+            }
 
 
 class WorkoutStyle(SerializableModel):
@@ -166,6 +258,11 @@ class WorkoutStyle(SerializableModel):
         return str(self.name)
 
 
+# Display labels for quantity names, looked up once per performance rather than building a
+# `QuantityNameChoices` member each time.
+QUANTITY_LABELS = dict(WorkoutStyle.QuantityNameChoices.choices)
+
+
 class Interval(SerializableModel):
     """The workout interval model.
 
@@ -208,6 +305,9 @@ class Interval(SerializableModel):
         help_text="Optional post-interval rest period.",
     )
 
+    serialize_related = {"schemes": "scheme_set"}
+    default_expand = ["schemes", "style"]
+
     # TODO: Add sequence field
 
     def __str__(self):
@@ -218,12 +318,6 @@ class Interval(SerializableModel):
             return f"{exercises[0]} - {self.style}"
         return f"{exercises[0]} + {exercise_count - 1} - {self.style}"
 
-    def serialize(self, format="python"):
-        obj = super().serialize(format)
-        obj["schemes"] = [scheme.serialize(format) for scheme in self.scheme_set.all()]
-        obj["style"] = self.style.serialize(format)
-        return obj
-
 
 class Scheme(SerializableModel):
     """The scheme model.
@@ -269,6 +363,10 @@ class Scheme(SerializableModel):
     pace_two = models.DurationField(editable=False, blank=True, default=timedelta)
     pace_three = models.DurationField(editable=False, blank=True, default=timedelta)
 
+    # XXX: I can't remember what I was thinking with these.
+    excluded_fields = ["pace_one", "pace_two", "pace_three"]
+    default_expand = ["exercise"]
+
     def __str__(self):
         if self.reps:
             return f"{self.exercise} x {self.reps}"
@@ -280,15 +378,6 @@ class Scheme(SerializableModel):
             return f"{self.distance}m {self.exercise}"
         return f"{self.exercise} for {self.scheme.time_limit}"
 
-    def serialize(self, format="python"):
-        obj = super().serialize(format=format)
-        obj["exercise"] = self.exercise.serialize(format)
-        # XXX: I can't remember what I was thinking with these.
-        del obj["pace_one"]
-        del obj["pace_two"]
-        del obj["pace_three"]
-        return obj
-
 
 class Licence(SerializableModel):
     """Exercise licence attribution.
@@ -497,10 +586,11 @@ class Performance(SerializableModel):
 
     session = models.ForeignKey(to=Session, on_delete=models.CASCADE)
     interval = models.ForeignKey(to=Interval, on_delete=models.CASCADE)
-    performance = models.DecimalField(
-        max_digits=20,
-        decimal_places=2,
-        help_text="A measure of performance. Performance units depend on the style of the workout.",
+    performance = models.BigIntegerField(
+        help_text=(
+            "A measure of performance in the base unit of the workout style: milliseconds for "
+            "time, millimetres for distance, grams for weight, watts for rate of work, or reps."
+        ),
     )
 
 
@@ -516,3 +606,146 @@ class Like(SerializableModel):
     # False for an un-like, thumbs down or un-pin action, True for like, thumbsup or pin.
     action = models.BooleanField()
     timestamp = models.DateTimeField()
+
+    class Meta:
+        indexes = [
+            models.Index(
+                fields=["user", "workout", "-timestamp"],
+                name="like_user_workout_time_idx",
+            ),
+        ]
+
+
+class Change(models.Model):
+    """The change log model.
+
+    One row per tracked object, recording the last time it was saved or deleted. Each change
+    takes a new `seq`, so the rows after a client's last seen `seq` are exactly what changed
+    since, with deletions left behind as tombstones. See `workouts.sync`.
+    """
+
+    seq = models.BigAutoField(primary_key=True)
+    model = models.CharField(max_length=100, help_text="The model name of the object.")
+    object_id = models.PositiveIntegerField()
+    deleted = models.BooleanField(default=False)
+
+    # The user a private object belongs to, or null for the shared catalog. Not a constraint,
+    # so tombstones outlive the users they were for.
+    user = models.ForeignKey(
+        to=settings.AUTH_USER_MODEL,
+        on_delete=models.DO_NOTHING,
+        db_constraint=False,
+        null=True,
+        related_name="+",
+    )
+
+    class Meta:
+        constraints = [
+            models.UniqueConstraint(
+                fields=["model", "object_id"], name="unique_change_object"
+            ),
+        ]
+        indexes = [
+            models.Index(fields=["user", "seq"], name="change_user_seq_idx"),
+        ]
+
+
+class WorkoutTrend(models.Model):
+    """The trending score of a workout.
+
+    Scores are kept as logarithms so they can be updated one event at a time without ever
+    decaying the stored values. See `workouts.trending`.
+    """
+
+    workout = models.OneToOneField(
+        to=Workout,
+        on_delete=models.CASCADE,
+        primary_key=True,
+        related_name="trend",
+    )
+    log_score = models.FloatField()
+
+    class Meta:
+        indexes = [
+            models.Index(fields=["-log_score"], name="trend_log_score_idx"),
+        ]
+
+
+class IntervalSketch(models.Model):
+    """A quantile sketch of every performance recorded for an interval.
+
+    Used to estimate how a performance ranks against everyone else's without counting them.
+    See `workouts.percentiles`.
+    """
+
+    interval = models.OneToOneField(
+        to=Interval,
+        on_delete=models.CASCADE,
+        primary_key=True,
+        related_name="sketch",
+    )
+    data = models.BinaryField(help_text="The serialized `KLLSketch`.")
+
+    def load(self):
+        return KLLSketch.from_bytes(bytes(self.data))
+
+
+class AthleteSketch(models.Model):
+    """A distinct count of the users who completed a workout, on one day or ever.
+
+    Each row is a serialized `HyperLogLog` of user ids. See `workouts.athletes`.
+    """
+
+    workout = models.ForeignKey(to=Workout, on_delete=models.CASCADE)
+    day = models.DateField(
+        null=True, blank=True, help_text="The day counted, or empty for all time."
+    )
+    data = models.BinaryField(help_text="The serialized `HyperLogLog`.")
+
+    class Meta:
+        constraints = [
+            models.UniqueConstraint(
+                fields=["workout", "day"], name="athletesketch_workout_day"
+            ),
+            models.UniqueConstraint(
+                fields=["workout"],
+                condition=models.Q(day=None),
+                name="athletesketch_workout_all_time",
+            ),
+        ]
+
+    def load(self):
+        return HyperLogLog.from_bytes(bytes(self.data))
+
+
+class Streak(models.Model):
+    """A user's training streak: their run of consecutive days with at least one session.
+
+    Kept up to date by `workouts.streaks` as sessions are added and deleted.
+    """
+
+    user = models.OneToOneField(
+        to=settings.AUTH_USER_MODEL,
+        on_delete=models.CASCADE,
+        primary_key=True,
+        related_name="streak",
+    )
+    start_day = models.DateField(help_text="The first day of the latest run.")
+    last_day = models.DateField(help_text="The last day the user trained.")
+    longest = models.PositiveIntegerField(
+        default=0, help_text="The length in days of the user's longest run."
+    )
+
+    @property
+    def length(self):
+        """The length in days of the latest run, whether or not it's still going."""
+        return (self.last_day - self.start_day).days + 1
+
+    def current(self, today):
+        """Return the length of the run that's still going on `today`, or 0 if it's over.
+
+        A run isn't over until a whole day has passed without training.
+        """
+        if (today - self.last_day).days > 1:
+            return 0
+        return self.length
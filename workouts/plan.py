@@ -0,0 +1,155 @@
+"""Compiled workout plans for interval timer clients.
+
+A `Workout` is a tree of intervals and schemes. `compile_plan` flattens one round of it into an
+ordered list of steps, with the totals for the whole workout precomputed, so clients can run a
+timer without walking the tree themselves.
+
+Compiled plans are cached under the workout's version, which the signal handlers in
+`workouts.signals` bump whenever the workout, its intervals, schemes, exercises or styles change.
+"""
+
+from django.core.cache import cache
+from django.db.models import Prefetch
+
+from .models import Scheme
+from .models import Workout
+from .versions import get_version
+
+# Rough effort estimates used when a scheme has no duration of its own.
+SECONDS_PER_REP = 3
+SECONDS_PER_METRE = 0.36
+SECONDS_PER_CALORIE = 4
+
+# The order of the values in each step.
+STEP_FIELDS = [
+    "interval",
+    "exercise",
+    "reps",
+    "duration",
+    "distance",
+    "calories",
+    "time_limit",
+]
+
+PLAN_TIMEOUT = 60 * 60 * 24
+
+
+def _ms(delta):
+    return int(delta.total_seconds() * 1000)
+
+
+def _estimate(scheme):
+    """Return the estimated time, in milliseconds, to complete one scheme."""
+    if scheme.duration:
+        return _ms(scheme.duration)
+
+    seconds = (
+        scheme.reps * SECONDS_PER_REP
+        + scheme.distance * SECONDS_PER_METRE
+        + scheme.calories * SECONDS_PER_CALORIE
+    )
+    estimate = int(seconds * 1000)
+    if scheme.time_limit:
+        limit = _ms(scheme.time_limit)
+        return min(estimate, limit) if estimate else limit
+    return estimate
+
+
+def compile_plan(workout):
+    """Flatten `workout` into a compact plan.
+
+    Steps cover a single round, with each interval's schemes repeated `repeat` times and a rest
+    step (with a null exercise) after any interval that has a rest period. All durations are in
+    milliseconds. Totals cover every round.
+    """
+    intervals = list(
+        workout.interval_set.order_by("pk")
+        .select_related("style")
+        .prefetch_related(
+            Prefetch(
+                "scheme_set",
+                queryset=Scheme.objects.order_by("pk").select_related("exercise"),
+            )
+        )
+    )
+
+    steps = []
+    exercises = {}
+    interval_info = {}
+    totals = {"duration": 0, "reps": 0, "distance": 0, "calories": 0}
+    estimated = 0
+
+    for interval in intervals:
+        schemes = list(interval.scheme_set.all())
+        rest = _ms(interval.rest)
+        interval_info[interval.pk] = {
+            "style": interval.style.name,
+            "quantity_name": interval.style.quantity_name,
+            "repeat": interval.repeat,
+            "time_limit": _ms(interval.time_limit),
+            "rest": rest,
+        }
+
+        for scheme in schemes:
+            exercises[scheme.exercise_id] = scheme.exercise.name
+
+        for _ in range(interval.repeat):
+            for scheme in schemes:
+                steps.append(
+                    [
+                        interval.pk,
+                        scheme.exercise_id,
+                        scheme.reps,
+                        _ms(scheme.duration),
+                        scheme.distance,
+                        scheme.calories,
+                        _ms(scheme.time_limit),
+                    ]
+                )
+
+        if rest:
+            steps.append([interval.pk, None, 0, rest, 0, 0, 0])
+
+        for scheme in schemes:
+            totals["duration"] += _ms(scheme.duration) * interval.repeat
+            totals["reps"] += scheme.reps * interval.repeat
+            totals["distance"] += scheme.distance * interval.repeat
+            totals["calories"] += scheme.calories * interval.repeat
+        totals["duration"] += rest
+
+        # An interval with a time limit (an AMRAP or EMOM, say) lasts exactly that long.
+        if interval.time_limit:
+            estimated += _ms(interval.time_limit) + rest
+        else:
+            estimated += sum(map(_estimate, schemes)) * interval.repeat + rest
+
+    totals = {name: value * workout.rounds for name, value in totals.items()}
+    estimated *= workout.rounds
+    if workout.time_limit:
+        estimated = min(estimated, _ms(workout.time_limit))
+    totals["estimated_time"] = estimated
+
+    return {
+        "workout": workout.pk,
+        "name": workout.name,
+        "rounds": workout.rounds,
+        "time_limit": _ms(workout.time_limit),
+        "exercises": exercises,
+        "intervals": interval_info,
+        "step_fields": STEP_FIELDS,
+        "steps": steps,
+        "totals": totals,
+    }
+
+
+def get_plan(workout_id):
+    """Return the compiled plan for a workout, or None if there is no such workout."""
+    key = f"workouts:plan:{workout_id}:{get_version('workout', workout_id)}"
+    plan = cache.get(key)
+    if plan is None:
+        workout = Workout.objects.filter(pk=workout_id).first()
+        if workout is None:
+            return None
+        plan = compile_plan(workout)
+        cache.set(key, plan, timeout=PLAN_TIMEOUT)
+    return plan
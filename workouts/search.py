@@ -0,0 +1,139 @@
+"""Full-text search over workouts and exercises.
+
+On SQLite, the names and descriptions of every workout and exercise are indexed in the
+`workouts_search` FTS5 table, which triggers created by migration `0005_search_index` keep in
+step with the source tables. Each row's rowid is the object's id times two, plus its kind.
+
+Other databases fall back to substring matching.
+"""
+
+import re
+
+from django.db.models import Q
+from django.db.models.expressions import RawSQL
+from django.utils.html import escape
+
+from project.db.routers import connection_for_read
+
+from .models import Exercise
+from .models import Workout
+
+KINDS = {"workout": 0, "exercise": 1}
+MODELS = {"workout": Workout, "exercise": Exercise}
+
+# Matches in the name count for more than matches in the description.
+NAME_WEIGHT = 10.0
+DESCRIPTION_WEIGHT = 1.0
+
+# The number of tokens around a match in a snippet.
+SNIPPET_TOKENS = 12
+
+# Snippet markers that can't appear in the indexed text, replaced after escaping.
+_START, _END = "\x02", "\x03"
+
+
+def build_query(q):
+    """Turn user input into an FTS5 query matching every word as a prefix, or None."""
+    words = re.findall(r"\w+", q.lower())
+    if not words:
+        return None
+    return " ".join(f'"{word}"*' for word in words)
+
+
+def is_supported(connection):
+    return connection.vendor == "sqlite"
+
+
+def search(q, kind=None, limit=20):
+    """Return the best matches for `q`, optionally only of one kind, best first.
+
+    Each match is a dictionary with the object's `type`, `id` and `name`, and a `snippet` of
+    HTML-escaped description with matching words wrapped in `<mark>` tags.
+    """
+    query = build_query(q)
+    if query is None:
+        return []
+
+    connection = connection_for_read(Workout)
+    if not is_supported(connection):
+        return _search_fallback(q, kind, limit)
+
+    where = "workouts_search MATCH %s"
+    params = [_START, _END, query]
+    if kind is not None:
+        where += " AND rowid %% 2 = %s"
+        params.append(KINDS[kind])
+
+    with connection.cursor() as cursor:
+        cursor.execute(
+            "SELECT rowid, name, "
+            f"snippet(workouts_search, 1, %s, %s, '…', {SNIPPET_TOKENS}) "
+            "FROM workouts_search "
+            f"WHERE {where} "
+            f"ORDER BY bm25(workouts_search, {NAME_WEIGHT}, {DESCRIPTION_WEIGHT}) "
+            "LIMIT %s",
+            params + [limit],
+        )
+        rows = cursor.fetchall()
+
+    kinds = {value: name for name, value in KINDS.items()}
+    return [
+        {
+            "type": kinds[rowid % 2],
+            "id": rowid // 2,
+            "name": name,
+            "snippet": escape(snippet)
+            .replace(_START, "<mark>")
+            .replace(_END, "</mark>"),
+        }
+        for rowid, name, snippet in rows
+    ]
+
+
+def _search_fallback(q, kind, limit):
+    kinds = [kind] if kind is not None else list(KINDS)
+    results = []
+    for name in kinds:
+        matches = (
+            MODELS[name]
+            .objects.filter(Q(name__icontains=q) | Q(description__icontains=q))
+            .values_list("pk", "name", "description")[:limit]
+        )
+        for pk, object_name, description in matches:
+            results.append(
+                {
+                    "type": name,
+                    "id": pk,
+                    "name": object_name,
+                    "snippet": escape(description[:200]),
+                }
+            )
+    return results[:limit]
+
+
+def matching(q, kind):
+    """Return an expression for the ids of every object of `kind` that matches `q`, or None.
+
+    For use in a `pk__in` lookup, so the search runs as a subquery.
+    """
+    query = build_query(q)
+    if query is None:
+        return None
+    return RawSQL(
+        "SELECT rowid / 2 FROM workouts_search "
+        "WHERE workouts_search MATCH %s AND rowid %% 2 = %s",
+        [query, KINDS[kind]],
+    )
+
+
+class SearchAdminMixin:
+    """Answer admin searches from the full-text index instead of `LIKE` scans."""
+
+    search_kind = None
+
+    def get_search_results(self, request, queryset, search_term):
+        if search_term and is_supported(connection_for_read(queryset.model)):
+            ids = matching(search_term, self.search_kind)
+            if ids is not None:
+                return queryset.filter(pk__in=ids), False
+        return super().get_search_results(request, queryset, search_term)
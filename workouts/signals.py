@@ -0,0 +1,156 @@
+"""Signal handlers that keep derived workout data and cache versions in step with the data."""
+
+from django.contrib.auth import get_user_model
+from django.db.models.signals import post_delete
+from django.db.models.signals import post_save
+from django.dispatch import receiver
+from django.utils import timezone
+
+from . import catalog
+from . import sync
+from . import tasks
+from .autocomplete import exercises
+from .autocomplete import workouts
+from .models import Exercise
+from .models import Interval
+from .models import Licence
+from .models import Performance
+from .models import Scheme
+from .models import Session
+from .models import Workout
+from .models import WorkoutStyle
+from .versions import bump_versions
+
+# User fields that cached data shows. Saves that touch none of them, like the `last_login` update
+# on every login, leave the user's version alone.
+USER_VERSION_FIELDS = {"first_name", "last_name"}
+
+
+@receiver(post_save, sender=Workout)
+@receiver(post_delete, sender=Workout)
+def workout_changed(sender, instance, **kwargs):
+    bump_versions("workout", [instance.pk])
+
+
+@receiver(post_save, sender=Interval)
+@receiver(post_delete, sender=Interval)
+def interval_changed(sender, instance, **kwargs):
+    bump_versions("workout", [instance.workout_id])
+
+
+@receiver(post_save, sender=Scheme)
+@receiver(post_delete, sender=Scheme)
+def scheme_changed(sender, instance, **kwargs):
+    bump_versions(
+        "workout",
+        Interval.objects.filter(pk=instance.interval_id).values_list(
+            "workout_id", flat=True
+        ),
+    )
+
+
+@receiver(post_save, sender=Exercise)
+def exercise_changed(sender, instance, created, **kwargs):
+    if not created:
+        bump_versions(
+            "workout",
+            Interval.objects.filter(scheme__exercise=instance)
+            .values_list("workout_id", flat=True)
+            .distinct(),
+        )
+
+
+@receiver(post_save, sender=WorkoutStyle)
+def style_changed(sender, instance, created, **kwargs):
+    if not created:
+        bump_versions(
+            "workout",
+            Interval.objects.filter(style=instance)
+            .values_list("workout_id", flat=True)
+            .distinct(),
+        )
+
+
+@receiver(post_save, sender=get_user_model())
+def user_changed(sender, instance, created, update_fields=None, **kwargs):
+    if created or (
+        update_fields is not None and not USER_VERSION_FIELDS & set(update_fields)
+    ):
+        return
+    bump_versions("user", [instance.pk])
+
+
+def catalog_changed(sender, raw=False, **kwargs):
+    if not raw:
+        catalog.schedule_build()
+
+
+for model in [Workout, Interval, Scheme, Exercise, WorkoutStyle, Licence]:
+    post_save.connect(catalog_changed, sender=model)
+    post_delete.connect(catalog_changed, sender=model)
+
+
+@receiver(post_save, sender=Workout)
+def workout_saved(sender, instance, **kwargs):
+    workouts.update(instance.pk, instance.name)
+
+
+@receiver(post_delete, sender=Workout)
+def workout_deleted(sender, instance, **kwargs):
+    workouts.delete(instance.pk)
+
+
+@receiver(post_save, sender=Exercise)
+def exercise_saved(sender, instance, **kwargs):
+    exercises.update(instance.pk, instance.name)
+
+
+@receiver(post_delete, sender=Exercise)
+def exercise_deleted(sender, instance, **kwargs):
+    exercises.delete(instance.pk)
+
+
+def tracked_saved(sender, instance, raw=False, **kwargs):
+    # Fixtures are loaded in any order, so owners may not exist yet.
+    if not raw:
+        sync.record(instance)
+
+
+def tracked_deleted(sender, instance, **kwargs):
+    sync.record(instance, deleted=True)
+
+
+for model in sync.TRACKED:
+    post_save.connect(tracked_saved, sender=model)
+    post_delete.connect(tracked_deleted, sender=model)
+
+
+@receiver(post_save, sender=Session)
+def session_saved(sender, instance, created, raw=False, **kwargs):
+    bump_versions("session", [instance.pk])
+    if raw:
+        return
+    if created:
+        tasks.session_created.delay(instance.pk)
+    else:
+        tasks.session_changed.delay(instance.user_id)
+
+
+@receiver(post_delete, sender=Session)
+def session_deleted(sender, instance, **kwargs):
+    bump_versions("session", [instance.pk])
+    tasks.session_deleted.delay(
+        instance.user_id, timezone.localdate(instance.timestamp)
+    )
+
+
+@receiver(post_save, sender=Performance)
+def performance_saved(sender, instance, created, raw=False, **kwargs):
+    bump_versions("session", [instance.session_id])
+    if created and not raw:
+        tasks.performance_created.delay(instance.pk)
+
+
+@receiver(post_delete, sender=Performance)
+def performance_deleted(sender, instance, **kwargs):
+    bump_versions("session", [instance.session_id])
@@ -0,0 +1,193 @@
+"""Training streaks, kept up to date one session at a time.
+
+A run is a span of consecutive days, in the `TIME_ZONE` setting, on each of which a user
+completed at least one session. Each user's `Streak` has the first and last day of their latest
+run and the length of their longest, so a session on or after their last day updates it without
+reading any history.
+
+A session added for an earlier day, or deleted, can join or split runs. Then the run around the
+day that changed is found by reading the user's sessions a window of days at a time, so only
+that run is read. Only splitting a run as long as the longest reads the whole history, to find
+the new longest.
+"""
+
+from datetime import datetime
+from datetime import time
+from datetime import timedelta
+
+from django.db import transaction
+from django.utils import timezone
+
+from .models import Session
+from .models import Streak
+
+ONE_DAY = timedelta(days=1)
+
+# How many days of sessions are read at first when looking for the end of a run.
+WINDOW = 32
+
+
+def _start(day):
+    """Return the first instant of `day` in the current time zone."""
+    return timezone.make_aware(datetime.combine(day, time.min))
+
+
+def active_days(user_id, first, last):
+    """Return the days from `first` to `last`, inclusive, on which a user trained."""
+    timestamps = Session.objects.filter(
+        user_id=user_id,
+        timestamp__gte=_start(first),
+        timestamp__lt=_start(last + ONE_DAY),
+    ).values_list("timestamp", flat=True)
+    return {timezone.localdate(timestamp) for timestamp in timestamps}
+
+
+def _end(user_id, day, step):
+    """Return the end of the run through `day`, an active day, going `step` days at a time."""
+    window = WINDOW
+    end = day
+    while True:
+        if step < 0:
+            active = active_days(user_id, end - window * ONE_DAY, end - ONE_DAY)
+        else:
+            active = active_days(user_id, end + ONE_DAY, end + window * ONE_DAY)
+        for _ in range(window):
+            following = end + step * ONE_DAY
+            if following not in active:
+                return end
+            end = following
+        window *= 2
+
+
+def run(user_id, day):
+    """Return the first and last days of the run through `day`, an active day."""
+    return _end(user_id, day, -1), _end(user_id, day, 1)
+
+
+def runs(days):
+    """Yield the first and last days of each run in `days`, a sorted list of distinct days."""
+    first = last = None
+    for day in days:
+        if last is not None and day - last > ONE_DAY:
+            yield first, last
+            first = None
+        if first is None:
+            first = day
+        last = day
+    if first is not None:
+        yield first, last
+
+
+def _length(span):
+    first, last = span
+    return (last - first).days + 1
+
+
+def _history(user_id):
+    """Return the runs of every day a user has trained on."""
+    timestamps = Session.objects.filter(user_id=user_id).values_list(
+        "timestamp", flat=True
+    )
+    return list(runs(sorted({timezone.localdate(t) for t in timestamps})))
+
+
+def rebuild(user_id):
+    """Recompute a user's streak from every session they've completed."""
+    spans = _history(user_id)
+    if not spans:
+        Streak.objects.filter(user_id=user_id).delete()
+        return
+
+    start_day, last_day = spans[-1]
+    longest = max(map(_length, spans))
+    Streak.objects.update_or_create(
+        user_id=user_id,
+        defaults={"start_day": start_day, "last_day": last_day, "longest": longest},
+    )
+
+
+def record(user_id, day):
+    """Update a user's streak for a session they completed on `day`."""
+    with transaction.atomic():
+        streak = Streak.objects.select_for_update().filter(user_id=user_id).first()
+        if streak is None:
+            # A user's first sessions are all there is to read.
+            rebuild(user_id)
+            return
+
+        if day > streak.last_day:
+            if day - streak.last_day > ONE_DAY:
+                streak.start_day = day
+            streak.last_day = day
+        elif day >= streak.start_day:
+            return
+        else:
+            first, last = run(user_id, day)
+            if last >= streak.start_day:
+                streak.start_day = first
+            streak.longest = max(streak.longest, _length((first, last)))
+
+        streak.longest = max(streak.longest, streak.length)
+        streak.save()
+
+
+def forget(user_id, day):
+    """Update a user's streak after a session they completed on `day` was deleted."""
+    with transaction.atomic():
+        streak = Streak.objects.select_for_update().filter(user_id=user_id).first()
+        if streak is None or day > streak.last_day:
+            return
+
+        previous, following = day - ONE_DAY, day + ONE_DAY
+        active = active_days(user_id, previous, following)
+        if day in active:
+            return
+
+        # The run through `day` is split into the runs either side of it.
+        before = (_end(user_id, previous, -1), previous) if previous in active else None
+        after = (
+            (following, _end(user_id, following, 1)) if following in active else None
+        )
+        length = 1 + sum(_length(span) for span in [before, after] if span)
+
+        if day >= streak.start_day:
+            if after:
+                streak.start_day = after[0]
+            elif before:
+                streak.start_day, streak.last_day = before
+            else:
+                latest = (
+                    Session.objects.filter(user_id=user_id, timestamp__lt=_start(day))
+                    .order_by("-timestamp")
+                    .values_list("timestamp", flat=True)
+                    .first()
+                )
+                if latest is None:
+                    streak.delete()
+                    return
+                streak.last_day = timezone.localdate(latest)
+                streak.start_day = _end(user_id, streak.last_day, -1)
+
+        if length >= streak.longest:
+            # The longest run may have been the one that was split.
+            streak.longest = max(map(_length, _history(user_id)))
+        streak.save()
+
+
+def stats(user_id, today=None):
+    """Return a user's current and longest streaks, last active day and sessions this week.
+
+    Weeks start on Monday.
+    """
+    today = today or timezone.localdate()
+    streak = Streak.objects.filter(user_id=user_id).first()
+    monday = today - today.weekday() * ONE_DAY
+    this_week = Session.objects.filter(
+        user_id=user_id, timestamp__gte=_start(monday)
+    ).count()
+    return {
+        "current": streak.current(today) if streak else 0,
+        "longest": streak.longest if streak else 0,
+        "last_day": streak.last_day if streak else None,
+        "this_week": this_week,
+    }
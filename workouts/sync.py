@@ -0,0 +1,136 @@
+"""Change tracking for delta sync.
+
+Every save or delete of a tracked object replaces its row in the `Change` log with a new one,
+so the log holds one row per object, ordered by when it last changed. A client that remembers
+the last `seq` it saw asks for the rows after it and gets back only what changed, including
+tombstones for deleted objects, in pages of `SYNC_PAGE_SIZE`.
+
+Changes are recorded by the signal handlers in `workouts.signals`, in the same transaction as
+the change itself. Bulk updates and raw SQL skip signals, so code using them must call
+`record` or `record_many` itself.
+"""
+
+from django.conf import settings
+from django.db.models import Q
+
+from project.db.models import Selection
+from users.models import Friend
+
+from .models import Change
+from .models import Exercise
+from .models import Interval
+from .models import Like
+from .models import Performance
+from .models import Scheme
+from .models import Session
+from .models import Workout
+
+# Tracked models, mapped to the path of the user each object belongs to, or None for models
+# shared by everyone.
+TRACKED = {
+    Workout: None,
+    Interval: None,
+    Scheme: None,
+    Exercise: None,
+    Session: "user",
+    Performance: "session__user",
+    Like: "user",
+    Friend: "user",
+}
+
+# Fill in values that are computed per object, for many objects at once.
+PREFETCH = {
+    Workout: Workout.prefetch_summary,
+    Session: Session.prefetch_performance,
+}
+
+_MODELS = {model._meta.model_name: model for model in TRACKED}
+
+
+def owner(instance):
+    """Return the id of the user `instance` belongs to, or None if it's shared."""
+    path = TRACKED[type(instance)]
+    if path is None:
+        return None
+
+    name, _, rest = path.partition("__")
+    value = getattr(instance, type(instance)._meta.get_field(name).attname)
+    if not rest or value is None:
+        return value
+
+    # Look the owner up from the related row rather than through `instance`, which may be
+    # a deleted object whose relations are already gone.
+    related = type(instance)._meta.get_field(name).related_model
+    return (
+        related._default_manager.filter(pk=value).values_list(rest, flat=True).first()
+    )
+
+
+def record(instance, deleted=False):
+    """Log a change to `instance`, replacing any earlier change to it."""
+    record_many([instance], deleted)
+
+
+def record_many(instances, deleted=False):
+    """Log a change to each of `instances`, which are all of the same model."""
+    if not instances:
+        return
+    model = instances[0]._meta.model_name
+    Change.objects.filter(
+        model=model, object_id__in=[instance.pk for instance in instances]
+    ).delete()
+    Change.objects.bulk_create(
+        Change(
+            model=model,
+            object_id=instance.pk,
+            deleted=deleted,
+            user_id=owner(instance),
+        )
+        for instance in instances
+    )
+
+
+def changes(user, since=0, limit=None):
+    """Return a page of the changes visible to `user` after `since`.
+
+    Returns the changes, the `seq` to ask for the next page from and whether there are more.
+    Each change is a dictionary with the change's `seq`, the object's `model` and `id`, and
+    either `deleted` or the serialized `object`. Related objects are serialized as ids.
+    """
+    limit = limit or settings.SYNC_PAGE_SIZE
+    rows = list(
+        Change.objects.filter(Q(user=None) | Q(user=user), seq__gt=since).order_by(
+            "seq"
+        )[: limit + 1]
+    )
+    more = len(rows) > limit
+    rows = rows[:limit]
+
+    ids = {}
+    for row in rows:
+        if not row.deleted:
+            ids.setdefault(row.model, []).append(row.object_id)
+
+    selection = Selection()
+    objects = {}
+    for name, pks in ids.items():
+        model = _MODELS[name]
+        found = selection.apply(model._default_manager.all()).in_bulk(pks)
+        if model in PREFETCH:
+            PREFETCH[model](list(found.values()))
+        objects[name] = found
+
+    results = []
+    for row in rows:
+        change = {"seq": row.seq, "model": row.model, "id": row.object_id}
+        obj = None if row.deleted else objects[row.model].get(row.object_id)
+        if obj is None:
+            # Deleted since, so its tombstone comes later in the log.
+            if not row.deleted:
+                continue
+            change["deleted"] = True
+        else:
+            change["object"] = obj.serialize(selection=selection)
+        results.append(change)
+
+    return results, rows[-1].seq if rows else since, more
@@ -0,0 +1,53 @@
+"""Background jobs that keep derived workout data up to date.
+
+They're queued by the signal handlers in `workouts.signals`, so saving a session or performance
+doesn't wait for them. See `jobs.queue`.
+"""
+
+from datetime import date
+
+from django.utils import timezone
+
+from jobs.queue import task
+
+from . import athletes
+from . import percentiles
+from . import streaks
+from . import trending
+from .models import Performance
+from .models import Session
+
+
+@task()
+def session_created(session_id):
+    session = Session.objects.filter(pk=session_id).only("workout", "user", "timestamp")
+    session = session.first()
+    if session is None:
+        return
+    # Counting an athlete or a streak day twice changes nothing, but a trending score would
+    # count a session twice, so it's updated last, when a retry can't repeat it.
+    athletes.record(session.workout_id, session.user_id, session.timestamp)
+    streaks.record(session.user_id, timezone.localdate(session.timestamp))
+    trending.record(session.workout_id, trending.SESSION_WEIGHT, session.timestamp)
+
+
+@task()
+def performance_created(performance_id):
+    performance = (
+        Performance.objects.filter(pk=performance_id)
+        .values_list("interval_id", "performance")
+        .first()
+    )
+    if performance is not None:
+        percentiles.record(*performance)
+
+
+@task()
+def session_deleted(user_id, day):
+    streaks.forget(user_id, date.fromisoformat(day))
+
+
+@task(dedupe=True)
+def session_changed(user_id):
+    # The session may have moved to another day, but its old day isn't known.
+    streaks.rebuild(user_id)
@@ -1,17 +1,76 @@
+import asyncio
+import json
+import random
+import tempfile
+from datetime import datetime
+from datetime import time
+from datetime import timedelta
 from http import HTTPStatus
+from io import StringIO
+from pathlib import Path
+from types import SimpleNamespace
+from unittest import mock
 
+from django.core.cache import cache
+from django.core.management import call_command
+from django.core.serializers.json import DjangoJSONEncoder
+from django.db import connection
+from django.test import RequestFactory
+from django.test import SimpleTestCase
 from django.test import TestCase
+from django.test import TransactionTestCase
+from django.test import override_settings
 from django.urls import reverse
+from django.utils import timezone
 
+import msgpack
+
+from jobs.models import Job
+from jobs.queue import work
+from project.admin import EstimatedCountPaginator
+from project.autocomplete import get_index
+from project.autocomplete import get_indexes
+from project.db.models import serialization_memo
+from project.msgpack import packb
+from project.sketches import HyperLogLog
+from project.sketches import KLLSketch
+from project.views.batch import BatchView
+from project.views.generic import negotiate
+from project.db import routers
 from users.models import User
 
+from .likes import likes
+from . import athletes
+from . import catalog
+from . import live
+from . import streaks
+from .live import Hub
+from .live import LiveStreamApplication
+from .percentiles import prefetch_percentiles
 from .models import Exercise
+from .models import Change
+from .models import Interval
 from .models import Licence
+from .models import Like
+from .models import Performance
+from .models import Session
+from .models import Streak
+from .models import Scheme
+from .models import Workout
+from .plan import get_plan
+from .search import search
+from .units import format_performance
 
 
 class WorkoutsTestCase(TestCase):
     fixtures = ["workouts.json"]
 
+    def setUp(self):
+        cache.clear()
+        likes.clear()
+        for index in get_indexes().values():
+            index.clear()
+
     def login(self):
         email, password = "testuser@example.com", "Passw0rd!!"
         user = User.objects.create_user(email=email, password=password)
@@ -46,3 +105,870 @@ class WorkoutsTestCase(TestCase):
         """Test the workout AJAX API requires a login."""
         response = self.client.get(reverse("workouts:workouts"))
         self.assertEqual(response.status_code, HTTPStatus.FORBIDDEN)
+
+    def test_session_performance(self):
+        """Test that a session's performance is formatted from its base units."""
+        session = Session.objects.get(pk=3)
+        self.assertEqual(
+            session.performance,
+            {
+                "performance": "40 minutes 33 seconds",
+                "quantity_name": "Time",
+                "value": 2433650,
+            },
+        )
+
+    def test_prefetch_performance(self):
+        """Test that performance for many sessions is fetched with one query."""
+        sessions = list(Session.objects.all())
+        with self.assertNumQueries(1):
+            Session.prefetch_performance(sessions)
+            performances = [session.performance for session in sessions]
+        self.assertEqual(
+            performances, [session.performance for session in Session.objects.all()]
+        )
+
+    def test_workout_plan(self):
+        """Test that a workout compiles to a flat plan with precomputed totals."""
+        self.login()
+        response = self.client.get(reverse("workouts:plan", args=[3]))
+        self.assertEqual(response.status_code, HTTPStatus.OK)
+
+        plan = response.json()["data"]["plan"]
+        self.assertEqual(len(plan["steps"]), 5)
+        self.assertEqual(plan["totals"]["reps"], 600)
+        self.assertEqual(plan["totals"]["distance"], 3218)
+        self.assertGreater(plan["totals"]["estimated_time"], 0)
+
+    def test_workout_plan_cached_per_version(self):
+        """Test that compiled plans are cached until the workout changes."""
+        get_plan(3)
+        with self.assertNumQueries(0):
+            get_plan(3)
+
+        scheme = Scheme.objects.filter(interval__workout=3, reps=100).get()
+        scheme.reps = 50
+        scheme.save()
+        self.assertEqual(get_plan(3)["totals"]["reps"], 550)
+
+    @mock.patch("workouts.live.hub")
+    def test_live_session(self, hub):
+        """Test that live interval results are saved and published to friends."""
+        user = self.login()
+        with self.captureOnCommitCallbacks(execute=True):
+            response = self.client.post(reverse("workouts:live", args=[3]))
+        self.assertEqual(response.status_code, HTTPStatus.OK)
+        session_id = response.json()["data"]["session"]["id"]
+
+        interval = Interval.objects.filter(workout=3).order_by("pk").first()
+        url = reverse("workouts:live_interval", args=[session_id, interval.pk])
+        with self.captureOnCommitCallbacks(execute=True):
+            response = self.client.post(url, {"performance": 2433650})
+        self.assertEqual(response.status_code, HTTPStatus.OK)
+
+        session = Session.objects.get(pk=session_id)
+        self.assertEqual(session.performance["value"], 2433650)
+
+        topic, key, event = hub.publish_threadsafe.call_args.args
+        self.assertEqual(topic, f"user:{user.pk}")
+        self.assertEqual(key, session_id)
+        self.assertEqual(event["type"], "progress")
+        self.assertEqual(event["performance"], "40 minutes 33 seconds")
+
+        response = self.client.post(url, {"performance": "fast"})
+        self.assertEqual(response.status_code, HTTPStatus.BAD_REQUEST)
+
+    def test_live_session_not_owned(self):
+        """Test that users can only post results for their own sessions."""
+        self.login()
+        interval = Interval.objects.filter(workout=3).first()
+        url = reverse("workouts:live_interval", args=[3, interval.pk])
+        response = self.client.post(url, {"performance": 1})
+        self.assertEqual(response.status_code, HTTPStatus.NOT_FOUND)
+
+    def test_content_negotiation(self):
+        """Test that responses are compact JSON, or MessagePack if asked for."""
+        self.login()
+        url = reverse("workouts:workout", args=[3])
+        response = self.client.get(url)
+        self.assertEqual(response["Content-Type"], "application/json")
+        self.assertIn("Accept", response["Vary"])
+        self.assertNotIn(b"\n", response.content)
+        self.assertEqual(response.json()["data"]["workout"]["name"], "Murph")
+
+        packed = self.client.get(url, HTTP_ACCEPT="application/msgpack")
+        self.assertEqual(packed["Content-Type"], "application/msgpack")
+        self.assertTrue(packed.content.startswith(b"\x81\xa4data"))
+        self.assertLess(len(packed.content), len(response.content))
+
+    def test_sparse_fields(self):
+        """Test that only the requested fields are selected and serialized."""
+        self.login()
+        url = reverse("workouts:sessions")
+        # One query each for the session, the user and the sessions with their workouts.
+        with self.assertNumQueries(3):
+            response = self.client.get(url, {"fields": "timestamp,workout.name"})
+        session = response.json()["data"]["sessions"][0]
+        self.assertEqual(set(session), {"id", "timestamp", "workout"})
+        self.assertEqual(set(session["workout"]), {"id", "name"})
+
+        response = self.client.get(url, {"fields": "timestamp,user"})
+        session = response.json()["data"]["sessions"][0]
+        self.assertEqual(set(session), {"id", "timestamp", "user"})
+        self.assertIsInstance(session["user"], int)
+
+    def test_expand(self):
+        """Test that relations are only embedded when expanded."""
+        self.login()
+        url = reverse("workouts:workout", args=[3])
+        response = self.client.get(url, {"fields": "name"})
+        self.assertEqual(response.json()["data"]["workout"], {"id": 3, "name": "Murph"})
+
+        response = self.client.get(url, {"fields": "name", "expand": "intervals.style"})
+        interval = response.json()["data"]["workout"]["intervals"][0]
+        self.assertEqual(interval["style"]["name"], "For Time")
+        self.assertNotIn("schemes", interval)
+
+        # A related list named in `fields` is expanded rather than left out.
+        response = self.client.get(url, {"fields": "name,intervals"})
+        workout = response.json()["data"]["workout"]
+        self.assertEqual(set(workout), {"id", "name", "intervals"})
+        self.assertEqual(workout["intervals"][0]["style"]["name"], "For Time")
+        self.assertIn("schemes", workout["intervals"][0])
+
+        response = self.client.get(url, {"fields": "name", "expand": "name"})
+        self.assertEqual(response.json()["data"]["workout"], {"id": 3, "name": "Murph"})
+        response = self.client.get(
+            reverse("workouts:sessions"), {"expand": "timestamp"}
+        )
+        self.assertEqual(response.status_code, HTTPStatus.OK)
+        self.assertIn("timestamp", response.json()["data"]["sessions"][0])
+
+    def test_batch(self):
+        """Test that many API requests can be made in one round trip."""
+        self.login()
+        requests = [
+            {"id": "sessions", "path": "/api/sessions/?fields=timestamp"},
+            {"id": "murph", "path": "/api/workout/3/?fields=name"},
+            {"path": "/api/exercise/999/"},
+            {"path": "/admin/"},
+            {"path": "/api/friends/"},
+        ]
+        response = self.client.post(
+            reverse("batch"), {"requests": requests}, content_type="application/json"
+        )
+        self.assertEqual(response.status_code, HTTPStatus.OK)
+        responses = response.json()["responses"]
+        self.assertEqual(
+            [(r["id"], r["status"]) for r in responses],
+            [("sessions", 200), ("murph", 200), (2, 404), (3, 400), (4, 200)],
+        )
+        self.assertEqual(responses[1]["body"]["data"]["workout"]["name"], "Murph")
+        self.assertEqual(len(responses[0]["body"]["data"]["sessions"]), 5)
+        self.assertEqual(responses[4]["body"], {"data": [], "next": None})
+
+        response = self.client.post(
+            reverse("batch"), "[", content_type="application/json"
+        )
+        self.assertEqual(response.status_code, HTTPStatus.BAD_REQUEST)
+        response = self.client.post(
+            reverse("batch"),
+            {"requests": [{"path": 5}]},
+            content_type="application/json",
+        )
+        self.assertEqual(response.status_code, HTTPStatus.BAD_REQUEST)
+
+    def test_sync(self):
+        """Test that sync returns only what changed, with tombstones for deletions."""
+        user = self.login()
+        other = User.objects.create_user(email="other@example.com")
+        response = self.client.get(reverse("workouts:sync"))
+        since = response.json()["data"]["next"]
+
+        workout = Workout.objects.get(pk=3)
+        workout.description = "For time."
+        workout.save()
+        now = timezone.now()
+        mine = Session.objects.create(user=user, workout=workout, timestamp=now)
+        Session.objects.create(user=other, workout=workout, timestamp=now)
+        gone = Session.objects.create(user=user, workout=workout, timestamp=now).pk
+        Session.objects.filter(pk=gone).delete()
+
+        with self.settings(SYNC_PAGE_SIZE=2):
+            response = self.client.get(reverse("workouts:sync"), {"since": since})
+            data = response.json()["data"]
+            self.assertTrue(data["more"])
+            response = self.client.get(
+                reverse("workouts:sync"), {"since": data["next"]}
+            )
+        changes = data["changes"] + response.json()["data"]["changes"]
+        self.assertEqual(
+            [(change["model"], change["id"]) for change in changes],
+            [("workout", 3), ("session", mine.pk), ("session", gone)],
+        )
+        self.assertEqual(changes[0]["object"]["description"], "For time.")
+        self.assertEqual(changes[1]["object"]["workout"], 3)
+        self.assertTrue(changes[2]["deleted"])
+
+        data = response.json()["data"]
+        self.assertFalse(data["more"])
+        response = self.client.get(reverse("workouts:sync"), {"since": data["next"]})
+        self.assertEqual(response.json()["data"]["changes"], [])
+
+        for since in ["x", "-1", str(2**63)]:
+            response = self.client.get(reverse("workouts:sync"), {"since": since})
+            self.assertEqual(response.status_code, HTTPStatus.BAD_REQUEST)
+        response = self.client.get(reverse("workouts:sync"), {"since": 2**63 - 1})
+        self.assertEqual(response.status_code, HTTPStatus.OK)
+
+    @override_settings(LIKE_FLUSH_SECONDS=None)
+    def test_like_buffer(self):
+        """Test that like taps are buffered, coalesced and written in one batch."""
+        user = self.login()
+        url = reverse("workouts:like", args=[3])
+        for action in ["like", "unlike", "like"]:
+            response = self.client.post(url, {"action": action})
+            self.assertEqual(response.status_code, HTTPStatus.OK)
+        self.assertFalse(Like.objects.exists())
+        self.assertTrue(self.client.get(url).json()["data"]["like"]["liked"])
+
+        self.assertEqual(likes.flush(), 1)
+        like = Like.objects.get(user=user, workout=3)
+        self.assertTrue(like.action)
+        self.assertTrue(Change.objects.filter(model="like", object_id=like.pk).exists())
+
+        # A double tap that ends where it started writes nothing.
+        self.client.post(url, {"action": "unlike"})
+        self.client.post(url, {"action": "like"})
+        self.assertEqual(likes.flush(), 0)
+        self.assertTrue(self.client.get(url).json()["data"]["like"]["liked"])
+
+        with self.settings(LIKE_FLUSH_SIZE=1):
+            self.client.post(url, {"action": "unlike"})
+        self.assertEqual(len(likes), 0)
+        self.assertEqual(Like.objects.filter(user=user, workout=3).count(), 2)
+
+        # Pending likes are looked up a batch at a time.
+        for workout in [3, 4, 5]:
+            likes.add(user.pk, workout, True)
+        with mock.patch.object(
+            connection.ops, "bulk_batch_size", return_value=2
+        ) as bulk_batch_size:
+            self.assertEqual(likes.flush(), 3)
+        bulk_batch_size.assert_called()
+        created = Like.objects.filter(user=user, workout__in=[3, 4, 5], action=True)
+        self.assertEqual(
+            Change.objects.filter(
+                model="like", object_id__in=created.values("pk")
+            ).count(),
+            4,
+        )
+
+        # The flush reads from the database it writes to, even with replicas.
+        likes.add(user.pk, 5, False)
+        with mock.patch("project.db.routers.get_replicas", return_value=["replica"]):
+            self.assertEqual(likes.flush(), 1)
+        like = Like.objects.order_by("pk").last()
+        self.assertFalse(like.action)
+        self.assertTrue(Change.objects.filter(model="like", object_id=like.pk).exists())
+
+        response = self.client.post(url, {"action": "love"})
+        self.assertEqual(response.status_code, HTTPStatus.BAD_REQUEST)
+        response = self.client.post(
+            reverse("workouts:like", args=[999]), {"action": "like"}
+        )
+        self.assertEqual(response.status_code, HTTPStatus.NOT_FOUND)
+
+    @override_settings(LIKE_FLUSH_SECONDS=None)
+    def test_trending(self):
+        """Test that trending scores decay with age and are updated one event at a time."""
+        user = self.login()
+        now = timezone.now()
+        long_ago = now - timedelta(days=30)
+        for workout, timestamp in [(4, now), (4, now), (3, now)] + [(9, long_ago)] * 3:
+            Session.objects.create(user=user, workout_id=workout, timestamp=timestamp)
+        likes.add(user.pk, 3, True)
+        likes.flush()
+        work(burst=True)
+
+        response = self.client.get(reverse("workouts:trending"), {"fields": "name"})
+        self.assertEqual(response.status_code, HTTPStatus.OK)
+        results = response.json()["data"]["trending"]
+        self.assertEqual(
+            [result["workout"]["name"] for result in results],
+            ["15 Minute HIIT Body", "Murph", "The Longest Mile"],
+        )
+        self.assertAlmostEqual(results[0]["score"], 2.0, places=3)
+        self.assertAlmostEqual(results[1]["score"], 1.5, places=3)
+        self.assertAlmostEqual(results[2]["score"], 3 * 2**-10, places=5)
+
+        # Scores recorded at the old half-life are recomputed at the new one.
+        with self.settings(TRENDING_HALF_LIFE=60 * 60 * 36):
+            call_command("rebuildtrends", stdout=StringIO())
+            response = self.client.get(reverse("workouts:trending"), {"fields": "name"})
+        scores = [result["score"] for result in response.json()["data"]["trending"]]
+        self.assertAlmostEqual(scores[0], 2.0, places=3)
+        self.assertAlmostEqual(scores[1], 1.5, places=3)
+        self.assertAlmostEqual(scores[2], 3 * 2**-20, places=8)
+
+    def test_percentiles(self):
+        """Test that performances are ranked against the sketch of their interval."""
+        call_command("rebuildsketches", stdout=StringIO())
+        sessions = list(Session.objects.filter(pk__in=[2, 3, 4]).order_by("pk"))
+        prefetch_percentiles(sessions)
+        self.assertEqual([session.percentile for session in sessions], [50, 0, 0])
+
+        # Murph is for time, so a slower performance is beaten by both.
+        user = self.login()
+        session = Session.objects.create(
+            user=user, workout_id=3, timestamp=timezone.now()
+        )
+        Performance.objects.create(session=session, interval_id=12, performance=2500000)
+        work(burst=True)
+        prefetch_percentiles(sessions)
+        self.assertEqual([session.percentile for session in sessions], [66, 33, 0])
+
+    def test_athletes(self):
+        """Test that distinct athletes are counted per day and merged over periods."""
+        user = self.login()
+        other = User.objects.create_user(email="other@example.com", password="x")
+        now = timezone.now()
+        for athlete, days_ago in [(user, 0), (user, 1), (other, 10), (other, 100)]:
+            Session.objects.create(
+                user=athlete, workout_id=4, timestamp=now - timedelta(days=days_ago)
+            )
+        work(burst=True)
+
+        response = self.client.get(reverse("workouts:athletes", args=[4]))
+        self.assertEqual(response.status_code, HTTPStatus.OK)
+        self.assertEqual(
+            response.json()["data"]["athletes"],
+            {"week": 1, "month": 2, "all_time": 2},
+        )
+        today = timezone.localdate()
+        self.assertEqual(athletes.count(4, start=today - timedelta(days=1)), 1)
+        response = self.client.get(reverse("workouts:athletes", args=[999]))
+        self.assertEqual(response.status_code, HTTPStatus.NOT_FOUND)
+
+    def test_catalog_snapshot(self):
+        """Test that catalog objects are served from the snapshot, which follows changes."""
+        self.login()
+        url = reverse("workouts:workout", args=[3])
+        accepts = ["application/json", "application/msgpack"]
+        expected = [self.client.get(url, HTTP_ACCEPT=accept) for accept in accepts]
+
+        with tempfile.TemporaryDirectory() as directory:
+            path = Path(directory) / "catalog.snapshot"
+            with override_settings(CATALOG_SNAPSHOT=path):
+                call_command("buildcatalog", stdout=StringIO())
+                for accept, response in zip(accepts, expected):
+                    with self.assertNumQueries(2):
+                        snapshot = self.client.get(url, HTTP_ACCEPT=accept)
+                    self.assertEqual(snapshot.content, response.content)
+                    self.assertEqual(snapshot["Content-Type"], response["Content-Type"])
+                    self.assertIn("Accept", snapshot["Vary"])
+
+                response = self.client.get(reverse("workouts:exercise", args=[2]))
+                self.assertEqual(response.json()["data"]["exercise"]["name"], "Squat")
+                response = self.client.get(url, {"fields": "name"})
+                self.assertEqual(
+                    response.json()["data"]["workout"], {"id": 3, "name": "Murph"}
+                )
+                response = self.client.get(reverse("workouts:workout", args=[999]))
+                self.assertEqual(response.status_code, HTTPStatus.NOT_FOUND)
+
+                # Saving a workout and its schemes queues one build of the snapshot.
+                workout = Workout.objects.get(pk=3)
+                workout.name = "Murph Lite"
+                workout.save()
+                for scheme in Scheme.objects.filter(interval__workout=3):
+                    scheme.save()
+                self.assertEqual(Job.objects.filter(task=catalog.build.name).count(), 1)
+                self.assertEqual(work(burst=True), 1)
+                response = self.client.get(url)
+                self.assertEqual(
+                    response.json()["data"]["workout"]["name"], "Murph Lite"
+                )
+
+    def test_streaks(self):
+        """Test that streaks follow sessions added in and out of order, and deleted."""
+        user = self.login()
+        today = timezone.localdate()
+
+        def add(days_ago):
+            day = today - timedelta(days=days_ago)
+            return Session.objects.create(
+                user=user,
+                workout_id=3,
+                timestamp=timezone.make_aware(datetime.combine(day, time(12))),
+            )
+
+        def streak():
+            work(burst=True)
+            row = Streak.objects.get(user=user)
+            state = (row.current(today), row.longest)
+            streaks.rebuild(user.pk)
+            row = Streak.objects.get(user=user)
+            self.assertEqual(state, (row.current(today), row.longest))
+            return state
+
+        for days_ago in [7, 6, 5, 1]:
+            add(days_ago)
+        self.assertEqual(streak(), (1, 3))
+        add(0)
+        self.assertEqual(streak(), (2, 3))
+
+        # Filling the gap joins the runs.
+        add(2)
+        gap = add(3)
+        add(4)
+        self.assertEqual(streak(), (8, 8))
+        gap.delete()
+        self.assertEqual(streak(), (3, 4))
+
+        response = self.client.get(reverse("workouts:streak"))
+        self.assertEqual(
+            response.json()["data"]["streak"],
+            {
+                "current": 3,
+                "longest": 4,
+                "last_day": today.isoformat(),
+                "this_week": Session.objects.filter(
+                    user=user, timestamp__date__gte=today - timedelta(today.weekday())
+                ).count(),
+            },
+        )
+
+    def test_serialization_memo(self):
+        """Test that objects are serialized once while a memo is active."""
+        with serialization_memo():
+            first = Workout.objects.get(pk=3).serialize()
+            workout = Workout.objects.get(pk=3)
+            with self.assertNumQueries(0):
+                self.assertIs(workout.serialize(), first)
+
+    def test_dedupe(self):
+        """Test that shared exercises and styles are sent once and referred to by id."""
+        self.login()
+        response = self.client.get(reverse("workouts:workout", args=[3]), {"dedupe": 1})
+        payload = response.json()
+        interval = payload["data"]["workout"]["intervals"][0]
+        exercise_id = interval["schemes"][0]["exercise"]
+        self.assertIsInstance(exercise_id, int)
+        self.assertIn("name", payload["included"]["exercises"][str(exercise_id)])
+        self.assertIn(str(interval["style"]), payload["included"]["styles"])
+
+    def test_search(self):
+        """Test that search matches word prefixes and ranks name matches first."""
+        self.login()
+        response = self.client.get(reverse("workouts:search"), {"q": "thrust"})
+        self.assertEqual(response.status_code, HTTPStatus.OK)
+        results = response.json()["data"]["results"]
+        self.assertEqual(results[0], {**results[0], "type": "exercise", "id": 14})
+        self.assertIn("Fran", [result["name"] for result in results])
+
+        results = search("pull-ups", kind="workout")
+        self.assertTrue(results)
+        self.assertEqual({result["type"] for result in results}, {"workout"})
+        self.assertIn("<mark>", results[0]["snippet"])
+
+        response = self.client.get(reverse("workouts:search"), {"q": "a", "type": "x"})
+        self.assertEqual(response.status_code, HTTPStatus.BAD_REQUEST)
+
+        response = self.client.get(reverse("workouts:search"), {"q": "a", "limit": -1})
+        self.assertEqual(len(response.json()["data"]["results"]), 1)
+
+    def test_search_index_follows_changes(self):
+        """Test that the search index is kept in step with workouts and exercises."""
+        workout = Workout.objects.get(pk=3)
+        workout.name = "Memorial Day Murph"
+        workout.save()
+        self.assertEqual([r["name"] for r in search("memorial")], [workout.name])
+
+        workout.delete()
+        self.assertEqual(search("memorial"), [])
+
+    def test_autocomplete(self):
+        """Test that typeahead matches name and word prefixes, and near misses."""
+        self.login()
+        url = reverse("workouts:autocomplete")
+        response = self.client.get(url, {"q": "thr"})
+        self.assertEqual(response.status_code, HTTPStatus.OK)
+        results = response.json()["data"]["results"]
+        self.assertEqual(
+            results[0], {"type": "exercise", "id": 14, "label": "Thrusters"}
+        )
+        self.assertIn(
+            {"type": "workout", "id": 9, "label": "The Longest Mile"}, results
+        )
+
+        with self.assertNumQueries(0):
+            matches = get_index("workout").search("hiit")
+        self.assertEqual(matches, [(4, "15 Minute HIIT Body")])
+
+        labels = [label for pk, label in get_index("exercise").search("thurst")]
+        self.assertEqual(labels, ["Thrusters"])
+
+        response = self.client.get(url, {"q": "test", "type": "user"})
+        self.assertEqual(response.status_code, HTTPStatus.BAD_REQUEST)
+
+    def test_autocomplete_follows_changes(self):
+        """Test that the autocomplete indexes are updated when names change."""
+        index = get_index("workout")
+        self.assertEqual(index.search("memorial"), [])
+
+        workout = Workout.objects.get(pk=3)
+        workout.name = "Memorial Day Murph"
+        with self.captureOnCommitCallbacks(execute=True):
+            workout.save()
+        self.assertEqual(index.search("memorial"), [(3, workout.name)])
+        self.assertEqual(index.search("murph"), [(3, workout.name)])
+
+        with self.captureOnCommitCallbacks(execute=True):
+            workout.delete()
+        self.assertEqual(index.search("memorial"), [])
+
+    def test_session_feed_uses_index(self):
+        """Test that the index advisor finds nothing to propose for the session feed."""
+        self.login()
+        out = StringIO()
+        call_command("adviseindexes", user="testuser@example.com", stdout=out)
+        self.assertNotIn("workouts_session(", out.getvalue())
+
+
+class KLLSketchTestCase(SimpleTestCase):
+    def test_rank_error(self):
+        """Test that estimated ranks stay within the documented error, however many values."""
+        sketch = KLLSketch()
+        n = 50000
+        for value in random.Random(0).sample(range(n), n):
+            sketch.update(value)
+        self.assertLess(len(sketch.to_bytes()), 8192)
+        for value in range(0, n, n // 20):
+            self.assertLess(abs(sketch.rank(value) - (value + 1)), 0.02 * n)
+        self.assertAlmostEqual(sketch.quantile(0.5), n / 2, delta=0.02 * n)
+
+    def test_merge_and_round_trip(self):
+        """Test that merged and deserialized sketches summarise every value."""
+        first, second = KLLSketch(), KLLSketch()
+        for value in range(1000):
+            (first if value % 2 else second).update(value)
+        first.merge(second)
+        sketch = KLLSketch.from_bytes(first.to_bytes())
+        self.assertEqual(sketch.n, 1000)
+        self.assertEqual(sketch.rank(999), 1000)
+        self.assertAlmostEqual(sketch.rank(499), 500, delta=20)
+
+
+class HyperLogLogTestCase(SimpleTestCase):
+    def test_count_error(self):
+        """Test that merged counts are within a few standard errors of the distinct count."""
+        first, second = HyperLogLog(), HyperLogLog()
+        for value in range(30000):
+            first.add(value)
+            second.add(value + 20000)
+        first.merge(second)
+        merged = HyperLogLog.from_bytes(first.to_bytes())
+        self.assertAlmostEqual(merged.count(), 50000, delta=50000 * 0.05)
+        self.assertEqual(HyperLogLog().count(), 0)
+
+
+@mock.patch("project.db.routers.get_replicas", return_value=["replica"])
+class ReplicaRouterTestCase(TestCase):
+    def setUp(self):
+        self.router = routers.PrimaryReplicaRouter()
+        self.token = routers.begin()
+        self.addCleanup(lambda: routers.end(self.token))
+
+    def test_reads_go_to_replica(self, get_replicas):
+        """Test that reads are routed to a replica and writes to the primary."""
+        self.assertEqual(self.router.db_for_read(Workout), "replica")
+        self.assertEqual(self.router.db_for_write(Workout), "default")
+
+    def test_reads_pinned_after_write(self, get_replicas):
+        """Test that reads stick to the primary once something has been written."""
+        # Asking for the write database, or reading from it, doesn't pin.
+        self.router.db_for_write(Workout)
+        Workout.objects.using("default").exists()
+        self.assertEqual(self.router.db_for_read(Workout), "replica")
+
+        Workout.objects.using("default").filter(pk=3).update(rounds=5)
+        self.assertEqual(self.router.db_for_read(Workout), "default")
+
+        routers.end(self.token)
+        self.token = routers.begin()
+        self.assertEqual(self.router.db_for_read(Workout), "replica")
+
+    def test_use_primary(self, get_replicas):
+        """Test that reads can be explicitly sent to the primary."""
+        with routers.use_primary():
+            self.assertEqual(self.router.db_for_read(Workout), "default")
+        self.assertEqual(self.router.db_for_read(Workout), "replica")
+
+
+class LiveHubTestCase(SimpleTestCase):
+    def test_coalesce(self):
+        """Test that subscribers only get the latest update for each key."""
+
+        async def run():
+            hub = Hub(max_pending=10)
+            subscriber = hub.subscribe(["user:1"])
+            hub.publish("user:1", 5, {"value": 1})
+            hub.publish("user:1", 6, {"value": 2})
+            hub.publish("user:1", 5, {"value": 3})
+            hub.publish("user:2", 7, {"value": 4})
+            return await subscriber.get(timeout=1)
+
+        events, lagged = asyncio.run(run())
+        self.assertEqual(events, [{"value": 2}, {"value": 3}])
+        self.assertFalse(lagged)
+
+    def test_backpressure(self):
+        """Test that slow subscribers drop their oldest updates and are told they lagged."""
+
+        async def run():
+            hub = Hub(max_pending=2)
+            subscriber = hub.subscribe(["user:1"])
+            for key in range(5):
+                hub.publish("user:1", key, {"value": key})
+            return await subscriber.get(timeout=1)
+
+        events, lagged = asyncio.run(run())
+        self.assertEqual(events, [{"value": 3}, {"value": 4}])
+        self.assertTrue(lagged)
+
+    def test_publish_threadsafe(self):
+        """Test that updates published from other threads reach subscribers."""
+
+        async def run():
+            hub = Hub()
+            subscriber = hub.subscribe(["user:1"])
+            loop = asyncio.get_running_loop()
+            await loop.run_in_executor(
+                None, hub.publish_threadsafe, "user:1", 1, {"value": 1}
+            )
+            events, lagged = await subscriber.get(timeout=1)
+            hub.unsubscribe(subscriber)
+            return events, hub.topics
+
+        events, topics = asyncio.run(run())
+        self.assertEqual(events, [{"value": 1}])
+        self.assertEqual(topics, {})
+
+    def test_stream_requires_login(self):
+        """Test that the event stream is forbidden to anonymous users."""
+        messages = []
+
+        async def send(message):
+            messages.append(message)
+
+        async def run():
+            app = LiveStreamApplication(None)
+            scope = {"type": "http", "path": app.path, "headers": []}
+            await app(scope, None, send)
+
+        asyncio.run(run())
+        self.assertEqual(messages[0]["status"], HTTPStatus.FORBIDDEN)
+
+    @mock.patch("users.core.get_friends", return_value=[{"user_id": 2}])
+    @mock.patch.object(
+        LiveStreamApplication,
+        "_get_user",
+        return_value=SimpleNamespace(is_authenticated=True, id=1),
+    )
+    def test_stream(self, get_user, get_friends):
+        """Test that the event stream sends friends' updates until the client disconnects."""
+        messages = []
+
+        async def run():
+            disconnect = asyncio.Event()
+            requests = [{"type": "http.request", "body": b"", "more_body": False}]
+
+            async def receive():
+                if requests:
+                    return requests.pop(0)
+                await disconnect.wait()
+                return {"type": "http.disconnect"}
+
+            async def send(message):
+                messages.append(message)
+                if message.get("body", b"").startswith(b"event:"):
+                    disconnect.set()
+
+            app = LiveStreamApplication(None)
+            scope = {"type": "http", "path": app.path, "headers": []}
+            stream = asyncio.ensure_future(app(scope, receive, send))
+
+            async def subscribed():
+                while "user:2" not in live.hub.topics:
+                    await asyncio.sleep(0.01)
+
+            await asyncio.wait_for(subscribed(), 5)
+            live.hub.publish("user:2", 7, {"type": "progress", "value": 1})
+            await asyncio.wait_for(stream, 5)
+
+        asyncio.run(run())
+        self.assertEqual(messages[0]["status"], HTTPStatus.OK)
+        self.assertEqual(
+            messages[-1]["body"],
+            b'event: progress\ndata: {"type":"progress","value":1}\n\n',
+        )
+        self.assertNotIn("user:2", live.hub.topics)
+
+
+class BatchTestCase(TransactionTestCase):
+    fixtures = ["workouts.json"]
+
+    def test_batch_threaded(self):
+        """Test that sub-requests run on a thread pool, and that one failing fails alone."""
+        requests = [
+            {"path": "/api/workout/3/?fields=name"},
+            {"path": "/api/exercise/999/"},
+            {"path": "/api/workouts/"},
+        ]
+        request = RequestFactory().post(
+            reverse("batch"), {"requests": requests}, content_type="application/json"
+        )
+        request.user = User(email="testuser@example.com")
+        # Outside a transaction, so the sub-requests run on other threads, whose connections
+        # can read the committed fixtures.
+        with mock.patch(
+            "workouts.views.WorkoutListView.get", side_effect=RuntimeError
+        ), self.assertLogs("project.views.batch", "ERROR"):
+            response = BatchView.as_view()(request)
+
+        self.assertEqual(response.status_code, HTTPStatus.OK)
+        responses = json.loads(response.content)["responses"]
+        self.assertEqual(
+            [(r["status"], r["body"]) for r in responses],
+            [
+                (200, {"data": {"workout": {"id": 3, "name": "Murph"}}}),
+                (404, None),
+                (500, None),
+            ],
+        )
+
+
+class NegotiationTestCase(SimpleTestCase):
+    def test_negotiate(self):
+        """Test that the best supported media type in an Accept header is chosen."""
+        self.assertEqual(negotiate(None), "application/json")
+        self.assertEqual(negotiate("*/*"), "application/json")
+        self.assertEqual(negotiate("text/html"), "application/json")
+        self.assertEqual(negotiate("application/x-msgpack"), "application/msgpack")
+        self.assertEqual(
+            negotiate("application/json;q=0.5, application/msgpack"),
+            "application/msgpack",
+        )
+        self.assertEqual(
+            negotiate("application/msgpack, application/json"), "application/msgpack"
+        )
+        self.assertEqual(negotiate("application/msgpack;q=0, */*"), "application/json")
+
+    def test_packb(self):
+        """Test that values are packed in their most compact MessagePack form."""
+        self.assertEqual(packb(None), b"\xc0")
+        self.assertEqual(packb([True, False]), b"\x92\xc3\xc2")
+        self.assertEqual(packb(5), b"\x05")
+        self.assertEqual(packb(-1), b"\xff")
+        self.assertEqual(packb(300), b"\xcd\x01\x2c")
+        self.assertEqual(packb(-200), b"\xd1\xff\x38")
+        self.assertEqual(packb(1.5), b"\xcb\x3f\xf8" + bytes(6))
+        self.assertEqual(packb({"a": "b"}), b"\x81\xa1a\xa1b")
+        self.assertEqual(packb("x" * 40), b"\xd9\x28" + b"x" * 40)
+        self.assertEqual(packb(b"\x00"), b"\xc4\x01\x00")
+        with self.assertRaises(TypeError):
+            packb(object())
+
+    def test_packb_round_trip(self):
+        """Test that packed API data decodes back to the same values."""
+        data = {
+            "none": None,
+            "bools": [True, False],
+            "ints": [0, 127, -32, -33, 255, 65536, 2**32, -(2**63), 2**64 - 1],
+            "float": 0.1,
+            "strings": ["", "x" * 40, "x" * 300, "Ünïcode"],
+            "bytes": b"\x00" * 300,
+            "tuple": (1, 2),
+            "nested": {str(i): list(range(i)) for i in range(20)},
+            "timestamp": datetime(2021, 1, 2, 3, 4, 5),
+        }
+        unpacked = msgpack.unpackb(packb(data, default=DjangoJSONEncoder().default))
+        self.assertEqual(
+            unpacked, {**data, "tuple": [1, 2], "timestamp": "2021-01-02T03:04:05"}
+        )
+
+
+class UnitsTestCase(SimpleTestCase):
+    def test_format_performance(self):
+        """Test that performances in base units are formatted for display."""
+        self.assertEqual(format_performance(2350140, "T"), "39 minutes 10 seconds")
+        self.assertEqual(format_performance(3605000, "T"), "1 hour")
+        self.assertEqual(format_performance(450, "T"), "450 milliseconds")
+        self.assertEqual(format_performance(1609000, "D"), "1.61 km")
+        self.assertEqual(format_performance(400000, "D"), "400 m")
+        self.assertEqual(format_performance(62500, "W"), "62.5 kg")
+        self.assertEqual(format_performance(1, "R"), "1 rep")
+        self.assertEqual(format_performance(57, "A"), "57 W")
+
+
+class AdminTestCase(TestCase):
+    fixtures = ["workouts.json"]
+
+    def setUp(self):
+        email, password = "admin@example.com", "Passw0rd!!"
+        User.objects.create_superuser(email=email, password=password)
+        self.client.login(username=email, password=password)
+        for index in get_indexes().values():
+            index.clear()
+
+    def test_changelists_load(self):
+        """Test that the workout, exercise and session changelists load."""
+        for name in ["workout", "exercise", "session"]:
+            response = self.client.get(reverse(f"admin:workouts_{name}_changelist"))
+            self.assertEqual(response.status_code, HTTPStatus.OK)
+
+    def test_workout_autocomplete(self):
+        """Test that workout autocomplete matches a case-insensitive name prefix."""
+        response = self.client.get(
+            reverse("admin:autocomplete"),
+            {
+                "term": "mU",
+                "app_label": "workouts",
+                "model_name": "session",
+                "field_name": "workout",
+            },
+        )
+        self.assertEqual(response.status_code, HTTPStatus.OK)
+        names = [result["text"] for result in response.json()["results"]]
+        self.assertEqual(names, ["Murph"])
+
+    def test_search_uses_index(self):
+        """Test that admin search is answered from the full-text index."""
+        response = self.client.get(
+            reverse("admin:workouts_exercise_changelist"), {"q": "bench pre"}
+        )
+        names = {exercise.name for exercise in response.context["cl"].result_list}
+        self.assertIn("Dumbbell Bench Press", names)
+        self.assertNotIn("Squat", names)
+
+    @override_settings(ADMIN_ESTIMATED_COUNT_THRESHOLD=1)
+    def test_estimated_count(self):
+        """Test that unfiltered changelists use an estimated count."""
+        sessions = Session.objects.order_by("pk")
+        largest_pk = sessions.last().pk
+        Session.objects.filter(pk=sessions.first().pk).delete()
+
+        paginator = EstimatedCountPaginator(Session.objects.order_by("pk"), 10)
+        self.assertEqual(paginator.count, largest_pk)
+
+        paginator = EstimatedCountPaginator(
+            Session.objects.filter(workout=3).order_by("pk"), 10
+        )
+        self.assertEqual(paginator.count, 1)
+
+        # An estimate that would leave the last page empty falls back to an exact count.
+        Session.objects.filter(pk__lt=largest_pk).delete()
+        paginator = EstimatedCountPaginator(Session.objects.order_by("pk"), 5)
+        self.assertEqual(paginator.count, 1)
+        self.assertEqual(paginator.num_pages, 1)
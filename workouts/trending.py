@@ -0,0 +1,98 @@
+"""Trending workouts.
+
+A workout's trending score is the sum of the weights of its recent completions and likes, each
+decayed exponentially with its age. Rather than decaying every score as time passes, each event
+is weighted by `exp(rate * t)` instead, which grows at the rate old events should decay. All
+scores then share the same factor `exp(-rate * now)`, so they rank the same, and a new event is
+simply added. The sums grow without bound, so their logarithms are stored, and adding an event
+with log weight `x` to a stored `s` is `max(s, x) + ln(1 + exp(-|s - x|))`.
+
+Deleting a session or unliking a workout doesn't take anything away, but its weight decays like
+any other. Stored scores are only comparable when they were recorded at the same rate, so after
+changing `TRENDING_HALF_LIFE` they have to be recomputed with `manage.py rebuildtrends`.
+"""
+
+import math
+
+from django.conf import settings
+from django.db import IntegrityError
+from django.db import transaction
+from django.db.models import F
+from django.db.models import Value
+from django.db.models.functions import Abs
+from django.db.models.functions import Exp
+from django.db.models.functions import Greatest
+from django.db.models.functions import Ln
+from django.utils import timezone
+
+from .models import Like
+from .models import Session
+from .models import WorkoutTrend
+
+# How much each kind of event adds to a workout's score.
+SESSION_WEIGHT = 1.0
+LIKE_WEIGHT = 0.5
+
+
+def rate():
+    """Return the decay rate per second."""
+    return math.log(2) / settings.TRENDING_HALF_LIFE
+
+
+def log_weight(weight, timestamp):
+    return math.log(weight) + rate() * timestamp.timestamp()
+
+
+def score(log_score, now=None):
+    """Return the current, decayed score for a stored `log_score`."""
+    now = now or timezone.now()
+    return math.exp(log_score - rate() * now.timestamp())
+
+
+def record(workout_id, weight, timestamp):
+    """Add an event of `weight` at `timestamp` to a workout's score."""
+    value = Value(log_weight(weight, timestamp))
+    updated = WorkoutTrend.objects.filter(workout_id=workout_id).update(
+        log_score=Greatest(F("log_score"), value)
+        + Ln(1 + Exp(-Abs(F("log_score") - value)))
+    )
+    if not updated:
+        try:
+            with transaction.atomic():
+                WorkoutTrend.objects.create(
+                    workout_id=workout_id, log_score=value.value
+                )
+        except IntegrityError:
+            # Another event created it first.
+            record(workout_id, weight, timestamp)
+
+
+def rebuild():
+    """Recompute every workout's score from its sessions and likes, returning how many."""
+    log_weights = {}
+    events = [
+        (Session.objects.values_list("workout_id", "timestamp"), SESSION_WEIGHT),
+        (
+            Like.objects.filter(action=True).values_list("workout_id", "timestamp"),
+            LIKE_WEIGHT,
+        ),
+    ]
+    for rows, weight in events:
+        for workout_id, timestamp in rows.iterator():
+            log_weights.setdefault(workout_id, []).append(log_weight(weight, timestamp))
+
+    trends = []
+    for workout_id, values in log_weights.items():
+        peak = max(values)
+        log_score = peak + math.log(sum(math.exp(value - peak) for value in values))
+        trends.append(WorkoutTrend(workout_id=workout_id, log_score=log_score))
+
+    with transaction.atomic():
+        WorkoutTrend.objects.all().delete()
+        WorkoutTrend.objects.bulk_create(trends, batch_size=500)
+    return len(trends)
+
+
+def top(limit):
+    """Return the `limit` highest scoring trends, highest first."""
+    return WorkoutTrend.objects.order_by("-log_score")[:limit]
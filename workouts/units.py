@@ -0,0 +1,93 @@
+"""Units and formatting for performance values.
+
+Performances are stored as integers in the base unit of the workout style's physical quantity:
+milliseconds for time, millimetres for distance, grams for weight, watts for rate of work and
+plain repetitions for reps. Formatting goes through one table of formatter functions, built once
+at import time, so that formatting a page of sessions is a dictionary lookup and some integer
+arithmetic per value.
+"""
+
+# Number of base units in one display unit (seconds, metres, kilograms, watts or reps), keyed by
+# `WorkoutStyle.QuantityNameChoices` value.
+SCALE = {
+    "T": 1000,
+    "D": 1000,
+    "W": 1000,
+    "R": 1,
+    "A": 1,
+}
+
+_TIME_UNITS = [
+    ("hour", 3600 * 1000),
+    ("minute", 60 * 1000),
+    ("second", 1000),
+]
+
+
+def _plural(count, unit):
+    return f"{count} {unit}" if count == 1 else f"{count} {unit}s"
+
+
+def _decimal(value, scale, suffix):
+    whole, fraction = divmod(value, scale)
+    if not fraction:
+        return f"{whole} {suffix}"
+    return f"{value / scale:.2f}".rstrip("0").rstrip(".") + f" {suffix}"
+
+
+def format_time(ms):
+    """Format a duration in milliseconds using its two most significant units."""
+    if ms < 1000:
+        return _plural(ms, "millisecond")
+
+    parts = []
+    for unit, size in _TIME_UNITS:
+        count, ms = divmod(ms, size)
+        if count:
+            parts.append(_plural(count, unit))
+        if parts and (not count or len(parts) == 2):
+            break
+    return " ".join(parts)
+
+
+def format_distance(mm):
+    if mm >= 1000 * 1000:
+        return _decimal(mm, 1000 * 1000, "km")
+    return _decimal(mm, 1000, "m")
+
+
+def format_weight(grams):
+    return _decimal(grams, 1000, "kg")
+
+
+def format_rate(watts):
+    return f"{watts} W"
+
+
+def format_reps(reps):
+    return _plural(reps, "rep")
+
+
+FORMATTERS = {
+    "T": format_time,
+    "D": format_distance,
+    "W": format_weight,
+    "R": format_reps,
+    "A": format_rate,
+}
+
+
+def to_base_units(value, quantity_name):
+    """Convert `value`, given in display units (seconds, metres, etc.), to base units."""
+    return round(value * SCALE[quantity_name])
+
+
+def format_performance(value, quantity_name):
+    """Return a human readable string for a performance `value` in base units."""
+    return FORMATTERS[quantity_name](int(value))
+
+
+def format_performances(rows):
+    """Format an iterable of `(value, quantity_name)` pairs in one pass."""
+    formatters = FORMATTERS
+    return [formatters[quantity_name](int(value)) for value, quantity_name in rows]
@@ -7,7 +7,33 @@ urlpatterns = [
     path("session/<int:pk>/", views.SessionDetailView.as_view(), name="session"),
     path("sessions/", views.SessionListView.as_view(), name="sessions"),
     path("workout/<int:pk>/", views.WorkoutDetailView.as_view(), name="workout"),
+    path("workout/<int:pk>/plan/", views.WorkoutPlanView.as_view(), name="plan"),
+    path(
+        "workout/<int:pk>/athletes/",
+        views.WorkoutAthletesView.as_view(),
+        name="athletes",
+    ),
     path("workouts/", views.WorkoutListView.as_view(), name="workouts"),
+    path(
+        "workouts/trending/",
+        views.TrendingWorkoutsView.as_view(),
+        name="trending",
+    ),
+    path(
+        "live/workout/<int:workout>/",
+        views.LiveSessionCreateView.as_view(),
+        name="live",
+    ),
+    path(
+        "live/session/<int:session>/interval/<int:interval>/",
+        views.LiveIntervalView.as_view(),
+        name="live_interval",
+    ),
+    path("streak/", views.StreakView.as_view(), name="streak"),
+    path("like/workout/<int:workout>/", views.LikeView.as_view(), name="like"),
+    path("search/", views.SearchView.as_view(), name="search"),
+    path("autocomplete/", views.AutocompleteView.as_view(), name="autocomplete"),
+    path("sync/", views.SyncView.as_view(), name="sync"),
     path("exercise/<int:pk>/", views.ExerciseDetailView.as_view(), name="exercise"),
     path("exercises/", views.ExerciseListView.as_view(), name="exercises"),
 ]
@@ -0,0 +1,38 @@
+"""Cache versions of workouts, sessions and users.
+
+Anything cached from one of these objects is keyed by its version, which the signal handlers in
+`workouts.signals` bump whenever the object, or anything cached with it, changes. A bump is one
+cache write however many cached entries it orphans. The "percentiles" version of a workout is
+bumped by `workouts.percentiles` whenever the sketches that rank its sessions change.
+"""
+
+import time
+
+from django.core.cache import cache
+
+
+def _key(kind, pk):
+    return f"workouts:version:{kind}:{pk}"
+
+
+def get_versions(objects):
+    """Return the current version of each `(kind, pk)` in `objects`, in one round trip."""
+    keys = {_key(kind, pk): (kind, pk) for kind, pk in objects}
+    found = cache.get_many(keys)
+    missing = {key: time.time_ns() for key in keys if key not in found}
+    if missing:
+        # A version is never reused, so losing a version key can't revive a stale entry.
+        cache.set_many(missing, timeout=None)
+        found.update(missing)
+    return {keys[key]: version for key, version in found.items()}
+
+
+def get_version(kind, pk):
+    """Return the current version of one object."""
+    return get_versions([(kind, pk)])[kind, pk]
+
+
+def bump_versions(kind, pks):
+    """Give each of `pks` a new version, orphaning anything cached for the old one."""
+    version = time.time_ns()
+    cache.set_many({_key(kind, pk): version for pk in pks}, timeout=None)
@@ -1,13 +1,63 @@
 from django.contrib.auth.mixins import LoginRequiredMixin
+from django.http import Http404
+from django.http import HttpResponse
+from django.http import HttpResponseBadRequest
+from django.shortcuts import get_object_or_404
 from django.shortcuts import render
+from django.utils import timezone
+from django.utils.cache import patch_vary_headers
+from django.views.generic import View
 from django.views.generic.detail import BaseDetailView
 from django.views.generic.list import BaseListView
 
+from project.autocomplete import get_index
+from project.db.models import Selection
 from project.views.generic import JSONResponseMixin
+from project.views.generic import negotiate
 
+from workouts import athletes
+from workouts import catalog
+from workouts import live
+from workouts import streaks
+from workouts import trending
+from workouts.likes import likes
+from workouts import sync
 from workouts.models import Exercise
+from workouts.models import Interval
+from workouts.models import Performance
 from workouts.models import Session
 from workouts.models import Workout
+from workouts.plan import get_plan
+from workouts.search import KINDS
+from workouts.search import search
+from workouts.units import format_performance
+
+
+class CatalogSnapshotMixin:
+    """Serve the full payload of a catalog object from the catalog snapshot, if there is one.
+
+    The payload is copied out of the mapping once, straight into the response body along with
+    its envelope. Requests for sparse or deduplicated payloads are serialized from the database
+    as usual.
+    """
+
+    def get(self, request, *args, **kwargs):
+        snapshot = catalog.get_snapshot()
+        if snapshot is not None and not {"fields", "expand", "dedupe"} & set(
+            request.GET
+        ):
+            content_type = negotiate(request.META.get("HTTP_ACCEPT"))
+            name = self.context_object_name
+            payload = snapshot.lookup(name, self.kwargs["pk"], content_type)
+            if payload is not None:
+                prefix, suffix = catalog.envelope(name, content_type)
+                # Joined here, since `HttpResponse` would copy each part to bytes first.
+                response = HttpResponse(
+                    b"".join([prefix, payload, suffix]), content_type=content_type
+                )
+                patch_vary_headers(response, ["Accept"])
+                return response
+        return super().get(request, *args, **kwargs)
 
 
 class SessionDetailView(JSONResponseMixin, LoginRequiredMixin, BaseDetailView):
@@ -19,7 +69,7 @@ class SessionDetailView(JSONResponseMixin, LoginRequiredMixin, BaseDetailView):
 
     def get_queryset(self):
         # XXX: Not filtering by user during development.
-        return Session.objects.select_related("workout")
+        return self.select(Session.objects.all())
 
 
 class SessionListView(JSONResponseMixin, LoginRequiredMixin, BaseListView):
@@ -32,10 +82,24 @@ class SessionListView(JSONResponseMixin, LoginRequiredMixin, BaseListView):
     def get_queryset(self):
         # XXX: Not filtering by user during development.
         # TODO: Pagination
-        return Session.objects.select_related("workout").order_by("-timestamp")
+        return self.select(Session.objects.order_by("-timestamp"))
+
+    def get_context_data(self, **kwargs):
+        context = super().get_context_data(**kwargs)
+        sessions = context["object_list"]
+        selection = self.get_selection() or Selection.default(Session)
+        if selection.wants("performance"):
+            Session.prefetch_performance(sessions)
+
+        workout = selection.expand.get("workout")
+        if workout is not None and workout.wants("exercise_count"):
+            Workout.prefetch_summary([session.workout for session in sessions])
+        return context
 
 
-class WorkoutDetailView(JSONResponseMixin, LoginRequiredMixin, BaseDetailView):
+class WorkoutDetailView(
+    CatalogSnapshotMixin, JSONResponseMixin, LoginRequiredMixin, BaseDetailView
+):
     context_object_name = "workout"
     raise_exception = True
 
@@ -44,8 +108,7 @@ class WorkoutDetailView(JSONResponseMixin, LoginRequiredMixin, BaseDetailView):
 
     def get_queryset(self):
         # XXX: Not filtering by user during development.
-        # TODO: Prefetch related
-        return Workout.objects.all()
+        return self.select(Workout.objects.all())
 
 
 class WorkoutListView(JSONResponseMixin, LoginRequiredMixin, BaseListView):
@@ -58,10 +121,316 @@ class WorkoutListView(JSONResponseMixin, LoginRequiredMixin, BaseListView):
     def get_queryset(self):
         # XXX: Not filtering by user during development.
         # TODO: Pagination
-        return Workout.objects.all()
+        return self.select(Workout.objects.all())
+
+    def get_context_data(self, **kwargs):
+        context = super().get_context_data(**kwargs)
+        selection = self.get_selection()
+        if selection is None or selection.wants("exercise_count"):
+            Workout.prefetch_summary(context["object_list"])
+        return context
+
+
+class TrendingWorkoutsView(JSONResponseMixin, LoginRequiredMixin, View):
+    """The workouts with the most recent completions and likes, most trending first.
+
+    Each result has the workout's current `score` and the `workout` itself, which can be
+    trimmed with `?fields=` and `?expand=`.
+    """
+
+    context_object_name = "trending"
+    raise_exception = True
+    max_limit = 50
+
+    def get(self, request, *args, **kwargs):
+        try:
+            limit = max(min(int(request.GET.get("limit", 10)), self.max_limit), 1)
+        except ValueError:
+            return HttpResponseBadRequest()
+
+        trends = list(trending.top(limit))
+        workouts = self.select(Workout.objects.all()).in_bulk(
+            [trend.workout_id for trend in trends]
+        )
+        selection = self.get_selection() or Selection.default(Workout)
+        if selection.wants("exercise_count"):
+            Workout.prefetch_summary(list(workouts.values()))
+
+        now = timezone.now()
+        results = [
+            {
+                "score": trending.score(trend.log_score, now),
+                "workout": workouts[trend.workout_id].serialize(selection=selection),
+            }
+            for trend in trends
+        ]
+        return self.render_to_json_response({self.context_object_name: results})
+
+    def get_data(self, context):
+        return {"data": context}
+
+
+class WorkoutPlanView(JSONResponseMixin, LoginRequiredMixin, View):
+    context_object_name = "plan"
+    raise_exception = True
+
+    def get(self, request, *args, **kwargs):
+        plan = get_plan(self.kwargs["pk"])
+        if plan is None:
+            raise Http404("No workout found matching the query")
+        return self.render_to_json_response({self.context_object_name: plan})
+
+    def get_data(self, context):
+        return {"data": context}
+
+
+class WorkoutAthletesView(JSONResponseMixin, LoginRequiredMixin, View):
+    """Estimated counts of the distinct athletes who completed a workout.
+
+    Counts are for the last `week` and `month`, up to and including today, and `all_time`.
+    """
+
+    context_object_name = "athletes"
+    raise_exception = True
+
+    def get(self, request, *args, **kwargs):
+        workout = get_object_or_404(Workout.objects.only("pk"), pk=self.kwargs["pk"])
+        return self.render_to_json_response(
+            {self.context_object_name: athletes.periods(workout.pk)}
+        )
+
+    def get_data(self, context):
+        return {"data": context}
+
+
+class StreakView(JSONResponseMixin, LoginRequiredMixin, View):
+    """The user's current and longest training streaks, in days, and sessions this week."""
+
+    context_object_name = "streak"
+    raise_exception = True
+
+    def get(self, request, *args, **kwargs):
+        return self.render_to_json_response(
+            {self.context_object_name: streaks.stats(request.user.pk)}
+        )
+
+    def get_data(self, context):
+        return {"data": context}
+
+
+class LiveSessionCreateView(JSONResponseMixin, LoginRequiredMixin, View):
+    """Start a live session of a workout, announcing it to the user's friends."""
+
+    context_object_name = "session"
+    raise_exception = True
+
+    def post(self, request, *args, **kwargs):
+        workout = get_object_or_404(Workout, pk=self.kwargs["workout"])
+        session = Session.objects.create(
+            user=request.user, workout=workout, timestamp=timezone.now()
+        )
+
+        live.publish(
+            request.user.pk,
+            session.pk,
+            {
+                "type": "started",
+                "session": session.pk,
+                "user": request.user.pk,
+                "workout": workout.pk,
+                "timestamp": session.timestamp,
+            },
+        )
+        return self.render_to_json_response({self.context_object_name: session})
+
+
+class LiveIntervalView(JSONResponseMixin, LoginRequiredMixin, View):
+    """Record the result of one interval of a live session, pushing it to the user's friends.
+
+    The result is posted as `performance`, in the base unit of the interval's workout style.
+    Posting again for the same interval replaces the earlier result.
+    """
+
+    context_object_name = "performance"
+    raise_exception = True
+
+    def post(self, request, *args, **kwargs):
+        session = get_object_or_404(
+            Session, pk=self.kwargs["session"], user=request.user
+        )
+        interval = get_object_or_404(
+            Interval.objects.select_related("style"),
+            pk=self.kwargs["interval"],
+            workout_id=session.workout_id,
+        )
+
+        try:
+            value = int(request.POST["performance"])
+        except (KeyError, ValueError):
+            return HttpResponseBadRequest()
+
+        performance, created = Performance.objects.update_or_create(
+            session=session, interval=interval, defaults={"performance": value}
+        )
+
+        live.publish(
+            request.user.pk,
+            session.pk,
+            {
+                "type": "progress",
+                "session": session.pk,
+                "user": request.user.pk,
+                "workout": session.workout_id,
+                "interval": interval.pk,
+                "performance": format_performance(value, interval.style.quantity_name),
+                "value": value,
+                "completed": session.performance_set.count(),
+            },
+        )
+        return self.render_to_json_response({self.context_object_name: performance})
+
+
+class LikeView(JSONResponseMixin, LoginRequiredMixin, View):
+    """Whether the user likes a workout.
+
+    `POST` sets it with an `action` of `like` or `unlike`. Actions are buffered and written in
+    batches, with repeated taps coalesced, but are seen by `GET` straight away.
+    """
+
+    context_object_name = "like"
+    raise_exception = True
+    actions = {"like": True, "unlike": False}
+
+    def get(self, request, *args, **kwargs):
+        workout = self.get_workout_id()
+        return self.render_like(workout, likes.state(request.user.pk, workout))
+
+    def post(self, request, *args, **kwargs):
+        action = self.actions.get(request.POST.get("action"))
+        if action is None:
+            return HttpResponseBadRequest()
+
+        workout = self.get_workout_id()
+        likes.add(request.user.pk, workout, action)
+        return self.render_like(workout, action)
+
+    def get_workout_id(self):
+        if not Workout.objects.filter(pk=self.kwargs["workout"]).exists():
+            raise Http404("No workout found matching the query")
+        return self.kwargs["workout"]
+
+    def render_like(self, workout, liked):
+        return self.render_to_json_response(
+            {self.context_object_name: {"workout": workout, "liked": liked}}
+        )
+
+    def get_data(self, context):
+        return {"data": context}
+
+
+class SearchView(JSONResponseMixin, LoginRequiredMixin, View):
+    """Ranked full-text search over workouts and exercises.
+
+    `q` is matched word by word, with each word as a prefix. `type` limits results to
+    `workout` or `exercise`.
+    """
+
+    context_object_name = "results"
+    raise_exception = True
+    max_limit = 50
+
+    def get(self, request, *args, **kwargs):
+        kind = request.GET.get("type") or None
+        if kind is not None and kind not in KINDS:
+            return HttpResponseBadRequest()
+
+        try:
+            limit = max(min(int(request.GET.get("limit", 20)), self.max_limit), 1)
+        except ValueError:
+            return HttpResponseBadRequest()
 
+        results = search(request.GET.get("q", ""), kind=kind, limit=limit)
+        return self.render_to_json_response({self.context_object_name: results})
 
-class ExerciseDetailView(JSONResponseMixin, LoginRequiredMixin, BaseDetailView):
+    def get_data(self, context):
+        return {"data": context}
+
+
+class AutocompleteView(JSONResponseMixin, LoginRequiredMixin, View):
+    """Typeahead over workout and exercise names, answered from in-memory prefix indexes.
+
+    `type` limits results to `workout` or `exercise`. Staff can also complete user email
+    addresses with `type=user`.
+    """
+
+    context_object_name = "results"
+    raise_exception = True
+    types = ["workout", "exercise"]
+    staff_types = ["user"]
+    max_limit = 50
+
+    def get(self, request, *args, **kwargs):
+        allowed = self.types + (self.staff_types if request.user.is_staff else [])
+        kind = request.GET.get("type") or None
+        if kind is not None and kind not in allowed:
+            return HttpResponseBadRequest()
+
+        try:
+            limit = max(min(int(request.GET.get("limit", 10)), self.max_limit), 1)
+        except ValueError:
+            return HttpResponseBadRequest()
+
+        # Prefix matches of every type come before any near misses.
+        term = request.GET.get("q", "")
+        matches = {}
+        for fuzzy in [False, True]:
+            for name in [kind] if kind else self.types:
+                if len(matches) >= limit:
+                    break
+                for pk, label in get_index(name).search(term, limit, fuzzy=fuzzy):
+                    matches.setdefault((name, pk), label)
+
+        results = [
+            {"type": name, "id": pk, "label": label}
+            for (name, pk), label in matches.items()
+        ][:limit]
+        return self.render_to_json_response({self.context_object_name: results})
+
+    def get_data(self, context):
+        return {"data": context}
+
+
+class SyncView(JSONResponseMixin, LoginRequiredMixin, View):
+    """Changes to the catalog and the user's own data since a sync token.
+
+    `since` is the `next` token from the previous page, or 0 for everything. Keep asking with
+    each `next` until `more` is false.
+    """
+
+    context_object_name = "changes"
+    raise_exception = True
+
+    def get(self, request, *args, **kwargs):
+        try:
+            since = int(request.GET.get("since", 0))
+        except ValueError:
+            return HttpResponseBadRequest()
+        # Sequence numbers are 64-bit integers in the database.
+        if not 0 <= since < 2**63:
+            return HttpResponseBadRequest()
+
+        changes, next_seq, more = sync.changes(request.user, since)
+        return self.render_to_json_response(
+            {self.context_object_name: changes, "next": next_seq, "more": more}
+        )
+
+    def get_data(self, context):
+        return {"data": context}
+
+
+class ExerciseDetailView(
+    CatalogSnapshotMixin, JSONResponseMixin, LoginRequiredMixin, BaseDetailView
+):
     context_object_name = "exercise"
     raise_exception = True
     model = Exercise
@@ -69,6 +438,9 @@ class ExerciseDetailView(JSONResponseMixin, LoginRequiredMixin, BaseDetailView):
     def render_to_response(self, context, **response_kwargs):
         return self.render_to_json_response(context, **response_kwargs)
 
+    def get_queryset(self):
+        return self.select(super().get_queryset())
+
 
 class ExerciseListView(JSONResponseMixin, LoginRequiredMixin, BaseListView):
     context_object_name = "exercises"
@@ -80,4 +452,4 @@ class ExerciseListView(JSONResponseMixin, LoginRequiredMixin, BaseListView):
     def get_queryset(self):
         # XXX: Not filtering by user during development.
         # TODO: Pagination
-        return Exercise.objects.all()
+        return self.select(Exercise.objects.all())